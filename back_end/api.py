@@ -1,16 +1,49 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel, model_validator
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
 from datetime import date
 from datetime import datetime
-import pandas as pd
-from .preprocessing import preprocess_df
-from .model_utils import predict_all, get_location_from_region, get_temperature, get_region_from_location, get_traffic_from_region, FEATURE_COLS
+from pathlib import Path
+import asyncio
+import hmac
+import importlib
+import json
+import os
+import threading
+import time
+import numpy as np
+from .assets import AssetStore
+from .cache import PredictionCache, request_key, round_location
+from .feature_pipeline import FeaturePipeline
+from .heuristics import MATERIAL_RISK, SOIL_RISK, estimate_heuristics, unparseable
+from . import metrics, model_utils
+from .inference import registry
+from .inference.registry import list_versions, set_active_version, version_dir
+from .model_utils import predict_all_batch, get_location_from_region, get_temperature, aget_temperature, get_region_from_location, get_traffic_from_region, FEATURE_COLS
+from .serving import ConcurrencyLimiter, MicroBatcher, run_inference
+from .startup import StartupLoader
+from .warmup import WARMUP, run_warmup, synthetic_requests
 
-app = FastAPI()
+FRONT_END_DIR = Path(__file__).resolve().parent.parent / "front_end"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Returns at once: the port opens while models load, /ready tells when they are warm
+    # (`startup` is defined next to the /ready endpoint)
+    startup.start()
+    yield
+    # Close the weather client's pooled connections and its refresh threads
+    if model_utils.temperature_provider is not None:
+        await model_utils.temperature_provider.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +52,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if metrics.SERVER_TIMING:
+    app.add_middleware(metrics.ServerTimingMiddleware)
+
 # -------------------------
 # Request & Response Models
 # -------------------------
@@ -46,133 +82,542 @@ class PredictionResponse(BaseModel):
     risk_score: int
     recommended_action: str
     priority: int
+    model_version: str
+
+class BatchItemResult(BaseModel):
+    index: int
+    prediction: Optional[PredictionResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchItemResult]
+
+FEATURE_PIPELINE = FeaturePipeline(FEATURE_COLS)
+
+# Largest batch accepted by /predict/batch
+MAX_BATCH_SIZE = 50_000
 
 # -------------------------
-# API Endpoint
+# Feature building
 # -------------------------
-@app.post("/predict", response_model=PredictionResponse)
-def predict(data: PredictionRequest):
-
-    # 1️⃣ Determine location & region
+def resolve_location(data: PredictionRequest) -> Tuple[float, float, str]:
     if data.exact_location is not None:
         lat, lon = data.exact_location
         region = data.region or get_region_from_location(lat, lon)
     else:
         lat, lon = get_location_from_region(data.region)
         region = data.region
+    return lat, lon, region
 
-    traffic = get_traffic_from_region(region)
-    temperature_c = get_temperature(lat, lon)
-    snapshot_date = data.snapshot_date or date.today().strftime("%Y-%m-%d")
-
-    # 2️⃣ Build feature dictionary
-        # Material degradation factors
-    material_risk = {
-        "cast_iron": 1.5,
-        "concrete": 1.3,
-        "steel": 1.2,
-        "pvc": 0.7,
-        "hdpe": 0.6,
-    }
-    mat_factor = material_risk.get(data.material.lower(), 1.0)
-
-    # Soil corrosion factors
-    soil_risk = {
-        "clay": 1.4,
-        "sandy": 1.1,
-        "loam": 1.0,
-        "rocky": 0.9,
-    }
-    soil_factor = soil_risk.get(data.soil_type.lower(), 1.0)
-
-    # Quick estimate of asset age for failure calculation
-    asset_age = datetime.now().year - data.install_year
-    days_since_repair = (datetime.now() - pd.to_datetime(data.last_repair_date)).days   
-
-    # Estimate failures based on age, material, and repair history
-    # Training data mean = 9, so scale to that
-    base_failures = 0
-
-    if asset_age > 50:
-        base_failures = int(12 + mat_factor * 3 + soil_factor * 2)
-    elif asset_age > 40:
-        base_failures = int(9 + mat_factor * 2 + soil_factor * 1)
-    elif asset_age > 30:
-        base_failures = int(6 + mat_factor * 1.5)
-    elif asset_age > 20:
-        base_failures = int(3 + mat_factor)
-    elif asset_age > 10:
-        base_failures = int(1 + mat_factor * 0.5)
-    else:
-        base_failures = 0
-
-    # Add more if repair history is bad
-    if days_since_repair > 365 * 7:
-        base_failures += 3
-    elif days_since_repair > 365 * 5:
-        base_failures += 2
-    elif days_since_repair > 365 * 3:
-        base_failures += 1
-
-    # High traffic + problematic soil = more failures
-    if traffic == "high" and soil_factor > 1.2:
-        base_failures += 2
-
-    # Cap at 18 (max in training data)
-    base_failures = min(base_failures, 18)
-
-    # Environmental stress based on region
-    rainfall = 30.0 if region in ["San Francisco", "Marin", "Sonoma"] else 20.0
-    soil_moisture = 45.0 if data.soil_type.lower() == "clay" else 30.0
-    slope = 4.0 if region in ["San Francisco", "Marin"] else 2.0
-
-    # Build feature dictionary with SMART defaults
-    feature_dict = {
+
+def build_feature_dicts(
+    requests: List[PredictionRequest],
+    temperature_lookup=get_temperature,
+    locations: Optional[List[Tuple[float, float, str]]] = None,
+    now: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Model feature dicts for a batch of requests. The inputs a request lacks
+    (failure history, rainfall, soil moisture, slope) are estimated for the
+    whole batch at once, against one reference time (see heuristics.py).
+    """
+
+    # 1️⃣ Determine location & region (unless the caller already resolved it)
+    if locations is None:
+        locations = [resolve_location(data) for data in requests]
+    traffic = [get_traffic_from_region(region) for _, _, region in locations]
+    today = date.today().strftime("%Y-%m-%d")
+
+    # 2️⃣ Estimate failures based on age, material, and repair history,
+    # and environmental stress based on region
+    estimates = estimate_heuristics(
+        [data.install_year for data in requests],
+        [data.last_repair_date for data in requests],
+        [data.material for data in requests],
+        [data.soil_type for data in requests],
+        [region for _, _, region in locations],
+        traffic,
+        now=now,
+    )
+    estimates = {name: values.tolist() for name, values in estimates.items()}
+
+    # Build feature dictionaries with SMART defaults
+    feature_dicts = []
+    for i, (data, (lat, lon, region)) in enumerate(zip(requests, locations)):
+        base_failures = estimates["num_prev_failures"][i]
+        feature_dicts.append({
+            "type": data.type,
+            "material": data.material,
+            "region": region,
+            "soil_type": data.soil_type,
+            "traffic": traffic[i],
+            "latitude": lat,
+            "longitude": lon,
+            "avg_temp_c": temperature_lookup(lat, lon),
+            "rainfall_mm": estimates["rainfall_mm"][i],
+            "soil_moisture_pc": estimates["soil_moisture_pc"][i],
+            "slope_grade": estimates["slope_grade"][i],
+            "num_prev_failures": base_failures,
+            "failures_prev": base_failures,
+            "last_repair_date": data.last_repair_date,
+            "snapshot_date": data.snapshot_date or today,
+            "install_year": data.install_year,
+            "length_m": data.length_m,
+        })
+    return feature_dicts
+
+
+def build_feature_dict(data: PredictionRequest, temperature_lookup=get_temperature, location=None) -> dict:
+    return build_feature_dicts([data], temperature_lookup, [location] if location else None)[0]
+
+
+def build_model_input(feature_dicts: List[dict]) -> np.ndarray:
+    # 3️⃣ Preprocess straight into a float32 matrix aligned to FEATURE_COLS
+    # (same values as preprocess_df + reindex, see feature_pipeline.py)
+    return FEATURE_PIPELINE.transform(feature_dicts)
+
+# -------------------------
+# API Endpoints
+# -------------------------
+def score_feature_dicts(feature_dicts: List[dict]) -> List[dict]:
+    with metrics.stage("feature_pipeline"):
+        df_processed = build_model_input(feature_dicts)
+
+    # ✅ 6️⃣ Pass to unified prediction function
+    with metrics.stage("models"):
+        return predict_all_batch(df_processed)
+
+
+predict_limiter = ConcurrencyLimiter()
+
+
+@asynccontextmanager
+async def admitted():
+    """Hold a predict_limiter slot, or answer 503 at once when none is free."""
+    if not predict_limiter.try_acquire():
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly.", headers={"Retry-After": "1"})
+    try:
+        yield
+    finally:
+        predict_limiter.release()
+
+# Identical requests within the TTL skip weather, features and models
+prediction_cache = PredictionCache()
+model_utils.on_models_activated(prediction_cache.clear)
+
+
+def prediction_cache_key(data: PredictionRequest, lat: float, lon: float, region: str, model_version: str) -> str:
+    today = date.today().strftime("%Y-%m-%d")
+    fields = {
         "type": data.type,
         "material": data.material,
-        "region": region,
         "soil_type": data.soil_type,
-        "traffic": traffic,
-        "latitude": lat,
-        "longitude": lon,
-        "avg_temp_c": temperature_c,
-        "rainfall_mm": rainfall,
-        "soil_moisture_pc": soil_moisture,
-        "slope_grade": slope,
-        "num_prev_failures": base_failures,
-        "failures_prev": base_failures,
+        "region": region,
+        "location": round_location(lat, lon),
         "last_repair_date": data.last_repair_date,
-        "snapshot_date": snapshot_date,
+        "snapshot_date": data.snapshot_date or today,
         "install_year": data.install_year,
         "length_m": data.length_m,
+        # Age and days-since-repair heuristics depend on the current date
+        "today": today,
     }
+    return request_key(fields, model_version)
 
-    df = pd.DataFrame([feature_dict])
+# cache_key -> the task computing that prediction, so identical requests
+# arriving before it is cached wait for it instead of computing it again
+pending_predictions: Dict[str, "asyncio.Task[dict]"] = {}
 
-    # 3️⃣ Preprocess
-    df_processed = preprocess_df(df)
+# Concurrent /predict calls are scored together (see serving.MicroBatcher)
+predict_batcher = MicroBatcher(score_feature_dicts)
 
-    # 4️⃣ Drop raw datetime columns (to avoid dtype issues)
-    df_processed = df_processed.drop(columns=["snapshot_date", "last_repair_date"], errors="ignore")
 
-    # 5️⃣ Align to training features
-    df_processed = df_processed.reindex(columns=FEATURE_COLS, fill_value=0)
+@app.post("/predict", response_model=PredictionResponse)
+async def predict(data: PredictionRequest):
+    await startup.wait_async()
+    with metrics.stage("location"):
+        lat, lon, region = resolve_location(data)
+    model_version = model_utils.current_models().version
+    with metrics.stage("cache"):
+        cache_key = prediction_cache_key(data, lat, lon, region, model_version)
+        cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    # ✅ 6️⃣ Pass to unified prediction function
-    return predict_all(df_processed)
+    task = pending_predictions.get(cache_key)
+    if task is None:
+        task = pending_predictions[cache_key] = asyncio.ensure_future(
+            compute_prediction(data, lat, lon, region, model_version, cache_key)
+        )
+    # Shielded: a client that disconnects must not cancel the answer others are waiting for
+    return await asyncio.shield(task)
+
+
+async def compute_prediction(
+    data: PredictionRequest, lat: float, lon: float, region: str, model_version: str, cache_key: str
+) -> dict:
+    try:
+        # Shed load instead of queueing once the concurrency limit is reached
+        async with admitted():
+            # Weather over the shared async client, models on the inference executor
+            with metrics.stage("weather"):
+                temperature_c = await aget_temperature(lat, lon)
+            with metrics.stage("features"):
+                feature_dict = build_feature_dict(data, lambda lat, lon: temperature_c, (lat, lon, region))
+            # Waiting for a micro-batch plus scoring it (feature_pipeline + models)
+            with metrics.stage("inference"):
+                prediction = await predict_batcher.submit(feature_dict)
+        # A version swap mid-request must not file the new version's answer under the old key
+        if prediction["model_version"] == model_version:
+            prediction_cache.put(cache_key, prediction)
+        return prediction
+    finally:
+        del pending_predictions[cache_key]
+
+
+@app.get("/predict/stats")
+def predict_stats():
+    return {
+        "concurrency": predict_limiter.stats(),
+        "batching": predict_batcher.stats(),
+        "cache": prediction_cache.stats(),
+        "pending": len(pending_predictions),
+    }
+
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """
+    Split a /predict/batch body into raw items.
+    NDJSON lines that fail to parse are kept as exceptions so they are
+    reported against their own index instead of failing the batch.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                items.append(exc)
+        return items
+
+    try:
+        items = json.loads(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of prediction requests.")
+    return items
+
+
+def prepare_batch(items: list) -> dict:
+    """
+    Validate each item and resolve its location. Returns the result slots
+    (errors already filled in at their index) and the valid rows as
+    parallel "indices" / "requests" / "locations" lists.
+    """
+    results = [None] * len(items)
+    indices, requests, locations = [], [], []
+    for i, item in enumerate(items):
+        try:
+            if isinstance(item, Exception):
+                raise item
+            data = PredictionRequest.model_validate(item)
+            location = resolve_location(data)
+        except Exception as exc:
+            results[i] = {"index": i, "error": str(exc)}
+            continue
+        indices.append(i)
+        requests.append(data)
+        locations.append(location)
+
+    # Dates are checked for the whole batch; rows with an unparseable one are rejected
+    today = date.today().strftime("%Y-%m-%d")
+    invalid = {}
+    for field in ("last_repair_date", "snapshot_date"):
+        values = [getattr(data, field) or today for data in requests]
+        for j in np.flatnonzero(unparseable(values)):
+            invalid.setdefault(j, f"Invalid {field}: {values[j]!r}")
+    if invalid:
+        for j, error in invalid.items():
+            results[indices[j]] = {"index": indices[j], "error": error}
+        keep = [j for j in range(len(requests)) if j not in invalid]
+        indices = [indices[j] for j in keep]
+        requests = [requests[j] for j in keep]
+        locations = [locations[j] for j in keep]
+
+    return {"results": results, "indices": indices, "requests": requests, "locations": locations}
+
+
+# Weather lookups one /predict/batch keeps in flight at once
+BATCH_WEATHER_CONCURRENCY = 16
+
+
+async def fetch_batch_temperatures(locations: List[Tuple[float, float, str]]) -> dict:
+    """Temperature per distinct (lat, lon), looked up concurrently over the async weather client."""
+    semaphore = asyncio.Semaphore(BATCH_WEATHER_CONCURRENCY)
+
+    async def lookup(lat, lon):
+        async with semaphore:
+            return await aget_temperature(lat, lon)
+
+    points = list(dict.fromkeys((lat, lon) for lat, lon, _ in locations))
+    return dict(zip(points, await asyncio.gather(*(lookup(lat, lon) for lat, lon in points))))
+
+
+def score_prepared_batch(batch: dict, temperatures: Optional[dict] = None) -> dict:
+    """
+    Featurize and score the valid rows of prepare_batch() in one vectorized
+    pass. Temperatures missing from `temperatures` are looked up here,
+    once per location.
+    """
+    results = batch["results"]
+    temperatures = dict(temperatures or {})
+
+    def temperature_lookup(lat, lon):
+        if (lat, lon) not in temperatures:
+            temperatures[(lat, lon)] = get_temperature(lat, lon)
+        return temperatures[(lat, lon)]
+
+    if batch["requests"]:
+        feature_dicts = build_feature_dicts(batch["requests"], temperature_lookup, batch["locations"])
+        predictions = score_feature_dicts(feature_dicts)
+        for i, prediction in zip(batch["indices"], predictions):
+            results[i] = {"index": i, "prediction": prediction}
+
+    return {"results": results}
+
+
+def score_batch(items: list) -> dict:
+    """
+    Validate and featurize each item, then score all valid rows in one
+    vectorized pass. Invalid rows get an error entry at their index.
+    """
+    return score_prepared_batch(prepare_batch(items))
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(request: Request):
+    items = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} requests.")
+    await startup.wait_async()
+    # Same load shedding and inference pool as /predict
+    async with admitted():
+        batch = await run_inference(prepare_batch, items)
+        # Cache misses for different locations wait on the network together, not one after another
+        temperatures = await fetch_batch_temperatures(batch["locations"])
+        return await run_inference(score_prepared_batch, batch, temperatures)
+
+
+# -------------------------
+# Asset inventory
+# -------------------------
+def score_assets(rows: List[dict]) -> List[dict]:
+    """Score stored asset attribute rows (training CSV columns) in one pass."""
+    return predict_all_batch(build_model_input(rows))
+
+
+# Opened on first use, so importing the API (or tooling that does) creates no SQLite file
+_asset_store: Optional[AssetStore] = None
+_asset_store_lock = threading.Lock()
+
+
+def get_asset_store() -> AssetStore:
+    global _asset_store
+    with _asset_store_lock:
+        if _asset_store is None:
+            _asset_store = AssetStore(scorer=score_assets)
+    return _asset_store
+
+
+def ingest_assets(items: list) -> dict:
+    asset_store = get_asset_store()
+    counts = asset_store.upsert(items)
+    counts["rescored"] = asset_store.rescore()
+    counts["rescore_errors"] = [
+        {"asset_id": asset_id, "error": error} for asset_id, error in sorted(asset_store.rescore_errors.items())
+    ]
+    return counts
+
+
+@app.post("/assets")
+async def upsert_assets(request: Request):
+    """
+    Ingest asset snapshots (JSON array or NDJSON, one object per asset with
+    asset_id and any attribute columns), then rescore only the assets whose
+    attributes changed.
+    """
+    items = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} assets.")
+    await startup.wait_async()
+    async with admitted():
+        return await run_inference(ingest_assets, items)
+
+
+# Largest page /assets/top returns
+MAX_LEADERBOARD_LIMIT = 1000
+
+
+@app.get("/assets/top")
+def top_assets(
+    region: Optional[str] = None,
+    type: Optional[str] = None,
+    material: Optional[str] = None,
+    priority: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_LEADERBOARD_LIMIT),
+    offset: int = Query(0, ge=0),
+):
+    """Scored assets ranked by risk_score, highest first."""
+    assets = get_asset_store().top(limit, offset, region=region, type=type, material=material, priority=priority)
+    return {
+        "assets": assets,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(assets) == limit else None,
+    }
+
+
+@app.get("/assets/{asset_id}")
+def get_asset(asset_id: str):
+    asset = get_asset_store().get(asset_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail=f"Unknown asset {asset_id}")
+    return asset
+
+
+# -------------------------
+# Startup & warmup
+# -------------------------
+def score_warmup_request(item: dict) -> dict:
+    """What /predict does for one request, minus the cache and the micro-batcher."""
+    data = PredictionRequest.model_validate(item)
+    lat, lon, region = resolve_location(data)
+    temperature_c = get_temperature(lat, lon)
+    feature_dict = build_feature_dict(data, lambda lat, lon: temperature_c, (lat, lon, region))
+    return score_feature_dicts([feature_dict])[0]
+
+
+def score_warmup_batch(items: list) -> None:
+    errors = [result["error"] for result in score_batch(items)["results"] if "error" in result]
+    if errors:
+        raise RuntimeError(f"{len(errors)} warmup requests failed, e.g. {errors[0]}")
+
+
+def warmup() -> dict:
+    """Synthetic requests over every region, material and soil type (see warmup.py)."""
+    vocabulary = FEATURE_PIPELINE.onehot_offsets
+    requests = synthetic_requests(
+        model_utils.REGION_COORDINATES,
+        sorted(set(MATERIAL_RISK) | set(vocabulary.get("material", {}))),
+        sorted(set(SOIL_RISK) | set(vocabulary.get("soil_type", {}))),
+        sorted(vocabulary.get("type", {})) or ["water_pipe"],
+    )
+    with metrics.suppressed():
+        return run_warmup(score_warmup_request, score_warmup_batch, requests)
+
+
+# Loaded in the background once the server is up (see startup.py)
+startup = StartupLoader(
+    {
+        "models": model_utils.current_models,
+        "weather": model_utils.load_temperature_provider,
+        "pandas": lambda: importlib.import_module("pandas"),
+    },
+    warmup=warmup if WARMUP else None,
+)
+
+
+@app.get("/ready")
+def ready():
+    """503 until models, weather history and pandas are loaded and warmed up; per-task timings."""
+    status = startup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/models/stats")
+def model_stats():
+    return {**registry.stats(), "version": model_utils.current_models().version}
+
+
+# -------------------------
+# Model versions (admin)
+# -------------------------
+# Admin endpoints are disabled unless TUNNELVISION_ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("TUNNELVISION_ADMIN_TOKEN", "")
+
+# One activation at a time; requests keep being served while it loads
+_activation_lock = asyncio.Lock()
+
+
+class ActivateRequest(BaseModel):
+    version: str
+
+
+def require_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN or not hmac.compare_digest((token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+@app.get("/admin/models")
+def list_model_versions(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return {
+        "active": model_utils.current_models().version,
+        "serving_mode": model_utils.SERVING_MODE,
+        "versions": list_versions(),
+    }
+
+
+@app.post("/admin/models/activate")
+async def activate_model_version(body: ActivateRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load a published version off the request path, then swap it in. Requests
+    already being scored finish on the previous version; new ones use this one.
+    """
+    require_admin(x_admin_token)
+    try:
+        path = version_dir(body.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version {body.version}")
+
+    async with _activation_lock:
+        start = time.perf_counter()
+        new_models = await run_in_threadpool(model_utils.load_serving_models, path)
+        load_seconds = time.perf_counter() - start
+        previous = model_utils.activate_serving_models(new_models)
+        # New processes start on this version too
+        set_active_version(new_models.version)
+    return {
+        "version": new_models.version,
+        "previous_version": previous.version if previous is not None else None,
+        "load_seconds": load_seconds,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage / model latency histograms and fallback counters (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/weather/stats")
+def weather_stats():
+    return (model_utils.temperature_provider or model_utils.load_temperature_provider()).stats()
 
 
-app.mount("/static", StaticFiles(directory="front_end"), name="static")
+app.mount("/static", StaticFiles(directory=FRONT_END_DIR), name="static")
 
-# Serve HTML pages
+# Serve HTML pages (available before the models are loaded)
 @app.get("/")
 async def read_index():
-    return FileResponse("front_end/index.html")
+    return FileResponse(FRONT_END_DIR / "index.html")
 
 @app.get("/About.html")
 async def read_about():
-    return FileResponse("front_end/About.html")
+    return FileResponse(FRONT_END_DIR / "About.html")
 
 @app.get("/Form.html")
 async def read_form():
-    return FileResponse("front_end/Form.html")
+    return FileResponse(FRONT_END_DIR / "Form.html")
@@ -0,0 +1,444 @@
+"""
+Asset inventory store
+-----------------------------------
+SQLite table holding each asset's latest raw attributes (the columns of
+bay_area_infrastructure_balanced.csv) and its last predictions.
+
+Ingestion merges each incoming row into the stored one and hashes the
+result. Only assets whose attributes actually changed are marked dirty,
+and rescore() featurizes and scores just the dirty rows, so a nightly
+snapshot that touches rainfall or repair dates for a few assets costs
+O(changed assets), not O(inventory).
+
+A newer snapshot_date carries the stored num_prev_failures over as
+failures_prev (the previous snapshot's count, as in training); rows older
+than the stored snapshot are ignored. Dates are stored in ISO form
+("2024-1-5" -> "2024-01-05", UTC offsets converted to naive UTC), so
+snapshots order correctly; unparseable ones are rejected per row.
+
+rescore() scores in chunks. A chunk that fails is split in half until the
+failing rows are isolated; those stay dirty and are listed in
+rescore_errors, and the rest of the inventory is still scored.
+
+    python -m back_end.assets ingest back_end/data/bay_area_infrastructure_balanced.csv
+    python -m back_end.assets rescore [--all]
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .feature_pipeline import REQUIRED_NUMERIC
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "data" / "assets.sqlite3"
+
+# Raw attribute columns and their SQLite types
+ATTRIBUTE_COLS = {
+    "type": "TEXT",
+    "material": "TEXT",
+    "install_year": "REAL",
+    "length_m": "REAL",
+    "lat": "REAL",
+    "long": "REAL",
+    "soil_type": "TEXT",
+    "slope_grade": "REAL",
+    "region": "TEXT",
+    "tree_density": "TEXT",
+    "traffic": "TEXT",
+    "snapshot_date": "TEXT",
+    "rainfall_mm": "REAL",
+    "avg_temp_c": "REAL",
+    "soil_moisture_pc": "REAL",
+    "num_prev_failures": "REAL",
+    "last_repair_date": "TEXT",
+    "failures_prev": "REAL",
+}
+
+# Columns written by rescore(), as returned by model_utils.predict_all_batch
+PREDICTION_COLS = {
+    "failure_in_30_days": "INTEGER",
+    "failure_type": "TEXT",
+    "risk_score": "INTEGER",
+    "recommended_action": "TEXT",
+    "priority": "INTEGER",
+}
+
+# Columns /assets/top can filter on, each with its own risk-ordered index
+LEADERBOARD_FILTERS = ["region", "type", "material", "priority"]
+
+# A new asset must carry these; later updates may send any subset
+REQUIRED_ATTRIBUTES = REQUIRED_NUMERIC + ["snapshot_date"]
+
+# Rows featurized and scored per model call during rescore()
+RESCORE_CHUNK = 5000
+
+# SQLite's default limit on bound parameters is 999
+_IN_CHUNK = 900
+
+
+# TEXT columns holding dates, stored in normalize_date() form
+DATE_COLS = ["snapshot_date", "last_repair_date"]
+
+
+@lru_cache(maxsize=4096)
+def normalize_date(value: str) -> Optional[str]:
+    """
+    ISO form of a date string: "YYYY-MM-DD", or a full ISO timestamp when it
+    has a time of day. Raises ValueError when pd.to_datetime does; empty
+    strings and "NaT" give None.
+    """
+    import pandas as pd  # only when assets are ingested, so importing the API stays cheap
+
+    try:
+        ts = pd.to_datetime(value)
+    except (ValueError, TypeError, OverflowError) as exc:
+        raise ValueError(str(exc)) from None
+    if pd.isna(ts):
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return ts.strftime("%Y-%m-%d") if ts == ts.normalize() else ts.isoformat()
+
+
+def _coerce(col: str, value):
+    """Store values with their column's type so hashes compare equal across inputs."""
+    if value is None:
+        return None
+    if col in DATE_COLS:
+        try:
+            return normalize_date(str(value))
+        except ValueError:
+            raise ValueError(f"Invalid {col}: {value!r}") from None
+    return float(value) if ATTRIBUTE_COLS[col] == "REAL" else str(value)
+
+
+def _stored_date(value) -> Optional[str]:
+    """normalize_date for a stored value, None if it does not parse (rows written before normalizing)."""
+    try:
+        return None if value is None else normalize_date(str(value))
+    except ValueError:
+        return None
+
+
+def attributes_hash(attributes: dict) -> str:
+    canonical = json.dumps([attributes.get(col) for col in ATTRIBUTE_COLS], default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class AssetStore:
+    def __init__(self, path=None, scorer: Callable[[List[dict]], List[dict]] = None):
+        """
+        `scorer` maps a list of attribute dicts to one prediction dict per
+        row (see api.score_assets); it is only needed by rescore().
+        """
+        self.path = str(path or os.environ.get("TUNNELVISION_ASSET_DB", DEFAULT_DB_PATH))
+        self.scorer = scorer
+        # asset_id -> error for the rows the last rescore() could not score
+        self.rescore_errors: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create()
+
+    def _create(self) -> None:
+        columns = ",\n".join(
+            [f'"{c}" {t}' for c, t in ATTRIBUTE_COLS.items()] + [f'"{c}" {t}' for c, t in PREDICTION_COLS.items()]
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS assets (
+                    asset_id TEXT PRIMARY KEY,
+                    {columns},
+                    attributes_hash TEXT NOT NULL,
+                    dirty INTEGER NOT NULL DEFAULT 1,
+                    updated_at REAL,
+                    scored_at REAL
+                )
+                """
+            )
+            # Partial index: finding work for rescore() never scans clean rows
+            self._conn.execute("CREATE INDEX IF NOT EXISTS assets_dirty ON assets (asset_id) WHERE dirty = 1")
+            # Leaderboard: one risk-ordered index overall and per filter column,
+            # kept current by SQLite as predictions are written
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS assets_top ON assets (risk_score DESC, asset_id) WHERE scored_at IS NOT NULL"
+            )
+            for col in LEADERBOARD_FILTERS:
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS assets_top_{col} ON assets ("{col}", risk_score DESC, asset_id) '
+                    "WHERE scored_at IS NOT NULL"
+                )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # -------------------------
+    # Reads
+    # -------------------------
+    def _fetch(self, asset_ids: List[str]) -> Dict[str, dict]:
+        found = {}
+        for i in range(0, len(asset_ids), _IN_CHUNK):
+            chunk = asset_ids[i:i + _IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._conn.execute(f"SELECT * FROM assets WHERE asset_id IN ({placeholders})", chunk):
+                found[row["asset_id"]] = dict(row)
+        return found
+
+    def get(self, asset_id: str):
+        """Stored attributes and last predictions, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+        if row is None:
+            return None
+        row = dict(row)
+        return {
+            "asset_id": asset_id,
+            "attributes": {col: row[col] for col in ATTRIBUTE_COLS},
+            "prediction": None if row["scored_at"] is None else self._prediction(row),
+            "stale": bool(row["dirty"]),
+            "updated_at": row["updated_at"],
+            "scored_at": row["scored_at"],
+        }
+
+    @staticmethod
+    def _prediction(row: dict) -> dict:
+        prediction = {col: row[col] for col in PREDICTION_COLS}
+        prediction["failure_in_30_days"] = bool(prediction["failure_in_30_days"])
+        return prediction
+
+    def top(self, limit: int = 100, offset: int = 0, **filters) -> List[dict]:
+        """
+        Scored assets by descending risk_score (ties by asset_id), optionally
+        filtered on LEADERBOARD_FILTERS columns. Each filter is an equality
+        match; the query walks the matching risk-ordered index and stops
+        after offset + limit rows.
+        """
+        unknown = set(filters) - set(LEADERBOARD_FILTERS)
+        if unknown:
+            raise ValueError(f"Cannot filter on {', '.join(sorted(unknown))}")
+        where = ["scored_at IS NOT NULL"]
+        params = []
+        for col, value in filters.items():
+            if value is not None:
+                where.append(f'"{col}" = ?')
+                params.append(value)
+        columns = ", ".join(f'"{c}"' for c in ["asset_id", *LEADERBOARD_FILTERS, *PREDICTION_COLS, "dirty"])
+        query = (
+            f"SELECT {columns} FROM assets WHERE {' AND '.join(where)} "
+            "ORDER BY risk_score DESC, asset_id LIMIT ? OFFSET ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(query, (*params, limit, offset)).fetchall()
+        return [
+            {
+                "asset_id": row["asset_id"],
+                **{col: row[col] for col in LEADERBOARD_FILTERS if col != "priority"},
+                "prediction": self._prediction(dict(row)),
+                "stale": bool(row["dirty"]),
+            }
+            for row in rows
+        ]
+
+    def count(self, dirty_only: bool = False) -> int:
+        query = "SELECT COUNT(*) FROM assets" + (" WHERE dirty = 1" if dirty_only else "")
+        with self._lock:
+            return self._conn.execute(query).fetchone()[0]
+
+    # -------------------------
+    # Ingestion
+    # -------------------------
+    def upsert(self, rows: Iterable[dict]) -> dict:
+        """
+        Merge rows (each with an asset_id and any attribute columns) into
+        the store. Returns counts plus per-row errors by input index.
+        """
+        rows = list(rows)
+        counts = {"received": len(rows), "inserted": 0, "updated": 0, "unchanged": 0, "stale": 0, "errors": []}
+        latest = {}
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                # NDJSON lines that failed to parse arrive as exceptions
+                error = str(row) if isinstance(row, Exception) else "expected a JSON object"
+                counts["errors"].append({"index": i, "error": error})
+                continue
+            asset_id = row.get("asset_id")
+            if asset_id is None:
+                counts["errors"].append({"index": i, "error": "asset_id is required"})
+                continue
+            latest.setdefault(str(asset_id), []).append((i, row))
+
+        now = time.time()
+        with self._lock, self._conn:
+            stored = self._fetch(list(latest))
+            writes = []
+            for asset_id, updates in latest.items():
+                current = stored.get(asset_id)
+                for i, row in updates:
+                    merged, error = self._merge(current, row)
+                    if error == "stale":
+                        counts["stale"] += 1
+                        continue
+                    if error:
+                        counts["errors"].append({"index": i, "error": error})
+                        continue
+                    digest = attributes_hash(merged)
+                    if current is not None and digest == current["attributes_hash"]:
+                        counts["unchanged"] += 1
+                        continue
+                    counts["updated" if current is not None else "inserted"] += 1
+                    current = {**(current or {}), **merged, "attributes_hash": digest}
+                previous = stored.get(asset_id)
+                if current is not None and (previous is None or current["attributes_hash"] != previous["attributes_hash"]):
+                    writes.append((asset_id, *[current.get(col) for col in ATTRIBUTE_COLS], current["attributes_hash"], now))
+
+            columns = ", ".join(f'"{c}"' for c in ATTRIBUTE_COLS)
+            updates = ", ".join(f'"{c}" = excluded."{c}"' for c in ATTRIBUTE_COLS)
+            self._conn.executemany(
+                f"""
+                INSERT INTO assets (asset_id, {columns}, attributes_hash, dirty, updated_at)
+                VALUES ({",".join("?" * (len(ATTRIBUTE_COLS) + 2))}, 1, ?)
+                ON CONFLICT(asset_id) DO UPDATE SET {updates},
+                    attributes_hash = excluded.attributes_hash, dirty = 1, updated_at = excluded.updated_at
+                """,
+                writes,
+            )
+        counts["errors"].sort(key=lambda e: e["index"])
+        return counts
+
+    @staticmethod
+    def _merge(current, row: dict):
+        """(merged attributes, error) for one incoming row against the stored one."""
+        try:
+            incoming = {col: _coerce(col, row[col]) for col in ATTRIBUTE_COLS if col in row}
+        except (TypeError, ValueError) as exc:
+            return None, str(exc)
+        if current is None:
+            missing = [col for col in REQUIRED_ATTRIBUTES if incoming.get(col) is None]
+            if missing:
+                return None, f"new asset is missing {', '.join(missing)}"
+            merged = {col: incoming.get(col) for col in ATTRIBUTE_COLS}
+            if merged["failures_prev"] is None:
+                merged["failures_prev"] = 0
+            return merged, None
+
+        merged = {col: current[col] for col in ATTRIBUTE_COLS}
+        # Both in normalize_date() form, where string order is date order
+        snapshot = incoming.get("snapshot_date")
+        stored_snapshot = _stored_date(current["snapshot_date"])
+        if snapshot is not None and stored_snapshot is not None and snapshot < stored_snapshot:
+            return None, "stale"
+        newer = snapshot is not None and (stored_snapshot is None or snapshot > stored_snapshot)
+        if newer and "failures_prev" not in incoming:
+            # New snapshot: the previous snapshot's failure count becomes failures_prev
+            merged["failures_prev"] = current["num_prev_failures"]
+        merged.update(incoming)
+        return merged, None
+
+    # -------------------------
+    # Scoring
+    # -------------------------
+    def rescore(self, all_assets: bool = False, chunk_size: int = RESCORE_CHUNK) -> int:
+        """
+        Score every dirty asset (or all of them) and store the predictions.
+        Returns the number of assets scored; the ones that failed stay dirty
+        and are listed in rescore_errors.
+        """
+        if self.scorer is None:
+            raise RuntimeError("AssetStore has no scorer; pass one to rescore assets.")
+        where = "" if all_assets else " WHERE dirty = 1"
+        with self._lock:
+            asset_ids = [r[0] for r in self._conn.execute(f"SELECT asset_id FROM assets{where}")]
+
+        self.rescore_errors = {}
+        scored = 0
+        for i in range(0, len(asset_ids), chunk_size):
+            with self._lock:
+                rows = list(self._fetch(asset_ids[i:i + chunk_size]).values())
+            scored += self._score_rows(rows)
+        return scored
+
+    def _score_rows(self, rows: List[dict]) -> int:
+        """Score and store `rows`; on failure, each half on its own down to single rows."""
+        try:
+            predictions = self.scorer([{col: row[col] for col in ATTRIBUTE_COLS} for row in rows])
+        except Exception as exc:
+            if len(rows) == 1:
+                self.rescore_errors[rows[0]["asset_id"]] = str(exc)
+                return 0
+            half = len(rows) // 2
+            return self._score_rows(rows[:half]) + self._score_rows(rows[half:])
+        self._store_predictions(rows, predictions)
+        return len(rows)
+
+    def _store_predictions(self, rows: List[dict], predictions: List[dict]) -> None:
+        now = time.time()
+        assignments = ", ".join(f'"{c}" = ?' for c in PREDICTION_COLS)
+        with self._lock, self._conn:
+            # Only clear `dirty` if the row was not updated again while scoring
+            self._conn.executemany(
+                f"UPDATE assets SET {assignments}, scored_at = ?, "
+                "dirty = CASE WHEN attributes_hash = ? THEN 0 ELSE dirty END WHERE asset_id = ?",
+                [
+                    (*[self._sql_value(p[col]) for col in PREDICTION_COLS], now, row["attributes_hash"], row["asset_id"])
+                    for row, p in zip(rows, predictions)
+                ],
+            )
+
+    @staticmethod
+    def _sql_value(value):
+        # numpy scalars from the models -> plain Python for sqlite3
+        return value.item() if hasattr(value, "item") else value
+
+
+def read_csv_rows(csv_path) -> List[dict]:
+    """Attribute rows from a raw snapshot CSV (bay_area_infrastructure_balanced.csv layout)."""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.str.lower().str.strip().str.replace(" ", "_")
+    df = df[["asset_id"] + [c for c in ATTRIBUTE_COLS if c in df]].sort_values("snapshot_date", kind="stable")
+    return [
+        {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the scored asset inventory.")
+    parser.add_argument("--db", default=None, help=f"SQLite file (default $TUNNELVISION_ASSET_DB or {DEFAULT_DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="merge a snapshot CSV and rescore the assets that changed")
+    ingest.add_argument("csv")
+    rescore = sub.add_parser("rescore", help="score dirty assets")
+    rescore.add_argument("--all", action="store_true", help="rescore every asset")
+    args = parser.parse_args(argv)
+
+    from .api import score_assets
+
+    store = AssetStore(args.db, scorer=score_assets)
+    start = time.perf_counter()
+    if args.command == "ingest":
+        counts = store.upsert(read_csv_rows(args.csv))
+        errors = counts.pop("errors")
+        print(json.dumps({**counts, "errors": len(errors)}))
+    scored = store.rescore(all_assets=getattr(args, "all", False))
+    print(f"rescored {scored} of {store.count()} assets in {time.perf_counter() - start:.2f}s")
+    for asset_id, error in sorted(store.rescore_errors.items()):
+        print(f"could not score {asset_id}: {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
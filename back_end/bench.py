@@ -0,0 +1,287 @@
+"""
+Latency benchmarks for the /predict pipeline
+-----------------------------------
+Times every stage of a /predict call in process, without HTTP or the
+network (the weather provider is replaced by a constant stub):
+
+- geo.get_region_from_location
+- weather.get_temperature (stubbed provider, so only the wrapper is timed)
+- api.build_feature_dict (the heuristic feature block of api.predict),
+  and api.build_feature_dicts at batch sizes 1 / 100 / 10k
+- preprocess_df on one request, and its reindex to FEATURE_COLS
+- feature_pipeline.transform (what /predict uses instead of the two above)
+- each of the five predict_* functions on one preprocessed row
+- predict_all end to end for one request, and api.score_feature_dicts
+  (features + models) at batch sizes 1 / 100 / 10k
+
+Each benchmark is calibrated so one round takes at least --min-time,
+then timed for --rounds rounds (fewer if --max-time runs out); min,
+median, mean and p99 are per call. A benchmark that cannot run here
+(e.g. a model whose library is not installed) is recorded as skipped.
+
+Results are JSON tagged with the git commit, serving mode and model
+version, written to back_end/data/benchmarks/<commit>.json by default,
+so runs on two commits can be compared:
+
+    python -m back_end.bench run [-k predict] [--json PATH]
+    python -m back_end.bench compare OLD.json NEW.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .weather import DEFAULT_TEMPERATURE_C, TemperatureProvider
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "data" / "benchmarks"
+
+PAYLOAD = {
+    "type": "water_pipe",
+    "material": "cast_iron",
+    "soil_type": "clay",
+    "region": "San Francisco",
+    "install_year": 1975,
+    "last_repair_date": "2019-06-01",
+    "snapshot_date": "2025-01-01",
+}
+
+BATCH_SIZES = [1, 100, 10_000]
+
+# Benchmarks slower than this fraction versus the baseline are regressions
+REGRESSION_THRESHOLD = 0.10
+
+
+# -------------------------
+# Timing
+# -------------------------
+def time_callable(fn: Callable[[], object], rounds: int, min_time: float, max_time: float) -> dict:
+    """Per-call timings of `fn` over `rounds` calibrated rounds (asv style)."""
+    fn()  # warmup: lazy loads and first-use costs stay out of the numbers
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / number]
+    deadline = time.perf_counter() + max_time
+    while len(samples) < rounds and (len(samples) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    samples.sort()
+    return {
+        "min_s": samples[0],
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "p99_s": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "rounds": len(samples),
+        "number": number,
+    }
+
+
+class StubTemperatureProvider(TemperatureProvider):
+    """Constant temperature, so weather benchmarks never touch the network."""
+
+    def get_temperature(self, lat: float, lon: float) -> float:
+        return DEFAULT_TEMPERATURE_C
+
+
+# -------------------------
+# Benchmarks
+# -------------------------
+def benchmarks() -> Dict[str, Callable[[], Callable[[], object]]]:
+    """{name: setup}; each setup returns the zero-argument callable to time."""
+    import numpy as np
+    import pandas as pd
+
+    from . import api, model_utils
+    from .inference import (
+        predict_action,
+        predict_failure_30d,
+        predict_failure_type,
+        predict_priority,
+        predict_risk_score,
+    )
+    from .preprocessing import preprocess_df
+
+    model_utils.set_temperature_provider(StubTemperatureProvider())
+    request = api.PredictionRequest.model_validate(PAYLOAD)
+    feature_dict = api.build_feature_dict(request)
+    frame = pd.DataFrame([{"failures_prev": 0, **feature_dict}])
+    processed = preprocess_df(frame)
+    X_row = processed.reindex(columns=model_utils.FEATURE_COLS, fill_value=0)
+
+    def requests(n: int) -> List[api.PredictionRequest]:
+        # Spread over the Bay Area so rows differ
+        rng = np.random.RandomState(n)
+        return [
+            api.PredictionRequest.model_validate({**PAYLOAD, "region": None, "exact_location": [lat, lon]})
+            for lat, lon in zip(rng.uniform(37.2, 38.3, n), rng.uniform(-122.6, -121.7, n))
+        ]
+
+    def feature_dicts(n: int) -> List[dict]:
+        return [api.build_feature_dict(row) for row in requests(n)]
+
+    def end_to_end():
+        features = api.build_feature_dict(request)
+        return model_utils.predict_all(api.build_model_input([features]))
+
+    def batch_features(n: int):
+        rows = requests(n)
+        locations = [api.resolve_location(row) for row in rows]
+        return lambda: api.build_feature_dicts(rows, locations=locations)
+
+    def batch(n: int):
+        dicts = feature_dicts(n)
+        return lambda: api.score_feature_dicts(dicts)
+
+    def ready(fn):
+        return lambda: fn
+
+    suite = {
+        "geo.get_region_from_location": ready(lambda: model_utils.get_region_from_location(37.77, -122.42)),
+        "weather.get_temperature[stub]": ready(lambda: model_utils.get_temperature(37.77, -122.42)),
+        "api.build_feature_dict": ready(lambda: api.build_feature_dict(request)),
+        "preprocessing.preprocess_df": ready(lambda: preprocess_df(frame)),
+        "preprocessing.reindex_feature_cols": ready(
+            lambda: processed.reindex(columns=model_utils.FEATURE_COLS, fill_value=0)
+        ),
+        "feature_pipeline.transform": ready(lambda: api.build_model_input([feature_dict])),
+        "inference.predict_failure_30d": ready(lambda: predict_failure_30d(X_row)),
+        "inference.predict_failure_type": ready(lambda: predict_failure_type(X_row)),
+        "inference.predict_risk_score": ready(lambda: predict_risk_score(X_row)),
+        "inference.predict_action": ready(lambda: predict_action(X_row)),
+        "inference.predict_priority": ready(lambda: predict_priority(X_row)),
+        "predict_all[end_to_end]": ready(end_to_end),
+    }
+    for n in BATCH_SIZES:
+        suite[f"api.build_feature_dicts[{n}]"] = partial(batch_features, n)
+    for n in BATCH_SIZES:
+        suite[f"score_feature_dicts[{n}]"] = partial(batch, n)
+    return suite
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def run(pattern: Optional[str] = None, rounds: int = 20, min_time: float = 0.05, max_time: float = 10.0) -> dict:
+    from . import model_utils
+
+    results = {}
+    for name, setup in benchmarks().items():
+        if pattern and pattern not in name:
+            continue
+        try:
+            results[name] = time_callable(setup(), rounds, min_time, max_time)
+        except Exception as exc:
+            results[name] = {"skipped": f"{type(exc).__name__}: {exc}"}
+        _print_result(name, results[name])
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "serving_mode": model_utils.SERVING_MODE,
+        "model_version": model_utils.current_models().version,
+        "benchmarks": results,
+    }
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.0f} ns"
+
+
+def _print_result(name: str, result: dict) -> None:
+    if "skipped" in result:
+        print(f"{name:40s} skipped ({result['skipped']})")
+    else:
+        print(f"{name:40s} median {_format_seconds(result['median_s'])}  min {_format_seconds(result['min_s'])}  "
+              f"p99 {_format_seconds(result['p99_s'])}  ({result['rounds']} x {result['number']})")
+
+
+# -------------------------
+# Comparison
+# -------------------------
+def compare(old: dict, new: dict, threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """Median ratio new / old for every benchmark both runs measured."""
+    rows = []
+    for name, result in new["benchmarks"].items():
+        before = old["benchmarks"].get(name, {})
+        if "median_s" not in result or "median_s" not in before:
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        rows.append({
+            "name": name,
+            "old_s": before["median_s"],
+            "new_s": result["median_s"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the /predict pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="time every benchmark and write the results as JSON")
+    run_parser.add_argument("-k", dest="pattern", default=None, help="only benchmarks whose name contains this")
+    run_parser.add_argument("--rounds", type=int, default=20)
+    run_parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round (calibrated)")
+    run_parser.add_argument("--max-time", type=float, default=10.0, help="seconds per benchmark, after 3 rounds")
+    run_parser.add_argument("--json", default=None, help=f"results file (default {RESULTS_DIR}/<commit>.json)")
+    compare_parser = sub.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                                help="slowdown counted as a regression (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args.pattern, args.rounds, args.min_time, args.max_time)
+        path = Path(args.json or RESULTS_DIR / f"{report['commit'] or 'unknown'}.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {path}")
+        return 0
+
+    old, new = (json.loads(Path(p).read_text()) for p in (args.old, args.new))
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    rows = compare(old, new, args.threshold)
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:40s} {_format_seconds(row['old_s'])} -> {_format_seconds(row['new_s'])}  "
+              f"x{row['ratio']:.2f}{flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
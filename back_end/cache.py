@@ -0,0 +1,123 @@
+"""
+Prediction cache
+-----------------------------------
+LRU + TTL cache of /predict responses. The key is a hash of the resolved
+request (region, rounded location, snapshot and repair dates, type,
+material, soil_type, install_year, length_m) plus the model version, so
+re-submitted forms and dashboard polls skip the weather call, feature
+building and all five models.
+
+Entries are bounded by an approximate byte budget rather than a count.
+Activating another model version clears the cache (see
+model_utils.on_models_activated), and because the version is part of the
+key a stale entry can never be served for new models either.
+
+    TUNNELVISION_PREDICTION_CACHE_MB    memory budget (default 64; 0 disables)
+    TUNNELVISION_PREDICTION_CACHE_TTL   seconds (default 300)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+CACHE_MAX_BYTES = int(float(os.environ.get("TUNNELVISION_PREDICTION_CACHE_MB", 64)) * 1024 * 1024)
+CACHE_TTL = float(os.environ.get("TUNNELVISION_PREDICTION_CACHE_TTL", 300.0))
+
+# Locations closer than this many decimals share an entry (matches the weather cache)
+LOCATION_PRECISION = 2
+
+# Per-entry bookkeeping not captured by the payload size (dict slot, tuple, key)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def request_key(fields: dict, model_version: str) -> str:
+    """Canonical hash of resolved request fields plus the model version."""
+    canonical = json.dumps({"fields": fields, "model_version": model_version}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def round_location(lat: float, lon: float):
+    return round(lat, LOCATION_PRECISION), round(lon, LOCATION_PRECISION)
+
+
+class PredictionCache:
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        size = sys.getsizeof(key) + len(json.dumps(value, default=str)) + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self, *_) -> None:
+        """Drop every entry (registered as a model-activation callback)."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
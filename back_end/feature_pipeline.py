@@ -0,0 +1,235 @@
+"""
+Compiled feature pipeline for serving
+-----------------------------------
+preprocess_df + reindex(FEATURE_COLS) builds a DataFrame, parses dates,
+runs get_dummies and reindexes just to produce one short numeric vector.
+FeaturePipeline is compiled once from FEATURE_COLS and writes request
+dicts straight into a preallocated float32 matrix:
+
+- raw numeric columns are copied into their FEATURE_COLS slot
+- engineered columns are evaluated from the shared definitions in
+  features_schema.py in float64, cleaned/clipped as in training, then
+  cast once
+- one-hot slots come from precomputed (column, category) -> offset maps,
+  using the training vocabulary (the drop_first category and unknown
+  values leave every slot at 0)
+
+`python -m back_end.feature_pipeline` is the parity harness: it runs the
+training transform (models/train.build_features), preprocess_df and this
+pipeline over the full CSV and reports every column that diverges;
+tests/test_feature_pipeline.py runs the same checks on a fixed sample.
+"""
+
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from .features_schema import CATEGORICAL_COLS, ENGINEERED_COLS, clean, compute_engineered
+
+# Raw text / date columns: never numeric after preprocessing, always 0 here
+ZERO_COLS = ["asset_id", "tree_density", "issue_description", "snapshot_date", "last_repair_date"]
+
+# Raw inputs preprocess_df cannot run without
+REQUIRED_NUMERIC = [
+    "install_year",
+    "length_m",
+    "slope_grade",
+    "rainfall_mm",
+    "avg_temp_c",
+    "soil_moisture_pc",
+    "num_prev_failures",
+]
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(value, coerce: bool):
+    """(epoch ns, year) for a date string, or None when coerce and unparseable."""
+    import pandas as pd  # only once a request arrives, so importing the API stays cheap
+
+    ts = pd.to_datetime(value, errors="coerce" if coerce else "raise")
+    if pd.isna(ts):
+        return None
+    return ts.value, ts.year
+
+
+class FeaturePipeline:
+    def __init__(self, feature_cols: List[str]):
+        self.feature_cols = list(feature_cols)
+        self.n_features = len(self.feature_cols)
+        index = {name: i for i, name in enumerate(self.feature_cols)}
+
+        # (column, category) -> matrix offset
+        self.onehot_offsets = {}
+        for col in CATEGORICAL_COLS:
+            prefix = f"{col}_"
+            self.onehot_offsets[col] = {
+                name[len(prefix):]: i for name, i in index.items() if name.startswith(prefix)
+            }
+        onehot_slots = {i for offsets in self.onehot_offsets.values() for i in offsets.values()}
+
+        self.engineered = [(name, index[name]) for name in ENGINEERED_COLS if name in index]
+        self.passthrough = [
+            (name, i)
+            for name, i in index.items()
+            if name not in ZERO_COLS and name not in ENGINEERED_COLS and i not in onehot_slots
+        ]
+
+    def transform_one(self, row: dict) -> np.ndarray:
+        return self.transform([row])
+
+    def transform(self, rows: Iterable[dict], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Feature matrix (n_rows, len(FEATURE_COLS)) as float32.
+        `out` may be a preallocated float32 array of at least that shape.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        n = len(rows)
+        if out is None:
+            out = np.zeros((n, self.n_features), dtype=np.float32)
+        else:
+            out = out[:n]
+            out.fill(0)
+
+        def column(name, default=None):
+            if default is None:
+                values = [row[name] for row in rows]
+            else:
+                values = [row.get(name, default) for row in rows]
+            return np.array(values, dtype=np.float64)
+
+        values = {name: column(name) for name in REQUIRED_NUMERIC}
+        values["failures_prev"] = column("failures_prev", 0)
+
+        # --- Dates ---
+        snapshot = [_parse_date(row["snapshot_date"], False) for row in rows]
+        repair = [_parse_date(row["last_repair_date"], True) for row in rows]
+        values["snapshot_ns"] = np.array([s[0] for s in snapshot], dtype=np.int64)
+        values["snapshot_year"] = np.array([s[1] for s in snapshot], dtype=np.float64)
+        values["repair_ns"] = np.array([r[0] if r else 0 for r in repair], dtype=np.int64)
+        values["repaired"] = np.array([r is not None for r in repair], dtype=bool)
+
+        # --- Shared feature definitions (features_schema.py) ---
+        engineered = compute_engineered(values)
+
+        for name, i in self.engineered:
+            out[:, i] = clean(engineered[name])
+        for name, i in self.passthrough:
+            out[:, i] = clean(values[name] if name in values else column(name, 0))
+
+        # --- One-hot ---
+        for col, offsets in self.onehot_offsets.items():
+            for r, row in enumerate(rows):
+                value = row[col]
+                if value is not None:
+                    i = offsets.get(str(value))
+                    if i is not None:
+                        out[r, i] = 1.0
+
+        return out
+
+
+# -------------------------
+# Parity check against preprocess_df
+# -------------------------
+def _records(df) -> List[dict]:
+    """df rows as dicts, with NaN as None (a missing field in a request)."""
+    return [
+        {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+
+def request_rows(df) -> List[dict]:
+    """Raw CSV rows as request dicts, without the columns a request does not send."""
+    return _records(df.drop(columns=[c for c in ZERO_COLS if c not in ("snapshot_date", "last_repair_date")]))
+
+
+def reference_matrix(rows: List[dict], feature_cols: List[str]) -> np.ndarray:
+    import pandas as pd
+    from .preprocessing import preprocess_df
+
+    df_processed = preprocess_df(pd.DataFrame(rows))
+    df_processed = df_processed.drop(columns=["snapshot_date", "last_repair_date"], errors="ignore")
+    return df_processed.reindex(columns=feature_cols, fill_value=0).to_numpy(dtype=np.float32)
+
+
+def _mismatches(expected: np.ndarray, actual: np.ndarray, names: List[str], feature_cols: List[str]) -> dict:
+    """{column: rows that differ}, comparing float32 values bitwise."""
+    expected = np.ascontiguousarray(expected, dtype=np.float32)
+    diverged = {}
+    for j, name in enumerate(names):
+        i = feature_cols.index(name)
+        mismatch = expected[:, j].view(np.uint32) != actual[:, i].view(np.uint32)
+        if mismatch.any():
+            diverged[name] = int(mismatch.sum())
+    return diverged
+
+
+def diverging_columns(pipeline: FeaturePipeline, rows: List[dict], columns=None) -> dict:
+    """{column: rows that differ} between the pipeline and preprocess_df (bitwise)."""
+    names = columns if columns is not None else pipeline.feature_cols
+    expected = reference_matrix(rows, pipeline.feature_cols)
+    expected = expected[:, [pipeline.feature_cols.index(name) for name in names]]
+    return _mismatches(expected, pipeline.transform(rows), names, pipeline.feature_cols)
+
+
+def training_diverging_columns(pipeline: FeaturePipeline, csv_path) -> dict:
+    """
+    {column: rows that differ} between the training transform and the
+    serving pipeline, over every model feature. Each row is served the
+    failures_prev that training derived from the asset's history.
+    """
+    import pandas as pd
+    from .models.train import build_features
+
+    X, df, feature_cols = build_features(csv_path)
+    raw = pd.read_csv(csv_path)
+    rows = _records(raw.assign(failures_prev=df["failures_prev"].to_numpy()))
+    return _mismatches(X, pipeline.transform(rows), feature_cols, pipeline.feature_cols)
+
+
+def _report(label: str, diverged: dict) -> None:
+    print(f"{label}: " + ("OK" if not diverged else f"DIVERGED {diverged}"))
+
+
+def main(argv=None):
+    import argparse
+    from pathlib import Path
+    import joblib
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Check training/serving feature parity.")
+    parser.add_argument("--single-rows", type=int, default=500, help="rows to also check one at a time")
+    args = parser.parse_args(argv)
+
+    base_dir = Path(__file__).resolve().parent
+    csv_path = base_dir / "data" / "bay_area_infrastructure_balanced.csv"
+    feature_cols = joblib.load(base_dir / "feature_cols.pkl")
+    pipeline = FeaturePipeline(feature_cols)
+
+    # Training (groupby shift, clip) vs serving over every model feature
+    training = training_diverging_columns(pipeline, csv_path)
+    _report("training vs serving, full CSV", training)
+
+    rows = request_rows(pd.read_csv(csv_path))
+
+    # The full CSV contains every category, so get_dummies(drop_first=True)
+    # matches the training vocabulary and every column can be compared.
+    batch = diverging_columns(pipeline, rows)
+    _report(f"preprocess_df vs serving, batch of {len(rows)} rows", batch)
+
+    # A single-row get_dummies drops its only category, so preprocess_df
+    # leaves every one-hot slot at 0 there; compare the numeric columns.
+    numeric = [name for name, _ in pipeline.passthrough + pipeline.engineered]
+    sample = rows[:: max(len(rows) // max(args.single_rows, 1), 1)][: args.single_rows]
+    single = {}
+    for row in sample:
+        for name, count in diverging_columns(pipeline, [row], numeric).items():
+            single[name] = single.get(name, 0) + count
+    _report(f"preprocess_df vs serving, {len(sample)} single rows", single)
+    return 0 if not (training or batch or single) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+"""
+Streaming featurization
+-----------------------------------
+build_features and preprocess_df hold the whole CSV, plus a dense float64
+copy of the matrix, in memory. stream_features reads the CSV in chunks
+and appends each chunk's float32 rows to disk, so peak memory is one
+chunk plus per-asset state, whatever the file size:
+
+- failures_prev (the asset's previous snapshot) is carried across chunk
+  boundaries by FailureHistory, matching groupby("asset_id").shift(1)
+  over the whole file
+- one-hot columns come from a fixed vocabulary (a column list such as
+  FEATURE_COLS): each chunk is encoded with every category it contains
+  and reindexed to that list, so all chunks produce identical columns
+- kept string columns (asset_id, targets) are dictionary-encoded with
+  codes shared by every chunk
+
+The output is a flat file (inference/flatfile.py) with "X" plus the kept
+columns, which is the layout models/feature_cache.py reads.
+
+    python -m back_end.feature_stream CSV OUT [--layout training|serving] [--chunk-rows N]
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .features_schema import CATEGORICAL_COLS, CLIP_VALUE, TARGET_COLS
+from .inference.flatfile import save_arrays
+from .preprocessing import transform_frame
+
+STREAM_CHUNK_ROWS = 50_000
+
+# Parsed into datetimes by transform_frame; never model inputs
+_DATE_COLS = ["snapshot_date", "last_repair_date"]
+
+
+def read_chunks(csv_path: Path, chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """CSV chunks with column names normalized as in training."""
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        chunk.columns = chunk.columns.str.lower().str.strip().str.replace(" ", "_")
+        yield chunk
+
+
+class FailureHistory:
+    """Each asset's num_prev_failures at its latest snapshot seen so far."""
+
+    def __init__(self):
+        self.last: Dict[str, float] = {}
+
+    def failures_prev(self, chunk: pd.DataFrame) -> np.ndarray:
+        ids = chunk["asset_id"]
+        prev = chunk.groupby("asset_id")["num_prev_failures"].shift(1)
+        # An asset's first row in this chunk continues from the previous chunks
+        first = ~ids.duplicated()
+        prev[first] = ids[first].map(self.last)
+        latest = chunk.drop_duplicates("asset_id", keep="last")
+        self.last.update(zip(latest["asset_id"], latest["num_prev_failures"]))
+        return prev.fillna(0).to_numpy()
+
+
+def training_columns(frame: pd.DataFrame) -> List[str]:
+    """The columns build_features would select from a transformed frame."""
+    numeric_cols = frame.select_dtypes(include=["number"]).columns.tolist()
+    return [c for c in numeric_cols if c not in TARGET_COLS + ["asset_id"]]
+
+
+def chunk_matrix(frame: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """Float32 matrix of `columns`; absent one-hots and text columns are 0."""
+    frame = frame.drop(columns=_DATE_COLS, errors="ignore").reindex(columns=list(columns), fill_value=0)
+    text = frame.select_dtypes(exclude=["number", "bool"]).columns
+    if len(text):
+        frame[text] = 0
+    values = frame.to_numpy(dtype=np.float64)
+    values[~np.isfinite(values)] = 0.0
+    np.clip(values, -CLIP_VALUE, CLIP_VALUE, out=values)
+    return values.astype(np.float32)
+
+
+# -------------------------
+# One-hot vocabulary
+# -------------------------
+def scan_vocabulary(csv_path: Path, chunk_rows: int = STREAM_CHUNK_ROWS) -> Dict[str, list]:
+    """Sorted categories of every categorical column over the whole file."""
+    seen = {col: set() for col in CATEGORICAL_COLS}
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, usecols=lambda c: c.lower().strip() in seen):
+        chunk.columns = chunk.columns.str.lower().str.strip()
+        for col in CATEGORICAL_COLS:
+            seen[col].update(chunk[col].dropna().unique())
+    return {col: sorted(values) for col, values in seen.items()}
+
+
+def one_hot_columns(vocabulary: Dict[str, list], drop_first: bool = True) -> List[str]:
+    """get_dummies column names for `vocabulary`, in get_dummies order."""
+    return [
+        f"{col}_{value}"
+        for col in CATEGORICAL_COLS
+        for value in vocabulary[col][1 if drop_first else 0:]
+    ]
+
+
+def feature_columns(csv_path: Path, chunk_rows: int = STREAM_CHUNK_ROWS) -> List[str]:
+    """preprocess_df(whole CSV).columns without the targets, in one streamed pass."""
+    vocabulary = scan_vocabulary(csv_path, chunk_rows)
+    first = next(read_chunks(csv_path, chunk_rows))
+    frame = transform_frame(first, drop_first=False, failures_prev=np.zeros(len(first)))
+    encoded = set(one_hot_columns({col: list(first[col].dropna().unique()) for col in CATEGORICAL_COLS}, False))
+    base = [c for c in frame.columns if c not in encoded and c not in TARGET_COLS + _DATE_COLS]
+    return base + one_hot_columns(vocabulary)
+
+
+# -------------------------
+# Writer
+# -------------------------
+class _Spool:
+    """Appends one column's chunks to a raw file; strings become int32 codes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.dtype = None
+        self.codes: Optional[Dict] = None
+        self.rows = 0
+
+    def append(self, values: np.ndarray) -> None:
+        if self.dtype is None:
+            self.dtype = np.dtype(np.int32) if values.dtype == object else values.dtype
+            self.codes = {} if values.dtype == object else None
+        if self.codes is not None:
+            codes = np.empty(len(values), dtype=np.int32)
+            for i, value in enumerate(values):
+                # Missing values keep code -1
+                codes[i] = -1 if pd.isna(value) else self.codes.setdefault(value, len(self.codes))
+            values = codes
+        self.file.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+        self.rows += len(values)
+
+    def close(self, shape_tail=()) -> np.ndarray:
+        self.file.close()
+        if self.rows == 0:
+            return np.empty((0, *shape_tail), dtype=self.dtype or np.float32)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.rows, *shape_tail))
+
+    @property
+    def categories(self) -> Optional[list]:
+        return None if self.codes is None else list(self.codes)
+
+
+def stream_features(
+    csv_path: Path,
+    out_path: Path,
+    columns: Union[str, Sequence[str]] = "training",
+    keep: Sequence[str] = ("asset_id", *TARGET_COLS),
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    meta: Optional[dict] = None,
+) -> dict:
+    """
+    Featurize `csv_path` chunk by chunk into a flat file at `out_path`.
+
+    `columns` is "training" (build_features' columns, read off the first
+    chunk) or an explicit list such as FEATURE_COLS. `keep` columns that
+    exist in the CSV are stored alongside X. Returns summary stats.
+    """
+    start = time.perf_counter()
+    out_path = Path(out_path)
+    history = FailureHistory()
+    with tempfile.TemporaryDirectory(dir=out_path.parent, prefix=f".{out_path.name}.") as scratch:
+        x_spool = _Spool(Path(scratch) / "X")
+        spools: Dict[str, _Spool] = {}
+        chunks = 0
+        for chunk in read_chunks(csv_path, chunk_rows):
+            frame = transform_frame(chunk, drop_first=False, failures_prev=history.failures_prev(chunk))
+            if isinstance(columns, str):
+                columns = training_columns(frame)
+            if not spools:
+                spools = {col: _Spool(Path(scratch) / f"col{i}") for i, col in enumerate(keep) if col in chunk}
+            x_spool.append(chunk_matrix(frame, columns))
+            for col, spool in spools.items():
+                spool.append(chunk[col].to_numpy())
+            chunks += 1
+
+        if isinstance(columns, str):
+            raise ValueError(f"{csv_path} has no rows")
+        arrays = {"X": x_spool.close((len(columns),))}
+        categories = {}
+        for col, spool in spools.items():
+            arrays[col] = spool.close()
+            if spool.categories is not None:
+                categories[col] = spool.categories
+        save_arrays(out_path, arrays, {**(meta or {}), "feature_cols": list(columns), "categories": categories})
+
+    return {
+        "rows": int(arrays["X"].shape[0]),
+        "columns": len(columns),
+        "chunks": chunks,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    import argparse
+    import resource
+
+    parser = argparse.ArgumentParser(description="Featurize a CSV in chunks into a float32 flat file.")
+    parser.add_argument("csv")
+    parser.add_argument("out")
+    parser.add_argument("--layout", choices=["training", "serving"], default="training",
+                        help="training: build_features' columns; serving: FEATURE_COLS")
+    parser.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    if args.layout == "serving":
+        import joblib
+        columns = joblib.load(Path(__file__).resolve().parent / "feature_cols.pkl")
+    else:
+        columns = "training"
+    stats = stream_features(Path(args.csv), Path(args.out), columns, chunk_rows=args.chunk_rows)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{stats['rows']} rows x {stats['columns']} columns in {stats['chunks']} chunks, "
+          f"{stats['seconds']:.1f}s, peak RSS {peak_mb:.0f} MB, {os.path.getsize(args.out) / 1e6:.0f} MB written")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
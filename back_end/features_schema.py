@@ -5,12 +5,16 @@ This file is the single source of truth for:
 - feature names
 - feature order (CRITICAL)
 - expected types / notes
+- engineered feature definitions (training and serving)
 
 Both training code and the API should import and use this file
 so features never drift.
 """
 
-from typing import List, Dict, Any
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
 
 # ---------------------------------------------------------------------------
 # Feature order (DO NOT CHANGE without retraining all models)
@@ -76,3 +80,110 @@ def assert_feature_length(features: List[Any]) -> None:
         raise ValueError(
             f"Expected {len(FEATURE_ORDER)} features, got {len(features)}"
         )
+
+# ---------------------------------------------------------------------------
+# Engineered features (shared by training and serving)
+# ---------------------------------------------------------------------------
+# Every engineered column is declared once here. Both compiled forms read
+# these definitions:
+#   - preprocessing.transform_frame: vectorized DataFrame transform (training,
+#     preprocess_df)
+#   - feature_pipeline.FeaturePipeline: low-latency row transform (API)
+# Run `python -m back_end.feature_pipeline` to check the two stay in parity.
+#
+# Bump FEATURE_VERSION whenever a definition below changes.
+
+FEATURE_VERSION: int = 1
+
+CATEGORICAL_COLS: List[str] = ["type", "material", "soil_type", "region", "traffic"]
+
+# Raw numeric inputs, in CSV order
+RAW_NUMERIC_COLS: List[str] = [
+    "install_year",
+    "length_m",
+    "lat",
+    "long",
+    "slope_grade",
+    "rainfall_mm",
+    "avg_temp_c",
+    "soil_moisture_pc",
+    "num_prev_failures",
+]
+
+TARGET_COLS: List[str] = [
+    "failure_next_30d",
+    "failure_type_predicted",
+    "risk_score",
+    "recommended_action",
+    "recommended_priority",
+]
+
+# Training clips every numeric feature to +/- this value
+CLIP_VALUE: float = 1e6
+
+NS_PER_DAY: int = 86_400 * 1_000_000_000
+
+
+def days_between(snapshot_ns, repair_ns, repaired):
+    """Whole days from last repair to snapshot (floored), 999 when never repaired."""
+    return np.where(repaired, (snapshot_ns - repair_ns) // NS_PER_DAY, 999).astype(np.float64)
+
+
+@dataclass(frozen=True)
+class Feature:
+    name: str
+    inputs: Tuple[str, ...]
+    fn: Callable[..., Any]
+
+
+# Inputs available to the definitions besides RAW_NUMERIC_COLS:
+#   snapshot_ns / snapshot_year / repair_ns / repaired - parsed dates
+#   failures_prev - num_prev_failures of the asset's previous snapshot
+#                   (training: per-asset shift; serving: caller-supplied, default 0)
+ENGINEERED_FEATURES: List[Feature] = [
+    Feature("days_since_repair", ("snapshot_ns", "repair_ns", "repaired"), days_between),
+    Feature("asset_age_years", ("snapshot_year", "install_year"), lambda year, installed: np.maximum(year - installed, 0)),
+    Feature("failures_prev", ("failures_prev",), lambda prev: prev),
+    Feature("recent_repair", ("days_since_repair",), lambda days: (days < 180).astype(int)),
+    Feature("old_asset", ("asset_age_years",), lambda age: (age > 40).astype(int)),
+
+    # Environmental stress
+    Feature("rain_stress", ("rainfall_mm", "slope_grade"), lambda rain, slope: rain * slope),
+    Feature("moisture_stress", ("soil_moisture_pc", "slope_grade"), lambda moisture, slope: moisture * slope),
+    Feature("env_stress", ("rainfall_mm", "soil_moisture_pc"), lambda rain, moisture: rain * 0.4 + moisture * 0.6),
+    Feature("temp_stress", ("avg_temp_c", "slope_grade"), lambda temp, slope: temp * slope),
+
+    # Structural features
+    Feature("structural_risk", ("asset_age_years", "length_m"), lambda age, length: age * length),
+    Feature("length_age", ("length_m", "asset_age_years"), lambda length, age: length * age),
+    Feature("length_slope", ("length_m", "slope_grade"), lambda length, slope: length * slope),
+    Feature("failure_pressure", ("num_prev_failures", "days_since_repair"), lambda failures, days: failures * np.log1p(days)),
+
+    # Extra interaction features for risk_score
+    Feature("age_length_slope", ("asset_age_years", "length_m", "slope_grade"), lambda age, length, slope: age * length * slope),
+    Feature("failures_env_stress", ("failures_prev", "env_stress"), lambda prev, env: prev * env),
+    Feature("length_rain_stress", ("length_m", "rainfall_mm"), lambda length, rain: length * rain),
+    Feature("moisture_age", ("soil_moisture_pc", "asset_age_years"), lambda moisture, age: moisture * age),
+    Feature("struct_env_pressure", ("structural_risk", "env_stress"), lambda structural, env: structural * env),
+]
+
+ENGINEERED_COLS: List[str] = [f.name for f in ENGINEERED_FEATURES]
+
+
+def compute_engineered(columns: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluate ENGINEERED_FEATURES over 1-D arrays (one entry per row).
+    `columns` holds the inputs; returns {name: array} in declaration order.
+    """
+    columns = dict(columns)
+    out = {}
+    with np.errstate(all="ignore"):
+        for feature in ENGINEERED_FEATURES:
+            values = feature.fn(*(columns[name] for name in feature.inputs))
+            columns[feature.name] = out[feature.name] = values
+    return out
+
+
+def clean(values):
+    """Non-finite -> 0, then clip to +/- CLIP_VALUE (as training does)."""
+    return np.clip(np.where(np.isfinite(values), values, 0.0), -CLIP_VALUE, CLIP_VALUE)
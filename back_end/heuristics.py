@@ -0,0 +1,265 @@
+"""
+Heuristic inputs for API requests
+-----------------------------------
+A /predict request only carries the asset's type, material, soil, location,
+install year and last repair date. The model inputs it lacks are estimated
+here, as api.predict always has:
+
+- num_prev_failures / failures_prev: an age-band base (scaled by the
+  material and soil risk factors), plus a bonus for a long time since the
+  last repair and for high traffic on corrosive soil, capped at 18
+- rainfall_mm, slope_grade: wetter / steeper defaults for some regions
+- soil_moisture_pc: wetter default on clay
+
+estimate_heuristics() evaluates all of it over NumPy arrays for a whole
+batch: factors come from lookup tables over the batch's distinct values,
+age bands and repair bonuses from np.digitize, and every row is aged
+against one reference timestamp. estimate_one() is the original scalar
+cascade, kept as the reference; `python -m back_end.heuristics` and
+tests/test_heuristics.py check that both agree across every age band and
+repair-gap edge and every material, soil, region and traffic value.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# Material degradation factors
+MATERIAL_RISK = {
+    "cast_iron": 1.5,
+    "concrete": 1.3,
+    "steel": 1.2,
+    "pvc": 0.7,
+    "hdpe": 0.6,
+}
+
+# Soil corrosion factors
+SOIL_RISK = {
+    "clay": 1.4,
+    "sandy": 1.1,
+    "loam": 1.0,
+    "rocky": 0.9,
+}
+
+# Training data mean = 9; the cap is the max in training data
+MAX_BASE_FAILURES = 18
+
+WET_REGIONS = ["San Francisco", "Marin", "Sonoma"]
+STEEP_REGIONS = ["San Francisco", "Marin"]
+
+# Age bands (years, exclusive lower bounds) and base = int(offset + material * m + soil * s)
+AGE_BAND_EDGES = [10, 20, 30, 40, 50]
+AGE_BAND_OFFSET = np.array([0.0, 1.0, 3.0, 6.0, 9.0, 12.0])
+AGE_BAND_MATERIAL = np.array([0.0, 0.5, 1.0, 1.5, 2.0, 3.0])
+AGE_BAND_SOIL = np.array([0.0, 0.0, 0.0, 0.0, 1.0, 2.0])
+
+# More than 3 / 5 / 7 years since the last repair adds 1 / 2 / 3
+REPAIR_BONUS_EDGES = [365 * 3, 365 * 5, 365 * 7]
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+
+def estimate_one(
+    install_year: int,
+    last_repair_date: str,
+    material: str,
+    soil_type: str,
+    region: str,
+    traffic: str,
+    now: Optional[datetime] = None,
+) -> Dict[str, float]:
+    """Scalar reference for estimate_heuristics (one request)."""
+    import pandas as pd
+
+    now = now or datetime.now()
+    mat_factor = MATERIAL_RISK.get(material.lower(), 1.0)
+    soil_factor = SOIL_RISK.get(soil_type.lower(), 1.0)
+
+    # Quick estimate of asset age for failure calculation
+    asset_age = now.year - install_year
+    repaired = pd.to_datetime(last_repair_date)
+    if repaired.tzinfo is not None:
+        repaired = repaired.tz_convert(None)  # naive UTC, as parse_dates
+    days_since_repair = (now - repaired).days
+
+    if asset_age > 50:
+        base_failures = int(12 + mat_factor * 3 + soil_factor * 2)
+    elif asset_age > 40:
+        base_failures = int(9 + mat_factor * 2 + soil_factor * 1)
+    elif asset_age > 30:
+        base_failures = int(6 + mat_factor * 1.5)
+    elif asset_age > 20:
+        base_failures = int(3 + mat_factor)
+    elif asset_age > 10:
+        base_failures = int(1 + mat_factor * 0.5)
+    else:
+        base_failures = 0
+
+    # Add more if repair history is bad
+    if days_since_repair > 365 * 7:
+        base_failures += 3
+    elif days_since_repair > 365 * 5:
+        base_failures += 2
+    elif days_since_repair > 365 * 3:
+        base_failures += 1
+
+    # High traffic + problematic soil = more failures
+    if traffic == "high" and soil_factor > 1.2:
+        base_failures += 2
+
+    return {
+        "num_prev_failures": min(base_failures, MAX_BASE_FAILURES),
+        "rainfall_mm": 30.0 if region in WET_REGIONS else 20.0,
+        "soil_moisture_pc": 45.0 if soil_type.lower() == "clay" else 30.0,
+        "slope_grade": 4.0 if region in STEEP_REGIONS else 2.0,
+    }
+
+
+def _lookup(values: Sequence[str], table: Dict[str, float], default: float) -> np.ndarray:
+    """table[value.lower()] per row, evaluated once per distinct value."""
+    uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    return np.array([table.get(value.lower(), default) for value in uniques], dtype=np.float64)[inverse]
+
+
+def parse_dates(values: Sequence[str], errors: str = "raise") -> np.ndarray:
+    """
+    datetime64[ns] per date string, each parsed on its own as pd.to_datetime
+    does for a single value (batches repeat dates, so once per distinct value).
+    Dates with a UTC offset become naive UTC, so a batch may mix both kinds.
+    With errors="coerce", unparseable strings become NaT.
+    """
+    import pandas as pd
+
+    uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    # utc=True: naive values keep their wall time, aware ones are converted (Timestamp.value)
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object), format="mixed", errors=errors, utc=True)
+    return parsed.asi8.view("datetime64[ns]")[inverse]
+
+
+def unparseable(values: Sequence[str]) -> np.ndarray:
+    """
+    True where pd.to_datetime(value) raises. Strings such as "" or "NaT"
+    parse to NaT without raising, so only the NaT rows are re-checked.
+    Never raises itself: a batch's bad dates are reported row by row.
+    """
+    import pandas as pd
+
+    values = np.asarray(values, dtype=object)
+    bad = np.isnat(parse_dates(values, errors="coerce"))
+    for value in set(values[bad]):
+        try:
+            pd.to_datetime(value)
+        except (ValueError, TypeError, OverflowError):
+            continue
+        bad[values == value] = False
+    return bad
+
+
+def estimate_heuristics(
+    install_year: Sequence[int],
+    last_repair_date: Sequence[str],
+    material: Sequence[str],
+    soil_type: Sequence[str],
+    region: Sequence[str],
+    traffic: Sequence[str],
+    now: Optional[datetime] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    estimate_one over every row of a batch, one array per output. All rows
+    are aged against the same `now` (default: the current time, read once).
+    Repair dates must parse; invalid ones raise as in the scalar path.
+    """
+    now = now or datetime.now()
+    install_year = np.asarray(install_year)
+    mat_factor = _lookup(material, MATERIAL_RISK, 1.0)
+    soil_factor = _lookup(soil_type, SOIL_RISK, 1.0)
+
+    asset_age = now.year - install_year
+    # Floor division, like Timedelta.days; no repair date (NaT) earns no bonus
+    repaired = parse_dates(last_repair_date)
+    days_since_repair = (np.datetime64(now, "ns").astype(np.int64) - repaired.astype(np.int64)) // NS_PER_DAY
+    days_since_repair[np.isnat(repaired)] = 0
+
+    band = np.digitize(asset_age, AGE_BAND_EDGES, right=True)
+    base = np.trunc(AGE_BAND_OFFSET[band] + mat_factor * AGE_BAND_MATERIAL[band] + soil_factor * AGE_BAND_SOIL[band])
+    base = base.astype(np.int64)
+    base += np.digitize(days_since_repair, REPAIR_BONUS_EDGES, right=True)
+    base += np.where((np.asarray(traffic, dtype=object) == "high") & (soil_factor > 1.2), 2, 0)
+
+    region = np.asarray(region, dtype=object)
+    clay = np.array([value.lower() == "clay" for value in soil_type], dtype=bool)
+    return {
+        "num_prev_failures": np.minimum(base, MAX_BASE_FAILURES),
+        "rainfall_mm": np.where(np.isin(region, WET_REGIONS), 30.0, 20.0),
+        "soil_moisture_pc": np.where(clay, 45.0, 30.0),
+        "slope_grade": np.where(np.isin(region, STEEP_REGIONS), 4.0, 2.0),
+    }
+
+
+def parity_grid(now: datetime) -> list:
+    """
+    Rows of estimate_one arguments straddling every age band and repair-gap
+    edge, over every material, soil, region and traffic value (plus unknown
+    ones). Repair dates mix plain dates, UTC offsets, "" and "NaT".
+    """
+    import itertools
+    from datetime import timedelta
+
+    materials = list(MATERIAL_RISK) + ["Cast_Iron", "copper", "unknown"]
+    soils = list(SOIL_RISK) + ["CLAY", "silt"]
+    regions = WET_REGIONS + ["Santa Clara", "Alameda"]
+    traffics = ["high", "medium", "low"]
+    years = [now.year - age for age in range(-1, 62)]
+    repairs = [(now - timedelta(days=days)).strftime("%Y-%m-%d") for days in range(-2, 365 * 8, 91)]
+    repairs += ["", "NaT"] + [(now - timedelta(days=days)).strftime("%Y-%m-%d") for edge in REPAIR_BONUS_EDGES for days in (edge, edge + 1)]
+    repairs += [(now - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S+05:00") for edge in REPAIR_BONUS_EDGES for days in (edge, edge + 1)]
+
+    # Every (age, repair gap) pair, each with 4 categorical combinations cycling through all of them
+    categorical = list(itertools.product(materials, soils, regions, traffics))
+    return [
+        (year, repair) + categorical[(p * 4 + t) % len(categorical)]
+        for p, (year, repair) in enumerate(itertools.product(years, repairs))
+        for t in range(4)
+    ]
+
+
+def diverging_rows(grid: list, now: datetime) -> list:
+    """Indices of the grid rows where estimate_heuristics and estimate_one disagree."""
+    vectorized = estimate_heuristics(*zip(*grid), now=now)
+    return [
+        i
+        for i, row in enumerate(grid)
+        if any(vectorized[name][i] != value for name, value in estimate_one(*row, now=now).items())
+    ]
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Check the vectorized heuristics against the scalar cascade.")
+    parser.add_argument("--rows", type=int, default=5_000, help="rows for the throughput comparison")
+    args = parser.parse_args(argv)
+
+    now = datetime.now()
+    grid = parity_grid(now)
+    mismatches = len(diverging_rows(grid, now))
+    print(f"{len(grid)} combinations: " + ("OK" if not mismatches else f"{mismatches} DIVERGED"))
+
+    rng = np.random.RandomState(0)
+    sample = [grid[i] for i in rng.randint(0, len(grid), args.rows)]
+    start = time.perf_counter()
+    for row in sample:
+        estimate_one(*row, now=now)
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    estimate_heuristics(*zip(*sample), now=now)
+    vector_seconds = time.perf_counter() - start
+    print(f"{args.rows} rows: scalar {scalar_seconds:.3f}s, vectorized {vector_seconds:.3f}s "
+          f"({scalar_seconds / vector_seconds:.0f}x)")
+    return 0 if not mismatches else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
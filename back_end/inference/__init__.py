@@ -0,0 +1,36 @@
+"""
+Inference-only model package
+-----------------------------------
+Loads the trained artifacts saved in back_end/models/ and exposes the
+predict_* functions. Nothing here trains, so importing it is cheap
+enough for every API worker boot. Retrain with `python -m back_end.models`.
+
+Each model has a single-row predict_* function and a *_batch variant
+that scores every row of X in one estimator call. Artifacts are loaded
+once into the shared `registry`; the *_batch variants also accept a
+`models=` ModelSet so a caller can pin every model to one version.
+"""
+
+from .registry import ModelRegistry, ModelSet, registry
+
+from .action import predict_action, predict_action_batch
+from .failure_30d import predict_failure_30d, predict_failure_30d_batch
+from .failure_type import predict_failure_type, predict_failure_type_batch
+from .priority import predict_priority, predict_priority_batch
+from .risk_score import predict_risk_score, predict_risk_score_batch
+
+__all__ = [
+    "ModelRegistry",
+    "ModelSet",
+    "registry",
+    "predict_action",
+    "predict_action_batch",
+    "predict_failure_30d",
+    "predict_failure_30d_batch",
+    "predict_failure_type",
+    "predict_failure_type_batch",
+    "predict_priority",
+    "predict_priority_batch",
+    "predict_risk_score",
+    "predict_risk_score_batch",
+]
@@ -0,0 +1,164 @@
+"""
+Cold-start check for the API
+-----------------------------------
+Starts fresh interpreters that do what a restarted uvicorn worker does,
+once per serving mode:
+
+- estimators: unpickles the sklearn / XGBoost models
+- fused:      maps fused_ensemble.bin; needs only NumPy for the models
+
+Each run times `import back_end.api` (when the port can open and static
+pages are served) and the background startup tasks and warmup until
+/ready would flip (see back_end/startup.py), and reports the worker's peak RSS and
+which of sklearn / xgboost / scipy it imported. Exits non-zero when a
+mode's median time to ready exceeds the target, or when fused mode
+imports any of them.
+
+--importtime adds one `python -X importtime` run per mode and lists the
+slowest packages to import, separately for the import of back_end.api and
+for the startup tasks. --json writes everything to a report; the one in
+back_end/data/cold_start_report.json is committed so changes in
+cold-start time show up in review.
+
+    python -m back_end.inference [--runs 5] [--target 10] [--modes estimators fused] [--importtime] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# A restarted worker should be serving again within this many seconds
+COLD_START_TARGET_S = 10.0
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+MODES = ("estimators", "fused")
+
+# Libraries only the estimators need; fused serving must not import them
+HEAVY_MODULES = ("sklearn", "xgboost", "scipy")
+
+# Marks the end of `import back_end.api` in -X importtime output
+IMPORTED_MARKER = "--- back_end.api imported ---"
+
+# Runs in each fresh interpreter
+PROBE = f"""
+import json, resource, sys, time
+start = time.perf_counter()
+import back_end.api
+imported = time.perf_counter() - start
+print({IMPORTED_MARKER!r}, file=sys.stderr, flush=True)
+back_end.api.startup.wait(warm=True)
+print(json.dumps({{
+    "import_seconds": imported,
+    "ready_seconds": time.perf_counter() - start,
+    "tasks": {{name: task["seconds"] for name, task in back_end.api.startup.status()["tasks"].items()}},
+    "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "heavy_modules": sorted({{m.split(".")[0] for m in sys.modules}} & set({HEAVY_MODULES!r})),
+}}))
+"""
+
+
+def _run_probe(mode: str = None, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    if mode is not None:
+        env["TUNNELVISION_SERVING_MODE"] = mode
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, "-W", "ignore", *flags, "-c", PROBE],
+        cwd=REPO_ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def measure_cold_start(runs: int = 5, mode: str = None) -> list:
+    """One probe report per fresh interpreter, plus its wall "seconds"."""
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = _run_probe(mode)
+        seconds = time.perf_counter() - start
+        results.append({"seconds": seconds, **json.loads(out.stdout.strip().splitlines()[-1])})
+    return results
+
+
+def parse_importtime(stderr: str, top: int = 15) -> dict:
+    """
+    {"import": [...], "startup": [...]}: seconds spent importing each
+    top-level package (the self time of all its modules), slowest first,
+    before and after IMPORTED_MARKER.
+    """
+    phases = {"import": {}, "startup": {}}
+    phase = "import"
+    for line in stderr.splitlines():
+        if line.strip() == IMPORTED_MARKER:
+            phase = "startup"
+            continue
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header
+        package = name.strip().split(".")[0]
+        phases[phase][package] = phases[phase].get(package, 0) + int(self_us) / 1e6
+    return {
+        phase: sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+        for phase, modules in phases.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API cold-start time and memory per serving mode.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=COLD_START_TARGET_S, help="seconds until ready")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports per mode")
+    parser.add_argument("--top", type=int, default=15, help="imports listed per phase with --importtime")
+    parser.add_argument("--json", default=None, help="write the report here")
+    args = parser.parse_args(argv)
+
+    mb = 1024 * 1024
+    report = {"python": platform.python_version(), "cpu_count": os.cpu_count(), "modes": {}}
+    ok = True
+    for mode in args.modes:
+        results = measure_cold_start(args.runs, mode)
+        summary = {
+            "runs": len(results),
+            "import_seconds_median": statistics.median(r["import_seconds"] for r in results),
+            "ready_seconds_median": statistics.median(r["ready_seconds"] for r in results),
+            "process_seconds_median": statistics.median(r["seconds"] for r in results),
+            "task_seconds_median": {
+                name: statistics.median(r["tasks"][name] for r in results) for name in results[0]["tasks"]
+            },
+            "peak_rss_bytes_median": statistics.median(r["peak_rss_bytes"] for r in results),
+            "heavy_modules": sorted({m for r in results for m in r["heavy_modules"]}),
+        }
+        tasks = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["task_seconds_median"].items())
+        print(f"{mode:>10}: import {summary['import_seconds_median']:.2f}s, ready {summary['ready_seconds_median']:.2f}s "
+              f"(tasks: {tasks}), process {summary['process_seconds_median']:.2f}s, median of {len(results)} "
+              f"(target {args.target:.1f}s) | peak RSS {summary['peak_rss_bytes_median'] / mb:.0f} MB | "
+              f"imports {', '.join(summary['heavy_modules']) or 'none of ' + '/'.join(HEAVY_MODULES)}")
+        if args.importtime:
+            summary["importtime"] = parse_importtime(_run_probe(mode, importtime=True).stderr, args.top)
+            for phase, modules in summary["importtime"].items():
+                print(f"{'':>12}slowest imports ({phase}): "
+                      + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in modules))
+        report["modes"][mode] = summary
+        ok = ok and summary["ready_seconds_median"] <= args.target and not (mode == "fused" and summary["heavy_modules"])
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Report written to {args.json}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
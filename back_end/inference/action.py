@@ -0,0 +1,11 @@
+import numpy as np
+from .registry import registry
+
+def predict_action_batch(X, models=None) -> np.ndarray:
+    models = registry.current() if models is None else models
+    artifact = models["action"]
+    action_idx = artifact.model.predict(models.features_for("action", X))
+    return artifact.classes[action_idx]
+
+def predict_action(X) -> str:
+    return predict_action_batch(X)[0]
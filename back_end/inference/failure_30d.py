@@ -0,0 +1,18 @@
+import numpy as np
+from .registry import registry
+
+def predict_failure_30d_batch(X, models=None) -> np.ndarray:
+    """
+    Predict failure in next 30 days for every row of X
+    X: preprocessed DataFrame (or matrix) aligned to FEATURE_COLS
+    """
+    models = registry.current() if models is None else models
+    model = models["failure_30d"].model
+    return model.predict(models.features_for("failure_30d", X)).astype(bool)
+
+def predict_failure_30d(X) -> bool:
+    """
+    Predict if failure will occur in next 30 days
+    X: preprocessed DataFrame with one row
+    """
+    return bool(predict_failure_30d_batch(X)[0])
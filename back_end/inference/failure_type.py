@@ -0,0 +1,11 @@
+import numpy as np
+from .registry import registry
+
+def predict_failure_type_batch(X, models=None) -> np.ndarray:
+    models = registry.current() if models is None else models
+    artifact = models["failure_type"]
+    prediction_idx = artifact.model.predict(models.features_for("failure_type", X))
+    return artifact.classes[prediction_idx]
+
+def predict_failure_type(X) -> str:
+    return predict_failure_type_batch(X)[0]
@@ -0,0 +1,78 @@
+"""
+Flat, memory-mappable array file
+-----------------------------------
+Layout:
+    b"TVFLAT01"            magic
+    uint64 (little endian) length of the JSON header
+    JSON header            {"arrays": {name: {dtype, shape, offset}}, "meta": {...}}
+    raw array bytes        C order, each starting on an ALIGN-byte boundary
+
+load_arrays maps the file read-only and returns ndarray views into it, so
+nothing is copied or unpickled: pages are faulted in from the page cache
+on first use and shared by every process mapping the same file (e.g. all
+uvicorn workers).
+
+save_arrays writes to a temporary file and renames it into place, so
+processes that already mapped the old file keep a consistent view.
+"""
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+MAGIC = b"TVFLAT01"
+ALIGN = 64
+
+# Arrays are written in blocks of this size, so memory-mapped inputs
+# larger than RAM can be saved
+WRITE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def save_arrays(path: Path, arrays: Dict[str, np.ndarray], meta: dict) -> None:
+    path = Path(path)
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    # Offsets depend on the header length, which depends on the offsets:
+    # reserve room for the header first, then lay the arrays out after it.
+    specs = {name: {"dtype": a.dtype.str, "shape": list(a.shape), "offset": 0} for name, a in arrays.items()}
+    header_len = len(json.dumps({"arrays": specs, "meta": meta}).encode()) + 32 * len(specs)
+    offset = _aligned(len(MAGIC) + 8 + header_len)
+    for name, a in arrays.items():
+        specs[name]["offset"] = offset
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps({"arrays": specs, "meta": meta}).encode().ljust(header_len)
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, a in arrays.items():
+            f.write(b"\0" * (specs[name]["offset"] - f.tell()))
+            flat = a.reshape(-1)
+            step = max(1, WRITE_BLOCK_BYTES // max(a.itemsize, 1))
+            for start in range(0, len(flat), step):
+                f.write(flat[start:start + step].tobytes())
+    os.replace(tmp, path)
+
+
+def load_arrays(path: Path) -> Tuple[Dict[str, np.ndarray], dict]:
+    """Read-only views into a memory map of `path`, plus the metadata."""
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buffer[: len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a flat array file")
+    (header_len,) = struct.unpack("<Q", bytes(buffer[len(MAGIC): len(MAGIC) + 8]))
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[start: start + header_len]))
+
+    arrays = {
+        name: np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=buffer, offset=spec["offset"])
+        for name, spec in header["arrays"].items()
+    }
+    return arrays, header["meta"]
@@ -0,0 +1,451 @@
+"""
+Fused tree-ensemble evaluator
+-----------------------------------
+Converts all five models (RF classifier, two XGBoost softprob classifiers,
+GBR, RF regressor) into one set of flat node arrays. Every tree of every
+model is walked together, level by level, over the shared FEATURE_COLS
+vector, so a request costs a handful of NumPy gathers instead of five
+estimator dispatches.
+
+Node layout (one entry per node, all trees concatenated):
+    feature   int32    column of the FEATURE_COLS matrix
+    threshold float32  go left when x <= threshold
+    children  int32    (left, right) global child indices, interleaved;
+                       leaves point at themselves
+    value     float64  (n_nodes, 2) leaf outputs, pre-scaled per model
+
+sklearn splits on `x <= t` with a float64 t; XGBoost on `x < t` with a
+float32 t. Both are rewritten as `x <= t'` with t' the largest float32
+that keeps the same decision for float32 inputs. Leaf sums are accumulated
+in the same order (and, for XGBoost, the same float32 precision) as the
+original estimators.
+
+Tolerance: on validation the fused outputs must match the estimators
+exactly for every label (failure_in_30_days, failure_type, action), within
+PROBA_TOLERANCE for class probabilities and REGRESSION_TOLERANCE for the
+raw risk_score / priority. Inputs must be finite (FeaturePipeline ensures
+this), since missing-value routing is not modelled.
+
+The artifact is a flat file (flatfile.py) that is memory-mapped
+read-only, so API workers share its pages instead of each unpickling the
+estimators into private memory. Loading and evaluating it needs only
+NumPy: a server in fused mode never imports sklearn, xgboost or scipy
+(see requirements-serve.txt), as long as the artifact is in sync with
+the .pkl files it was built from.
+
+    python -m back_end.inference.fused [--model-dir DIR]           # convert the .pkl files, validate, save DIR/fused_ensemble.bin
+    python -m back_end.inference.fused --check [--model-dir DIR]   # validate the saved DIR/fused_ensemble.bin only
+"""
+
+import hashlib
+import json
+import warnings
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from .flatfile import load_arrays, save_arrays
+from .registry import MODEL_DIR, MODEL_FILES, ModelRegistry
+
+FUSED_PATH = MODEL_DIR / "fused_ensemble.bin"
+
+ARRAY_NAMES = ("feature", "threshold", "children", "value", "roots")
+
+PROBA_TOLERANCE = 1e-6
+REGRESSION_TOLERANCE = 1e-9
+
+# Rows walked per block; bounds the (rows x trees) index arrays
+BLOCK_ROWS = 256
+
+
+def _le_threshold(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 t' with (x <= t') == (x <= threshold) for float32 x."""
+    t32 = threshold.astype(np.float32)
+    too_high = t32.astype(np.float64) > threshold
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+
+def _lt_threshold(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 t' with (x <= t') == (x < threshold) for float32 x."""
+    return np.nextafter(threshold.astype(np.float32), np.float32(-np.inf))
+
+
+class _Builder:
+    def __init__(self):
+        self.feature, self.threshold, self.left, self.right, self.value = [], [], [], [], []
+        self.roots = []
+        self.n_nodes = 0
+
+    def add_tree(self, feature, threshold, left, right, value, is_leaf):
+        offset = self.n_nodes
+        n = len(feature)
+        own = np.arange(n) + offset
+        self.roots.append(offset)
+        self.feature.append(np.where(is_leaf, 0, feature).astype(np.int32))
+        self.threshold.append(np.where(is_leaf, np.float32(np.inf), threshold).astype(np.float32))
+        self.left.append(np.where(is_leaf, own, left + offset).astype(np.int32))
+        self.right.append(np.where(is_leaf, own, right + offset).astype(np.int32))
+        padded = np.zeros((n, 2))
+        padded[:, : value.shape[1]] = value
+        self.value.append(padded)
+        self.n_nodes += n
+
+    def add_sklearn_tree(self, tree, column_index, value):
+        is_leaf = tree.children_left == -1
+        self.add_tree(
+            column_index[np.maximum(tree.feature, 0)],
+            _le_threshold(tree.threshold),
+            tree.children_left,
+            tree.children_right,
+            value,
+            is_leaf,
+        )
+
+    def add_xgb_tree(self, tree, column_index):
+        left = np.array(tree["left_children"])
+        is_leaf = left == -1
+        conditions = np.array(tree["split_conditions"], dtype=np.float32)
+        self.add_tree(
+            column_index[np.array(tree["split_indices"])],
+            _lt_threshold(conditions),
+            left,
+            np.array(tree["right_children"]),
+            np.where(is_leaf, conditions, 0).astype(np.float64)[:, None],
+            is_leaf,
+        )
+
+
+def _base_score(learner_model_param: dict) -> np.ndarray:
+    """
+    One base margin per class. XGBoost >= 3 stores a vector ("[5E-1,5E-1]"),
+    older versions one scalar ("5E-1") shared by every class.
+    """
+    base = np.atleast_1d(np.array(json.loads(learner_model_param["base_score"]), dtype=np.float32))
+    n_classes = max(int(learner_model_param.get("num_class", 0) or 0), 1)
+    return np.repeat(base, n_classes) if len(base) == 1 else base
+
+
+def _xgb_model(model) -> dict:
+    learner = json.loads(model.get_booster().save_raw("json"))["learner"]
+    return {
+        "base_score": _base_score(learner["learner_model_param"]),
+        "trees": learner["gradient_booster"]["model"]["trees"],
+        "tree_info": learner["gradient_booster"]["model"]["tree_info"],
+    }
+
+
+class FusedEnsemble:
+    def __init__(
+        self,
+        arrays: Dict[str, np.ndarray],
+        max_depth: int,
+        groups: List[dict],
+        feature_cols: List[str],
+        sources: Dict[str, str] = None,
+    ):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        # (left, right) interleaved, so one gather picks the next node
+        self.children = arrays["children"]
+        self.left = self.children[0::2]
+        self.right = self.children[1::2]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = max_depth
+        self.groups = {g["name"]: g for g in groups}
+        self.feature_cols = list(feature_cols)
+        # sha256 of each source .pkl, to detect a stale fused artifact
+        self.sources = sources or {}
+
+    # -------------------------
+    # Conversion
+    # -------------------------
+    @classmethod
+    def from_registry(cls, registry) -> "FusedEnsemble":
+        return cls.from_models(registry.current())
+
+    @classmethod
+    def from_models(cls, models) -> "FusedEnsemble":
+        """Convert one loaded ModelSet."""
+        builder = _Builder()
+        groups = []
+
+        def start(name, kind, **meta):
+            groups.append({"name": name, "kind": kind, "tree_start": len(builder.roots), **meta})
+
+        def end():
+            groups[-1]["tree_end"] = len(builder.roots)
+
+        # failure_30d: RandomForestClassifier, leaf values are class fractions
+        artifact = models["failure_30d"]
+        start("failure_30d", "forest_classifier", classes=artifact.model.classes_.tolist())
+        for est in artifact.model.estimators_:
+            value = est.tree_.value[:, 0, :]
+            normalizer = value.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+            builder.add_sklearn_tree(est.tree_, artifact.column_index, value / normalizer)
+        end()
+
+        # risk_score: GradientBoostingRegressor, baseline + learning_rate * leaf
+        artifact = models["risk_score"]
+        model = artifact.model
+        baseline = float(model.init_.predict(np.zeros((1, model.n_features_in_)))[0])
+        start("risk_score", "gradient_boosting", baseline=baseline)
+        for est in model.estimators_[:, 0]:
+            builder.add_sklearn_tree(est.tree_, artifact.column_index, model.learning_rate * est.tree_.value[:, 0, :])
+        end()
+
+        # priority: RandomForestRegressor, mean of leaves
+        artifact = models["priority"]
+        start("priority", "forest_regressor")
+        for est in artifact.model.estimators_:
+            builder.add_sklearn_tree(est.tree_, artifact.column_index, est.tree_.value[:, 0, :])
+        end()
+
+        # failure_type / action: XGBoost multi:softprob, one tree per class per round
+        for name in ("failure_type", "action"):
+            artifact = models[name]
+            xgb = _xgb_model(artifact.model)
+            n_classes = len(xgb["base_score"])
+            rounds = len(xgb["trees"]) // n_classes
+            if xgb["tree_info"] != list(range(n_classes)) * rounds:
+                raise ValueError(f"{name}: unsupported XGBoost tree layout")
+            start(
+                name,
+                "xgb_softprob",
+                base_score=xgb["base_score"].tolist(),
+                classes=[str(c) for c in artifact.classes[artifact.model.classes_]],
+            )
+            for tree in xgb["trees"]:
+                builder.add_xgb_tree(tree, artifact.column_index)
+            end()
+
+        arrays = {
+            "feature": np.concatenate(builder.feature),
+            "threshold": np.concatenate(builder.threshold),
+            "children": np.stack([np.concatenate(builder.left), np.concatenate(builder.right)], axis=1).ravel(),
+            "value": np.concatenate(builder.value),
+            "roots": np.array(builder.roots, dtype=np.int32),
+        }
+        max_depth = cls._max_depth(arrays)
+        return cls(arrays, max_depth, groups, models.feature_cols, source_hashes(models.model_dir))
+
+    @staticmethod
+    def _max_depth(arrays) -> int:
+        left, right = arrays["children"][0::2], arrays["children"][1::2]
+        frontier, depth = arrays["roots"], 0
+        while True:
+            internal = frontier[left[frontier] != frontier]
+            if len(internal) == 0:
+                return depth
+            frontier = np.concatenate([left[internal], right[internal]])
+            depth += 1
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def save(self, path: Path = FUSED_PATH) -> None:
+        meta = {
+            "max_depth": self.max_depth,
+            "groups": list(self.groups.values()),
+            "feature_cols": self.feature_cols,
+            "sources": self.sources,
+        }
+        save_arrays(path, {name: getattr(self, name) for name in ARRAY_NAMES}, meta)
+
+    @classmethod
+    def load(cls, path: Path = FUSED_PATH) -> "FusedEnsemble":
+        """Map `path` read-only; the node arrays are views into the page cache."""
+        arrays, meta = load_arrays(path)
+        return cls(arrays, meta["max_depth"], meta["groups"], meta["feature_cols"], meta["sources"])
+
+    # -------------------------
+    # Evaluation
+    # -------------------------
+    def as_matrix(self, X) -> np.ndarray:
+        if isinstance(X, np.ndarray):
+            return X
+        if list(X.columns) != self.feature_cols:
+            X = X.reindex(columns=self.feature_cols, fill_value=0)
+        return X.to_numpy(dtype=np.float64)
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_trees) global leaf index reached by every tree."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_cols = X.shape
+        idx = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        # Flat offsets into X.ravel(); np.take on 1-D arrays is much cheaper
+        # than 2-D fancy indexing
+        row_offset = (np.arange(n, dtype=np.int64) * n_cols)[:, None]
+        flat = X.ravel()
+        for _ in range(self.max_depth):
+            x = np.take(flat, row_offset + np.take(self.feature, idx))
+            go_right = x > np.take(self.threshold, idx)
+            idx = np.take(self.children, 2 * idx + go_right)
+        return idx
+
+    def _evaluate_block(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        idx = self.leaves(X)
+        n = idx.shape[0]
+        out = {}
+        for name, group in self.groups.items():
+            values = self.value[idx[:, group["tree_start"]:group["tree_end"]]]
+            n_trees = values.shape[1]
+            kind = group["kind"]
+            # Sums are sliced off full cumsums (same order as the estimators);
+            # the slices are copied or divided so the cumsums can be freed
+            if kind == "forest_classifier":
+                out[name] = np.cumsum(values, axis=1)[:, -1, :] / n_trees
+            elif kind == "forest_regressor":
+                out[name] = np.cumsum(values[:, :, 0], axis=1)[:, -1] / n_trees
+            elif kind == "gradient_boosting":
+                stacked = np.concatenate([np.full((n, 1), group["baseline"]), values[:, :, 0]], axis=1)
+                out[name] = np.cumsum(stacked, axis=1)[:, -1].copy()
+            elif kind == "xgb_softprob":
+                base = np.array(group["base_score"], dtype=np.float32)
+                k = len(base)
+                per_round = values[:, :, 0].astype(np.float32).reshape(n, n_trees // k, k)
+                stacked = np.concatenate([np.broadcast_to(base, (n, 1, k)), per_round], axis=1)
+                out[name] = np.cumsum(stacked, axis=1, dtype=np.float32)[:, -1, :].copy()
+        return out
+
+    def predict(self, X) -> Dict[str, np.ndarray]:
+        """
+        Every model's output for each row of X (aligned to FEATURE_COLS):
+        failure_30d_proba, failure_30d, failure_type_proba, failure_type,
+        action_proba, action, risk_score (raw), priority (raw).
+        """
+        X = self.as_matrix(X)
+        blocks = [self._evaluate_block(X[i:i + BLOCK_ROWS]) for i in range(0, max(len(X), 1), BLOCK_ROWS)]
+        raw = {name: np.concatenate([b[name] for b in blocks]) for name in self.groups}
+
+        out = {
+            "failure_30d_proba": raw["failure_30d"],
+            "failure_30d": np.array(self.groups["failure_30d"]["classes"])[np.argmax(raw["failure_30d"], axis=1)].astype(bool),
+            "risk_score": raw["risk_score"],
+            "priority": raw["priority"],
+        }
+        for name in ("failure_type", "action"):
+            margin = raw[name]
+            exp = np.exp(margin - margin.max(axis=1, keepdims=True))
+            proba = exp / exp.sum(axis=1, keepdims=True)
+            out[f"{name}_proba"] = proba
+            out[name] = np.array(self.groups[name]["classes"])[np.argmax(margin, axis=1)]
+        return out
+
+
+def source_hashes(model_dir: Path = MODEL_DIR) -> Dict[str, str]:
+    hashes = {}
+    for files in MODEL_FILES.values():
+        for name in files:
+            if name is not None:
+                hashes[name] = hashlib.sha256((Path(model_dir) / name).read_bytes()).hexdigest()
+    return hashes
+
+
+def load_fused_ensemble(model_dir: Path = MODEL_DIR) -> FusedEnsemble:
+    """
+    Load the fused artifact saved in `model_dir`, rebuilding it from the
+    estimators there when it is missing or was built from different .pkl
+    files.
+    """
+    path = Path(model_dir) / FUSED_PATH.name
+    if path.exists():
+        fused = FusedEnsemble.load(path)
+        if fused.sources == source_hashes(model_dir):
+            return fused
+        warnings.warn(f"{path} is stale; rebuilding from the estimators (run python -m back_end.inference.fused)")
+    try:
+        models = ModelRegistry().build(model_dir)
+    except ImportError as exc:
+        # NumPy-only installs can serve the artifact but not rebuild it
+        raise RuntimeError(
+            f"{path} is missing or stale and the estimators need {exc.name or 'sklearn / xgboost'} to rebuild it; "
+            f"run python -m back_end.inference.fused --model-dir {model_dir} where they are installed."
+        ) from exc
+    return FusedEnsemble.from_models(models)
+
+
+# -------------------------
+# Validation against the original estimators
+# -------------------------
+def reference_outputs(models, X: np.ndarray) -> Dict[str, np.ndarray]:
+    outputs = {}
+    for name in ("failure_30d", "failure_type", "action"):
+        artifact = models[name]
+        features = models.features_for(name, X)
+        proba = artifact.model.predict_proba(features)
+        outputs[f"{name}_proba"] = proba
+        labels = artifact.model.predict(features)
+        outputs[name] = labels.astype(bool) if artifact.classes is None else artifact.classes[labels]
+    outputs["risk_score"] = models["risk_score"].model.predict(models.features_for("risk_score", X))
+    outputs["priority"] = models["priority"].model.predict(models.features_for("priority", X))
+    return outputs
+
+
+def validate(fused: FusedEnsemble, models, X: np.ndarray) -> dict:
+    """Max deviation per output and label mismatches; "ok" if within tolerance."""
+    expected = reference_outputs(models, X)
+    actual = fused.predict(X)
+    report = {"rows": int(len(X))}
+    for name in ("failure_30d", "failure_type", "action"):
+        report[f"{name}_mismatches"] = int((expected[name] != actual[name]).sum())
+        report[f"{name}_proba_max_error"] = float(np.abs(expected[f"{name}_proba"] - actual[f"{name}_proba"]).max())
+    for name in ("risk_score", "priority"):
+        report[f"{name}_max_error"] = float(np.abs(expected[name] - actual[name]).max())
+    report["ok"] = (
+        all(report[f"{n}_mismatches"] == 0 for n in ("failure_30d", "failure_type", "action"))
+        and all(report[f"{n}_proba_max_error"] <= PROBA_TOLERANCE for n in ("failure_30d", "failure_type", "action"))
+        and all(report[f"{n}_max_error"] <= REGRESSION_TOLERANCE for n in ("risk_score", "priority"))
+    )
+    return report
+
+
+def validation_matrix(feature_cols: List[str]) -> np.ndarray:
+    """FEATURE_COLS matrix for every row of the training CSV."""
+    import pandas as pd
+    from ..feature_pipeline import FeaturePipeline
+
+    df = pd.read_csv(MODEL_DIR.parent / "data" / "bay_area_infrastructure_balanced.csv")
+    rows = [
+        {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+        for row in df.to_dict("records")
+    ]
+    return FeaturePipeline(feature_cols).transform(rows)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert, validate and save the fused ensemble.")
+    parser.add_argument("--model-dir", default=str(MODEL_DIR), help="version directory to convert (saved alongside)")
+    parser.add_argument("--check", action="store_true",
+                        help="validate the saved artifact against the estimators instead of rebuilding it")
+    args = parser.parse_args(argv)
+
+    model_dir = Path(args.model_dir)
+    models = ModelRegistry().build(model_dir)
+    path = model_dir / FUSED_PATH.name
+    if args.check:
+        fused = FusedEnsemble.load(path)
+        report = validate(fused, models, validation_matrix(models.feature_cols))
+        report["stale"] = fused.sources != source_hashes(model_dir)
+        report["ok"] = report["ok"] and not report["stale"]
+        print(json.dumps(report, indent=2))
+        return 0 if report["ok"] else 1
+
+    fused = FusedEnsemble.from_models(models)
+    report = validate(fused, models, validation_matrix(models.feature_cols))
+    print(json.dumps(report, indent=2))
+    if not report["ok"]:
+        print("Fused ensemble is outside tolerance; not saved.")
+        return 1
+    fused.save(path)
+    print(f"Saved {path} ({len(fused.roots)} trees, {len(fused.feature)} nodes, depth {fused.max_depth})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
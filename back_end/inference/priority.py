@@ -0,0 +1,10 @@
+import numpy as np
+from .registry import registry
+
+def predict_priority_batch(X, models=None) -> np.ndarray:
+    models = registry.current() if models is None else models
+    model = models["priority"].model
+    return model.predict(models.features_for("priority", X)).astype(int)
+
+def predict_priority(X) -> int:
+    return int(predict_priority_batch(X)[0])
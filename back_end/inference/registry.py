@@ -0,0 +1,325 @@
+"""
+Model registry
+-----------------------------------
+Loads every model artifact exactly once: the estimator, its feature list,
+its label encoder (if any) and the column positions of its features inside
+FEATURE_COLS. Requests then only pay for array indexing.
+
+Per-artifact load time, on-disk size and RSS growth are recorded for
+capacity planning (see ModelRegistry.stats()). The first artifact that
+needs sklearn or xgboost also carries that library's import cost.
+
+Versions
+--------
+Published model versions live in back_end/models/versions/<version>/,
+each holding all five artifacts, their feature lists and encoders, and
+the *_metrics.json files. versions/ACTIVE names the version a fresh
+process serves; without it, the artifacts directly in back_end/models/
+are served under their content hash.
+
+A loaded version is an immutable ModelSet. ModelRegistry.build() loads
+one without touching what is being served, and activate() swaps it in
+with a single reference assignment, so in-flight requests finish on the
+set they started with.
+
+Versions are published and activated with back_end/inference/versions.py.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+# --- Paths ---
+MODEL_DIR = Path(__file__).resolve().parent.parent / "models"
+FEATURE_COLS_PATH = Path(__file__).resolve().parent.parent / "feature_cols.pkl"
+VERSIONS_DIR = MODEL_DIR / "versions"
+ACTIVE_FILE = VERSIONS_DIR / "ACTIVE"
+
+# name -> (model file, feature list file, label encoder file)
+MODEL_FILES = {
+    "failure_30d": ("failure_30d_rfc.pkl", "failure_30d_features.pkl", None),
+    "failure_type": (
+        "failure_type_predicted_xgb.pkl",
+        "failure_type_features.pkl",
+        "failure_type_label_encoder.pkl",
+    ),
+    "risk_score": ("risk_score_gbr.pkl", "risk_score_features.pkl", None),
+    "action": (
+        "recommended_action_xgb.pkl",
+        "recommended_action_features.pkl",
+        "recommended_action_label_encoder.pkl",
+    ),
+    "priority": ("recommended_priority_rfr.pkl", "recommended_priority_features.pkl", None),
+}
+
+# Copied along with the artifacts when a version is published
+METRICS_GLOB = "*_metrics.json"
+EXTRA_FILES = ["fused_ensemble.bin"]
+
+_VERSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def artifact_version(model_dir: Path = MODEL_DIR) -> str:
+    """Short content hash over every file in MODEL_FILES."""
+    digest = hashlib.sha256()
+    for name in _artifact_files():
+        digest.update(name.encode())
+        digest.update(hashlib.sha256((Path(model_dir) / name).read_bytes()).digest())
+    return digest.hexdigest()[:12]
+
+
+# -------------------------
+# Version directories
+# -------------------------
+def _artifact_files() -> List[str]:
+    return [name for files in MODEL_FILES.values() for name in files if name is not None]
+
+
+def version_name(model_dir: Path) -> str:
+    """Directory name for published versions, content hash otherwise."""
+    model_dir = Path(model_dir).resolve()
+    if model_dir.parent == VERSIONS_DIR.resolve():
+        return model_dir.name
+    return artifact_version(model_dir)
+
+
+def list_versions() -> List[str]:
+    if not VERSIONS_DIR.is_dir():
+        return []
+    return sorted(
+        d.name
+        for d in VERSIONS_DIR.iterdir()
+        if d.is_dir() and _VERSION_NAME.match(d.name) and all((d / name).exists() for name in _artifact_files())
+    )
+
+
+def version_dir(name: str) -> Path:
+    """Directory of published version `name`; KeyError if there is none."""
+    if not _VERSION_NAME.match(name or "") or name not in list_versions():
+        raise KeyError(name)
+    return VERSIONS_DIR / name
+
+
+def active_version_dir() -> Path:
+    """Directory a fresh process should serve: versions/ACTIVE, else MODEL_DIR."""
+    try:
+        return version_dir(ACTIVE_FILE.read_text().strip())
+    except (OSError, KeyError):
+        return MODEL_DIR
+
+
+def set_active_version(name: str) -> None:
+    version_dir(name)
+    tmp = ACTIVE_FILE.with_name(ACTIVE_FILE.name + ".tmp")
+    tmp.write_text(name + "\n")
+    os.replace(tmp, ACTIVE_FILE)
+
+
+def publish_version(source_dir: Path = MODEL_DIR, name: Optional[str] = None) -> str:
+    """
+    Copy the artifacts in `source_dir` (e.g. fresh output of
+    `python -m back_end.models`) into versions/<name>. The name defaults
+    to the artifacts' content hash.
+    """
+    source_dir = Path(source_dir)
+    name = name or artifact_version(source_dir)
+    if not _VERSION_NAME.match(name):
+        raise ValueError(f"Invalid version name {name!r}")
+    target = VERSIONS_DIR / name
+    if target.exists():
+        raise FileExistsError(f"Version {name} already exists")
+
+    # Build under a temporary name and rename, so a half-copied version is never listed
+    staging = VERSIONS_DIR / f".{name}.partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    files = _artifact_files() + [p.name for p in source_dir.glob(METRICS_GLOB)]
+    files += [f for f in EXTRA_FILES if (source_dir / f).exists()]
+    for file in files:
+        shutil.copy2(source_dir / file, staging / file)
+    os.replace(staging, target)
+    return name
+
+
+# -------------------------
+# Loaded models
+# -------------------------
+def _current_rss_bytes() -> int:
+    """Resident set size of this process, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+@dataclass
+class ArtifactStats:
+    file: str
+    size_bytes: int
+    load_seconds: float
+    rss_delta_bytes: int
+
+
+@dataclass
+class ModelArtifact:
+    name: str
+    model: Any
+    features: List[str]
+    column_index: np.ndarray
+    label_encoder: Any = None
+    classes: Optional[np.ndarray] = None
+    stats: List[ArtifactStats] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ModelSet:
+    """Every artifact of one model version; never mutated once built."""
+
+    version: str
+    model_dir: Path
+    feature_cols: List[str]
+    artifacts: Dict[str, ModelArtifact]
+    load_stats: List[ArtifactStats]
+    metrics: Dict[str, Any]
+
+    def __getitem__(self, name: str) -> ModelArtifact:
+        return self.artifacts[name]
+
+    def as_matrix(self, X) -> np.ndarray:
+        """
+        Convert X to a float64 matrix whose columns follow FEATURE_COLS.
+        Arrays are assumed to be aligned already and pass through untouched.
+        """
+        if isinstance(X, np.ndarray):
+            return X
+        if list(X.columns) != self.feature_cols:
+            X = X.reindex(columns=self.feature_cols, fill_value=0)
+        return X.to_numpy(dtype=np.float64)
+
+    def features_for(self, name: str, X) -> np.ndarray:
+        """Select the columns model `name` was trained on, in training order."""
+        return self.as_matrix(X)[:, self.artifacts[name].column_index]
+
+
+class ModelRegistry:
+    def __init__(self, model_dir: Optional[Path] = None, feature_cols_path: Path = FEATURE_COLS_PATH):
+        """`model_dir` defaults to the active version (see active_version_dir)."""
+        self._model_dir = Path(model_dir) if model_dir is not None else None
+        self.feature_cols_path = Path(feature_cols_path)
+        self._active: Optional[ModelSet] = None
+
+    @property
+    def model_dir(self) -> Path:
+        if self._active is not None:
+            return self._active.model_dir
+        return self._model_dir or active_version_dir()
+
+    @staticmethod
+    def _load(path: Path, load_stats: List[ArtifactStats]):
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+        obj = joblib.load(path)
+        stats = ArtifactStats(
+            file=path.name,
+            size_bytes=path.stat().st_size,
+            load_seconds=time.perf_counter() - start,
+            rss_delta_bytes=max(_current_rss_bytes() - rss_before, 0),
+        )
+        load_stats.append(stats)
+        return obj, stats
+
+    def build(self, model_dir: Optional[Path] = None) -> ModelSet:
+        """Load a version without changing what is served."""
+        model_dir = Path(model_dir or self.model_dir)
+        load_stats: List[ArtifactStats] = []
+        feature_cols, _ = self._load(self.feature_cols_path, load_stats)
+        positions = {name: i for i, name in enumerate(feature_cols)}
+
+        artifacts = {}
+        for name, (model_file, features_file, encoder_file) in MODEL_FILES.items():
+            model, model_stats = self._load(model_dir / model_file, load_stats)
+            features, features_stats = self._load(model_dir / features_file, load_stats)
+            artifact = ModelArtifact(
+                name=name,
+                model=model,
+                features=features,
+                column_index=np.array([positions[f] for f in features], dtype=np.intp),
+                stats=[model_stats, features_stats],
+            )
+            if encoder_file is not None:
+                artifact.label_encoder, encoder_stats = self._load(model_dir / encoder_file, load_stats)
+                artifact.classes = artifact.label_encoder.classes_
+                artifact.stats.append(encoder_stats)
+            artifacts[name] = artifact
+
+        metrics = {path.stem: json.loads(path.read_text()) for path in sorted(model_dir.glob(METRICS_GLOB))}
+        return ModelSet(
+            version=version_name(model_dir),
+            model_dir=model_dir,
+            feature_cols=feature_cols,
+            artifacts=artifacts,
+            load_stats=load_stats,
+            metrics=metrics,
+        )
+
+    def activate(self, model_set: ModelSet) -> Optional[ModelSet]:
+        """Serve `model_set` from now on; returns the previous set."""
+        previous, self._active = self._active, model_set
+        return previous
+
+    def load(self, model_dir: Optional[Path] = None) -> "ModelRegistry":
+        self.activate(self.build(model_dir))
+        return self
+
+    @property
+    def loaded(self) -> bool:
+        return self._active is not None
+
+    def ensure_loaded(self) -> "ModelRegistry":
+        return self if self.loaded else self.load()
+
+    def current(self) -> ModelSet:
+        """The active ModelSet; read it once per request to stay on one version."""
+        return self.ensure_loaded()._active
+
+    def __getitem__(self, name: str) -> ModelArtifact:
+        return self.current()[name]
+
+    @property
+    def feature_cols(self) -> List[str]:
+        return self.current().feature_cols
+
+    @property
+    def version(self) -> str:
+        """Version of the active set (of the version that would load, before the first load)."""
+        return self._active.version if self._active is not None else version_name(self.model_dir)
+
+    def as_matrix(self, X) -> np.ndarray:
+        return X if isinstance(X, np.ndarray) else self.current().as_matrix(X)
+
+    def features_for(self, name: str, X) -> np.ndarray:
+        return self.current().features_for(name, X)
+
+    def stats(self) -> dict:
+        load_stats = self._active.load_stats if self._active is not None else []
+        return {
+            "version": self.version,
+            "total_load_seconds": sum(s.load_seconds for s in load_stats),
+            "total_size_bytes": sum(s.size_bytes for s in load_stats),
+            "total_rss_delta_bytes": sum(s.rss_delta_bytes for s in load_stats),
+            "artifacts": [vars(s) for s in load_stats],
+        }
+
+
+# Shared per process; loaded at API startup (model_utils) or on first use
+registry = ModelRegistry()
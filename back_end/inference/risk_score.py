@@ -0,0 +1,10 @@
+import numpy as np
+from .registry import registry
+
+def predict_risk_score_batch(X, models=None) -> np.ndarray:
+    models = registry.current() if models is None else models
+    model = models["risk_score"].model
+    return model.predict(models.features_for("risk_score", X)).astype(int)
+
+def predict_risk_score(X) -> int:
+    return int(predict_risk_score_batch(X)[0])
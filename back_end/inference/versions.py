@@ -0,0 +1,59 @@
+"""
+Model version management
+-----------------------------------
+Publishes trained artifacts as a version under back_end/models/versions/
+and picks the version new API processes serve (see registry.py). Running
+servers switch with POST /admin/models/activate.
+
+    python -m back_end.inference.versions list
+    python -m back_end.inference.versions publish [--from DIR] [--name NAME] [--activate]
+    python -m back_end.inference.versions activate NAME
+"""
+
+import argparse
+from pathlib import Path
+
+from .registry import (
+    MODEL_DIR,
+    VERSIONS_DIR,
+    active_version_dir,
+    artifact_version,
+    list_versions,
+    publish_version,
+    set_active_version,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage published model versions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list published versions")
+    publish = sub.add_parser("publish", help="publish the artifacts in a directory as a new version")
+    publish.add_argument("--from", dest="source", default=str(MODEL_DIR))
+    publish.add_argument("--name", help="version name (default: content hash)")
+    publish.add_argument("--activate", action="store_true", help="also make it the active version")
+    activate = sub.add_parser("activate", help="make a version active for new processes")
+    activate.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        active = active_version_dir()
+        for name in list_versions():
+            print(("* " if VERSIONS_DIR / name == active else "  ") + name)
+        if active == MODEL_DIR:
+            print(f"* (unversioned {MODEL_DIR}, {artifact_version(MODEL_DIR)})")
+        return 0
+    if args.command == "publish":
+        name = publish_version(Path(args.source), args.name)
+        print(f"published {name}")
+        if args.activate:
+            set_active_version(name)
+            print(f"activated {name}")
+        return 0
+    set_active_version(args.name)
+    print(f"activated {args.name} (running servers: POST /admin/models/activate)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
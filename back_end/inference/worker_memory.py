@@ -0,0 +1,126 @@
+"""
+Per-worker model memory benchmark
+-----------------------------------
+Starts N worker processes side by side (like `uvicorn --workers N`), has
+each load the models one way, and reports load time and memory per
+worker:
+
+- estimators: unpickle the .pkl files through ModelRegistry
+- mmap:       map the flat fused artifact (fused.py) read-only
+
+Memory comes from /proc/<pid>/smaps_rollup while all workers are alive:
+rss/private growth during the load, and PSS, which splits pages shared
+between workers (the mapped artifact) across them.
+
+    python -m back_end.inference.worker_memory [--workers 4]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+MODES = ("estimators", "mmap")
+
+# Runs in each worker: load, report, then stay alive until stdin closes
+WORKER = """
+import json, sys, time
+from back_end.inference.worker_memory import read_memory
+before = read_memory()
+start = time.perf_counter()
+if sys.argv[1] == "estimators":
+    from back_end.inference import registry
+    registry.load()
+else:
+    from back_end.inference.fused import ARRAY_NAMES, FusedEnsemble
+    fused = FusedEnsemble.load()
+    for name in ARRAY_NAMES:
+        getattr(fused, name).sum()  # fault every page in, as serving eventually does
+load_seconds = time.perf_counter() - start
+after = read_memory()
+print(json.dumps({"load_seconds": load_seconds, "before": before, "after": after}), flush=True)
+sys.stdin.read()
+"""
+
+# The baseline imports both modes pay before loading anything
+BASELINE = "import back_end.inference.registry, back_end.inference.fused\n"
+
+
+def read_memory(pid="self") -> dict:
+    """Rss / Pss / Private / Shared in bytes from smaps_rollup ({} if unavailable)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def run_workers(mode: str, workers: int) -> dict:
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-W", "ignore", "-c", BASELINE + WORKER, mode],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        reports = [json.loads(p.stdout.readline()) for p in procs]
+        # Measured while every worker is still mapping the artifact
+        live = [read_memory(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+    def median_growth(key):
+        return statistics.median(r["after"].get(key, 0) - r["before"].get(key, 0) for r in reports)
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "load_seconds_median": statistics.median(r["load_seconds"] for r in reports),
+        "rss_growth_per_worker_bytes": median_growth("rss"),
+        "private_growth_per_worker_bytes": median_growth("private"),
+        "pss_per_worker_bytes": statistics.median(m.get("pss", 0) for m in live),
+        "pss_total_bytes": sum(m.get("pss", 0) for m in live),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-worker model memory and load time.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args(argv)
+
+    mb = 1024 * 1024
+    for mode in args.modes:
+        r = run_workers(mode, args.workers)
+        print(
+            f"{mode:>10}: load {r['load_seconds_median'] * 1000:7.1f} ms | per worker: "
+            f"rss +{r['rss_growth_per_worker_bytes'] / mb:.1f} MB, "
+            f"private +{r['private_growth_per_worker_bytes'] / mb:.1f} MB, "
+            f"pss {r['pss_per_worker_bytes'] / mb:.1f} MB | "
+            f"pss total ({r['workers']} workers) {r['pss_total_bytes'] / mb:.1f} MB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
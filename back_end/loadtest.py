@@ -0,0 +1,171 @@
+"""
+Load test for /predict
+-----------------------------------
+Starts the API under uvicorn with open-meteo pointed at a local stand-in
+that answers after --weather-latency seconds, then drives /predict at
+increasing concurrency with random Bay Area locations (so most weather
+lookups miss the cache). For each level it reports throughput, p50/p99
+latency and shed (503) responses, and finally the highest throughput
+whose p99 stays within --p99-target.
+
+    python -m back_end.loadtest [--levels 1 8 32 64 128] [--duration 10]
+                                [--weather-latency 0.2] [--p99-target 0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+PAYLOAD = {
+    "type": "water_pipe",
+    "material": "cast_iron",
+    "soil_type": "clay",
+    "install_year": 1975,
+    "last_repair_date": "2019-06-01",
+}
+
+
+def start_fake_weather(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps({"current_weather": {"temperature": 16.5}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_api(port: int, weather_url: str, extra_env: dict) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "TUNNELVISION_OPEN_METEO_URL": weather_url,
+        "TUNNELVISION_WEATHER_TIMEOUT": "5",
+        **extra_env,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "uvicorn", "back_end.api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("API did not become ready")
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, duration: float) -> dict:
+    latencies, statuses = [], {}
+    stop_at = time.monotonic() + duration
+    rng = random.Random(concurrency)
+
+    async def worker():
+        while time.monotonic() < stop_at:
+            payload = {**PAYLOAD, "exact_location": [rng.uniform(37.2, 38.3), rng.uniform(-122.6, -121.7)]}
+            start = time.perf_counter()
+            try:
+                status = (await client.post("/predict", json=payload)).status_code
+            except httpx.TransportError:
+                status = "error"
+            elapsed = time.perf_counter() - start
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput_rps": len(latencies) / wall,
+        "p50_s": latencies[len(latencies) // 2] if latencies else None,
+        "p99_s": latencies[int(len(latencies) * 0.99)] if latencies else None,
+        "ok": statuses.get(200, 0),
+        "shed_503": statuses.get(503, 0),
+        "other": {str(k): v for k, v in statuses.items() if k not in (200, 503)},
+    }
+
+
+async def run(args) -> list:
+    weather = start_fake_weather(args.weather_latency)
+    weather_url = f"http://127.0.0.1:{weather.server_address[1]}/v1/forecast"
+    api = start_api(args.port, weather_url, dict(kv.split("=", 1) for kv in args.env))
+    limits = httpx.Limits(max_connections=max(args.levels) + 10)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60.0, limits=limits) as client:
+            await wait_ready(client)
+            results = []
+            for level in args.levels:
+                result = await run_level(client, level, args.duration)
+                results.append(result)
+                p50 = f"{result['p50_s'] * 1000:.0f}" if result["p50_s"] is not None else "-"
+                p99 = f"{result['p99_s'] * 1000:.0f}" if result["p99_s"] is not None else "-"
+                print(f"concurrency {level:4d}: {result['throughput_rps']:7.1f} req/s  "
+                      f"p50 {p50:>6} ms  p99 {p99:>6} ms  shed {result['shed_503']}  other {result['other']}")
+            batching = (await client.get("/predict/stats")).json().get("batching", {})
+            if batching.get("enabled"):
+                print(f"micro-batching: mean batch {batching['mean_batch_size']:.1f}, "
+                      f"histogram {batching['batch_size_histogram']}")
+            return results
+    finally:
+        api.terminate()
+        api.wait()
+        weather.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /predict at increasing concurrency.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64, 128])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--weather-latency", type=float, default=0.2, help="seconds per upstream weather call")
+    parser.add_argument("--p99-target", type=float, default=0.5, help="seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--env", nargs="*", default=[], help="extra KEY=VALUE settings for the API process")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    within = [r for r in results if r["p99_s"] is not None and r["p99_s"] <= args.p99_target]
+    if within:
+        best = max(within, key=lambda r: r["throughput_rps"])
+        print(f"best throughput with p99 <= {args.p99_target * 1000:.0f} ms: "
+              f"{best['throughput_rps']:.1f} req/s at concurrency {best['concurrency']}")
+    else:
+        print(f"no level kept p99 <= {args.p99_target * 1000:.0f} ms")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Request instrumentation
+-----------------------------------
+Stage and model timings, plus a few counters, exposed in the Prometheus
+text format at /metrics:
+
+    tunnelvision_stage_seconds{stage}             histogram per /predict stage
+    tunnelvision_model_seconds{model}             histogram per model call (one per batch)
+    tunnelvision_weather_fallbacks_total{source}  temperatures not from the live API
+    tunnelvision_region_lookup_misses_total{kind} locations / region names with no match
+
+stage() and model_timer() cost two perf_counter calls and one locked
+bucket increment, so they stay on in production. Series are keyed by a
+single label and buckets are fixed, so memory does not grow with traffic.
+
+With TUNNELVISION_SERVER_TIMING=1, ServerTimingMiddleware also adds a
+Server-Timing header listing every stage() the request ran through its
+own context (stages on the micro-batch executor are shared between
+requests and only reach the histograms).
+
+Work run inside `with suppressed():` (the startup warmup) is timed as
+usual but reaches neither the histograms nor Server-Timing.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+SERVER_TIMING = os.environ.get("TUNNELVISION_SERVER_TIMING", "0") == "1"
+
+# Seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> [count per bucket (last is +Inf)..., sum]
+        self._series: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {counts[-1]}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Counts per label value; some values may be read from elsewhere at scrape time."""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: Dict[str, float] = {}
+        self._functions: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[value] = self._values.get(value, 0) + amount
+
+    def set_function(self, value: str, fn: Callable[[], float]) -> None:
+        """Report `fn()` for `value` (a count another component already keeps)."""
+        self._functions[value] = fn
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        for value, fn in self._functions.items():
+            values[value] = values.get(value, 0) + fn()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for value, count in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(value)}"}} {count}')
+        return lines
+
+
+STAGE_SECONDS = Histogram("tunnelvision_stage_seconds", "Time spent in each /predict stage.", "stage")
+MODEL_SECONDS = Histogram("tunnelvision_model_seconds", "Time per model call (one call scores a whole batch).", "model")
+WEATHER_FALLBACKS = Counter(
+    "tunnelvision_weather_fallbacks_total", "Temperatures answered without the live weather API.", "source"
+)
+REGION_MISSES = Counter(
+    "tunnelvision_region_lookup_misses_total", "Locations outside every region polygon and unknown region names.", "kind"
+)
+
+METRICS = [STAGE_SECONDS, MODEL_SECONDS, WEATHER_FALLBACKS, REGION_MISSES]
+
+
+def render() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# -------------------------
+# Timing contexts
+# -------------------------
+# (stage, seconds) recorded for the current request when Server-Timing is on
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+# True inside suppressed()
+_suppressed: ContextVar[bool] = ContextVar("metrics_suppressed", default=False)
+
+
+class _Timer:
+    """`with` block timed into `histogram` (and the request's Server-Timing list)."""
+
+    __slots__ = ("histogram", "name", "per_request", "start")
+
+    def __init__(self, histogram: Histogram, name: str, per_request: bool):
+        self.histogram = histogram
+        self.name = name
+        self.per_request = per_request
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if _suppressed.get():
+            return False
+        self.histogram.observe(self.name, elapsed)
+        if self.per_request:
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((self.name, elapsed))
+        return False
+
+
+def stage(name: str) -> _Timer:
+    return _Timer(STAGE_SECONDS, name, True)
+
+
+def model_timer(name: str) -> _Timer:
+    return _Timer(MODEL_SECONDS, name, False)
+
+
+@contextmanager
+def suppressed():
+    """Keep timings from this thread's work out of the metrics."""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding `Server-Timing: <stage>;dur=<ms>, ..., total;dur=<ms>`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings]
+                entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.3f}")
+                headers = list(message.get("headers", [])) + [(b"server-timing", ", ".join(entries).encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -1,18 +1,28 @@
+import os
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from back_end.models.action import predict_action
-from back_end.models.failure_30d import predict_failure_30d
-from back_end.models.failure_type import predict_failure_type
-from back_end.models.priority import predict_priority
-from back_end.models.risk_score import predict_risk_score
-from .preprocessing import preprocess_df
+from typing import Callable, List, Optional
+from back_end.inference import (
+    ModelSet,
+    predict_action_batch,
+    predict_failure_30d_batch,
+    predict_failure_type_batch,
+    predict_risk_score_batch,
+    registry,
+)
+from back_end.inference.fused import FusedEnsemble, load_fused_ensemble
+from back_end.inference.registry import FEATURE_COLS_PATH, version_name
+from . import metrics
+from .geo import RegionIndex
+from .weather import TemperatureProvider, build_temperature_provider
 import joblib
-import requests
-import pandas as pd
+import numpy as np
 
 BASE_DIR = Path(__file__).parent
 
-# Load the exact feature order used for training
-FEATURE_COLS = joblib.load("back_end/feature_cols.pkl")
+# Load the exact feature order used for training (works from any working directory)
+FEATURE_COLS = joblib.load(FEATURE_COLS_PATH)
 
 def calculate_priority_from_risk(risk: int) -> int:
     """Calculate priority from risk score using rules"""
@@ -27,26 +37,149 @@ def calculate_priority_from_risk(risk: int) -> int:
     else:
         return 1
 
+# -------------------------
+# Serving mode
+# -------------------------
+# "estimators" (default): the original sklearn / XGBoost models
+# "fused": one FusedEnsemble walk over every tree (back_end/inference/fused.py)
+SERVING_MODE = os.environ.get("TUNNELVISION_SERVING_MODE", "estimators")
+
+
+@dataclass(frozen=True)
+class ServingModels:
+    """One model version ready to serve: its estimators or its fused ensemble."""
+
+    version: str
+    model_dir: Path
+    models: Optional[ModelSet] = None
+    fused: Optional[FusedEnsemble] = None
+
+
+def load_serving_models(model_dir: Path) -> ServingModels:
+    """Load a version for SERVING_MODE; slow, and touches nothing being served."""
+    if SERVING_MODE == "fused":
+        return ServingModels(version_name(model_dir), Path(model_dir), fused=load_fused_ensemble(model_dir))
+    models = registry.build(model_dir)
+    return ServingModels(models.version, models.model_dir, models=models)
+
+
+_serving_models: Optional[ServingModels] = None
+_activation_listeners: List[Callable[[ServingModels], None]] = []
+# Serializes the first load (api's startup thread vs. a direct caller)
+_models_lock = threading.Lock()
+
+
+def current_models() -> ServingModels:
+    """
+    The version being served; read it once per batch to stay on one version.
+    Models are not loaded at import: the API loads them at startup, and any
+    other caller loads the active version on first use.
+    """
+    serving = _serving_models
+    if serving is None:
+        with _models_lock:
+            if _serving_models is None:
+                activate_serving_models(load_serving_models(registry.model_dir))
+        serving = _serving_models
+    return serving
+
+
+def on_models_activated(callback: Callable[[ServingModels], None]) -> None:
+    """Call `callback(new_models)` after every activate_serving_models()."""
+    _activation_listeners.append(callback)
+
+
+def activate_serving_models(new_models: ServingModels) -> Optional[ServingModels]:
+    """Swap in a loaded version; batches already running finish on the old one."""
+    global _serving_models
+    previous, _serving_models = _serving_models, new_models
+    if new_models.models is not None:
+        registry.activate(new_models.models)
+    for callback in _activation_listeners:
+        callback(new_models)
+    return previous
+
+
 # -------------------------
 # Unified prediction function
 # -------------------------
-def predict_all(X):
+def priorities_from_risk(risks) -> np.ndarray:
+    """calculate_priority_from_risk over an array of risk scores."""
+    return 1 + np.digitize(np.asarray(risks), [25, 45, 65, 80])
 
-    risk = int(predict_risk_score(X))  # calculate risk first
 
+def predict_all_columns(X) -> dict:
     """
-    X should be a preprocessed DataFrame (1 row for a single asset) 
-    with columns aligned to FEATURE_COLS.
+    predict_all_batch as one array per output field, plus "model_version".
+    Used by bulk scoring (score.py), which never needs per-row dicts.
     """
+    serving = current_models()
+    if serving.fused is not None:
+        with metrics.model_timer("fused"):
+            outputs = serving.fused.predict(X)
+        risks = outputs["risk_score"].astype(int)
+        failures = outputs["failure_30d"]
+        failure_types = outputs["failure_type"]
+        actions = outputs["action"]
+    else:
+        models = serving.models
+        X = models.as_matrix(X)  # convert once, each model then just indexes columns
+
+        with metrics.model_timer("risk_score"):
+            risks = predict_risk_score_batch(X, models)  # calculate risk first
+        with metrics.model_timer("failure_30d"):
+            failures = predict_failure_30d_batch(X, models)
+        with metrics.model_timer("failure_type"):
+            failure_types = predict_failure_type_batch(X, models)
+        with metrics.model_timer("action"):
+            actions = predict_action_batch(X, models)
+
+    risks = np.asarray(risks).astype(int)
     return {
-        "failure_in_30_days": predict_failure_30d(X),
-        "failure_type": predict_failure_type(X),
-        "risk_score": risk,
-        "recommended_action": predict_action(X),
-        "priority": calculate_priority_from_risk(risk),
+        "failure_in_30_days": np.asarray(failures).astype(bool),
+        "failure_type": np.asarray(failure_types).astype(str),
+        "risk_score": risks,
+        "recommended_action": np.asarray(actions).astype(str),
+        "priority": priorities_from_risk(risks),
+        "model_version": serving.version,
     }
 
 
+def predict_all_batch(X) -> list:
+    """
+    X should be a preprocessed DataFrame (one row per asset)
+    with columns aligned to FEATURE_COLS.
+    Each model runs once over all rows; results come back in row order,
+    all scored by the same model version.
+    """
+    columns = predict_all_columns(X)
+    return [
+        {
+            "failure_in_30_days": bool(failure),
+            "failure_type": str(failure_type),
+            "risk_score": int(risk),
+            "recommended_action": str(action),
+            "priority": int(priority),
+            "model_version": columns["model_version"],
+        }
+        for failure, failure_type, risk, action, priority in zip(
+            columns["failure_in_30_days"],
+            columns["failure_type"],
+            columns["risk_score"],
+            columns["recommended_action"],
+            columns["priority"],
+        )
+    ]
+
+
+def predict_all(X):
+    """
+    X should be a preprocessed DataFrame (1 row for a single asset) 
+    with columns aligned to FEATURE_COLS.
+    """
+    return predict_all_batch(X)[0]
+
+
 # --- Region coordinates ---
 REGION_COORDINATES = {
     "Contra Costa": (37.9199, -121.9358),
@@ -62,42 +195,66 @@ REGION_COORDINATES = {
 
 
 def get_location_from_region(region: str) -> tuple[float, float]:
-    return REGION_COORDINATES.get(region.strip(), (37.338207, -121.886330))
+    coordinates = REGION_COORDINATES.get(region.strip())
+    if coordinates is None:
+        metrics.REGION_MISSES.inc("unknown_region")
+        return (37.338207, -121.886330)
+    return coordinates
+
+
+# --- Temperature lookups (see back_end/weather.py) ---
+# Built on first use (it reads the offline history CSV with pandas)
+temperature_provider: Optional[TemperatureProvider] = None
+_temperature_lock = threading.Lock()
+
+
+def load_temperature_provider() -> TemperatureProvider:
+    global temperature_provider
+    with _temperature_lock:
+        if temperature_provider is None:
+            temperature_provider = build_temperature_provider(REGION_COORDINATES)
+    return temperature_provider
+
+
+def set_temperature_provider(provider: TemperatureProvider) -> None:
+    global temperature_provider
+    temperature_provider = provider
 
 
 def get_temperature(lat: float, lon: float) -> float:
     try:
-        url = (
-            "https://api.open-meteo.com/v1/forecast"
-            f"?latitude={lat}&longitude={lon}"
-            "&current_weather=true"
-        )
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json().get("current_weather", {}).get("temperature", 15.0)
+        return (temperature_provider or load_temperature_provider()).get_temperature(lat, lon)
+    except Exception:
+        metrics.WEATHER_FALLBACKS.inc("default")
+        return 15.0
+
+
+async def aget_temperature(lat: float, lon: float) -> float:
+    """get_temperature for async handlers: waits on the network without a thread."""
+    try:
+        return await (temperature_provider or load_temperature_provider()).aget_temperature(lat, lon)
     except Exception:
+        metrics.WEATHER_FALLBACKS.inc("default")
         return 15.0
 
 
-def get_region_from_location(lat: float, lon: float):
-    if 36.89238291632208 <= lat <= 37.48534080282651 and -122.20259387759805 <= lon <= -121.21382434174066:
-        return "Santa Clara"
-    elif 37.45422122137626 <= lat <= 37.90527 and -122.34177172635131 <= lon <= -121.46973192736596:
-        return "Alameda"
-    elif 38.11230588756946 <= lat <= 38.85190504809042 and -123.5324716054025 <= lon <= -122.34869474441764:
-        return "Sonoma"
-    elif 37.71888575931279 <= lat <= 38.10135722489106 and -122.4300892162658 <= lon <= -121.53333017888399:
-        return "Contra Costa"
-    elif 38.153660062350056 <= lat <= 38.86397170801056 and -122.64656355512427 <= lon <= -122.06154157974197:
-        return "Napa"
-    elif 37.70841124861289 <= lat <= 37.81141713562808 and -122.51793825593296 <= lon <= -122.3278475588094:
-        return "San Francisco"
-    elif 37.8152822778324 <= lat <= 38.32117636904628 and -123.03056485363471 <= lon <= -122.41258389372383:
-        return "Marin"
-    elif 37.10780636280471 <= lat <= 37.70994030426103 and -122.52143637988625 <= lon <= -122.20259387759806:
-        return "San Mateo"
-    elif 38.0398174918701 <= lat <= 38.54067561081478 and -122.40928351247523 <= lon <= -121.59217535437085:
-        return "Solano"
+# Answers the cached provider took from its offline fallback (CachedTemperatureProvider.fallbacks)
+metrics.WEATHER_FALLBACKS.set_function("offline_history", lambda: getattr(temperature_provider, "fallbacks", 0))
+
+
+# --- Region lookups (see back_end/geo.py) ---
+region_index = RegionIndex.from_geojson()
+metrics.REGION_MISSES.set_function("outside_polygons", lambda: region_index.outside_points)
+
+
+def get_region_from_location(lat: float, lon: float) -> str:
+    # Outside every region polygon, the nearest region is used
+    return region_index.lookup_one(lat, lon)
+
+
+def get_regions_from_locations(lats, lons) -> np.ndarray:
+    """Vectorized get_region_from_location over arrays of coordinates."""
+    return region_index.lookup(lats, lons)
 
 
 def get_traffic_from_region(region: str) -> str:
@@ -0,0 +1,62 @@
+"""
+Training entry point for TunnelVision
+-----------------------------------
+Retrains the models and overwrites the artifacts in back_end/models/.
+The API never runs this; it only loads what is saved here.
+
+The CSV is featurized once and the models and their CV folds train in
+parallel (see pipeline.py); a timing and metrics report is written to
+training_report.json next to the artifacts. Features are reused from
+back_end/data/feature_cache/ while the CSV and FEATURE_VERSION are
+unchanged (see feature_cache.py).
+
+    python -m back_end.models                  # train all five models
+    python -m back_end.models risk_score action
+    python -m back_end.models --n-jobs 4       # worker processes (default: one per core)
+    python -m back_end.models --stream-features  # CSVs larger than memory
+"""
+
+import argparse
+from pathlib import Path
+
+from .feature_cache import FEATURE_CACHE_DIR
+from .pipeline import DEFAULT_CSV, DEFAULT_MODEL_DIR, MODEL_NAMES, REPORT_NAME, format_report, train_all, write_report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train TunnelVision models.")
+    parser.add_argument(
+        "models",
+        nargs="*",
+        help=f"models to train (default: all of {', '.join(MODEL_NAMES)})",
+    )
+    parser.add_argument("--csv", default=str(DEFAULT_CSV), help="training CSV path")
+    parser.add_argument("--model-dir", default=str(DEFAULT_MODEL_DIR), help="artifact output directory")
+    parser.add_argument("-j", "--n-jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--rebuild-features", action="store_true", help="ignore and refresh the cached feature matrix")
+    parser.add_argument("--no-feature-cache", action="store_true", help="featurize without reading or writing the cache")
+    parser.add_argument("--stream-features", action="store_true", help="featurize the CSV in chunks (bounded memory)")
+    parser.add_argument("--report", default=None, help=f"report path (default: <model-dir>/{REPORT_NAME})")
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.models) - set(MODEL_NAMES))
+    if unknown:
+        parser.error(f"unknown model(s) {', '.join(unknown)} (choose from {', '.join(MODEL_NAMES)})")
+
+    report = train_all(
+        args.models,
+        Path(args.csv),
+        Path(args.model_dir),
+        args.n_jobs,
+        cache_dir=None if args.no_feature_cache else FEATURE_CACHE_DIR,
+        rebuild_features=args.rebuild_features,
+        stream_features=args.stream_features,
+    )
+    print(format_report(report))
+    report_path = Path(args.report or Path(args.model_dir) / REPORT_NAME)
+    write_report(report, report_path)
+    print(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,105 @@
 # model that determines recommended actions based on equipment features
 import os
 import numpy as np
-import pandas as pd
-from .train import build_features as bf
+from .feature_cache import load_features
+from .train import cross_validate_scores, print_metrics
 from sklearn.preprocessing import LabelEncoder as le
 from sklearn.model_selection import train_test_split
 from xgboost import XGBClassifier as xgb
-from sklearn.metrics import classification_report
-from sklearn.model_selection import cross_val_score
-from sklearn.metrics import f1_score
+from sklearn.metrics import accuracy_score, classification_report, f1_score
 import joblib
 
 
 # --- Paths ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(script_dir, "../data/bay_area_infrastructure_balanced.csv")
-# --- Build features ---
-X, df, feature_cols = bf(csv_path, target="recommended_action")
-
-le_failure = le()
-df['recommended_action_encoded'] = le_failure.fit_transform(df['recommended_action'])
+model_dir = os.path.join(script_dir, "../models")
 
-# X is your features from build_features()
-y_failure = df["recommended_action_encoded"]
+CV_SCORINGS = ("accuracy", "f1_macro")
 
 drop_feats = [
-    "length_age", 
-    "old_asset", 
-    "asset_age_years", 
-    "struct_env_pressure", 
-    "env_stress", 
+    "length_age",
+    "old_asset",
+    "asset_age_years",
+    "struct_env_pressure",
+    "env_stress",
     "recent_repair"
 ]
 
-# get indices of features to keep
-keep_mask = [f not in drop_feats for f in feature_cols]
 
-# reduce feature matrix
-X_reduced = X[:, keep_mask]
+def make_model():
+    return xgb(max_depth = 6,
+        eval_metric='mlogloss'
+    )
 
-# update feature list
-feature_cols_reduced = [f for f in feature_cols if f not in drop_feats]
 
-X_train, X_test, y_train, y_test = train_test_split(X_reduced, y_failure, test_size = 0.2, random_state=42)
-model = xgb(max_depth = 6, 
-    eval_metric='mlogloss'
-)
-model.fit(X_train, y_train)
+def encode_target(df):
+    le_failure = le()
+    return le_failure, le_failure.fit_transform(df["recommended_action"])
 
-probs = model.predict_proba(X_test)
-final_threshold = [0.21, 0.38, 0.22, 0.34]
 
-adjusted = probs / final_threshold
-y_pred = np.argmax(adjusted, axis=1)
+def fit(features, model_dir=model_dir) -> dict:
+    """Fit on the train split, save the artifacts and return test metrics."""
+    X, df, feature_cols = features
+    le_failure, y_failure = encode_target(df)
 
-print("\n\n\n--- Test Metrics ---")
-print(classification_report(y_test, y_pred))
-cv_acc = cross_val_score(model, X, y_failure, cv=5, scoring="accuracy")
-print("CV Accuracy:", cv_acc.mean())
-cv_f1 = cross_val_score(model, X, y_failure, cv=5, scoring="f1_macro")
-print("CV Macro F1:", cv_f1.mean())
-print("\n\n\n")
+    # get indices of features to keep
+    keep_mask = [f not in drop_feats for f in feature_cols]
 
-model_dir = os.path.join(script_dir, "../models")
-os.makedirs(model_dir, exist_ok=True)
+    # reduce feature matrix
+    X_reduced = X[:, keep_mask]
 
-joblib.dump(model, os.path.join(model_dir, "recommended_action_xgb.pkl"))
+    # update feature list
+    feature_cols_reduced = [f for f in feature_cols if f not in drop_feats]
 
-joblib.dump(
-    le_failure,
-    os.path.join(model_dir, "recommended_action_label_encoder.pkl")
-)
+    X_train, X_test, y_train, y_test = train_test_split(X_reduced, y_failure, test_size = 0.2, random_state=42)
+    model = make_model()
+    model.fit(X_train, y_train)
 
-joblib.dump(
-    feature_cols_reduced,
-    os.path.join(model_dir, "recommended_action_features.pkl")
-)
+    probs = model.predict_proba(X_test)
+    final_threshold = [0.21, 0.38, 0.22, 0.34]
 
+    adjusted = probs / final_threshold
+    y_pred = np.argmax(adjusted, axis=1)
 
-from pathlib import Path
+    os.makedirs(model_dir, exist_ok=True)
 
-# --- Paths ---
-BASE_DIR = Path(__file__).parent
+    joblib.dump(model, os.path.join(model_dir, "recommended_action_xgb.pkl"))
+
+    joblib.dump(
+        le_failure,
+        os.path.join(model_dir, "recommended_action_label_encoder.pkl")
+    )
+
+    joblib.dump(
+        feature_cols_reduced,
+        os.path.join(model_dir, "recommended_action_features.pkl")
+    )
+
+    return {
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "f1_macro": float(f1_score(y_test, y_pred, average="macro")),
+        "classification_report": classification_report(y_test, y_pred),
+    }
+
+
+def cv_setup(features):
+    """(estimator, X, y, scorings) for cross-validation; CV runs on every feature."""
+    X, df, _ = features
+    _, y_failure = encode_target(df)
+    return make_model(), X, y_failure, CV_SCORINGS
 
-# --- Load trained model + label encoder ---
-action_model = joblib.load(BASE_DIR / "recommended_action_xgb.pkl")
-action_le = joblib.load(BASE_DIR / "recommended_action_label_encoder.pkl")
 
-def predict_action(X: pd.DataFrame) -> str:
-    expected_features = joblib.load(BASE_DIR / "recommended_action_features.pkl")
-    X_aligned = X.reindex(columns=expected_features, fill_value=0)
-    action_idx = action_model.predict(X_aligned)[0]
-    return action_le.inverse_transform([action_idx])[0]
+def train(csv_path=csv_path, model_dir=model_dir, features=None, n_jobs=None):
+    # --- Build features ---
+    if features is None:
+        features = load_features(csv_path)
 
+    metrics = fit(features, model_dir)
+    cv = cross_validate_scores(*cv_setup(features), n_jobs=n_jobs)
+    print_metrics(metrics, cv)
+    return {"test": metrics, "cv": cv}
 
 
+if __name__ == "__main__":
+    train()
@@ -1,25 +1,22 @@
 # model that determines the type of failure based on equipment features
-# model that determines the type of failure based on equipment features
 import os
-import pandas as pd
 import numpy as np
-from .train import build_features as bf
+from .feature_cache import load_features
+from .train import cross_validate_scores, print_metrics
 from sklearn.preprocessing import LabelEncoder as le
 from sklearn.model_selection import train_test_split
+from sklearn.utils.class_weight import compute_class_weight
 from xgboost import XGBClassifier as xgb
-from sklearn.metrics import classification_report
-from sklearn.model_selection import cross_val_score
+from sklearn.metrics import accuracy_score, classification_report, f1_score
 import joblib
 
 
 # --- Paths ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(script_dir, "../data/bay_area_infrastructure_balanced.csv")
-print("Loading CSV from:", csv_path)
-
-# --- Build features ---
-X, df, feature_cols = bf(csv_path, target="failure_type_predicted")
+model_dir = os.path.join(script_dir, "../models")
 
+CV_SCORINGS = ("accuracy", "f1_macro")
 
 # --- Merge rare classes ---
 merge_map = {
@@ -28,97 +25,101 @@ merge_map = {
     "erosion": "structural_damage"
 }
 
-df["failure_type_merged"] = df["failure_type_predicted"].replace(merge_map)
 
-# --- Encode merged labels ---
-le_failure = le()
-df["failure_type_encoded"] = le_failure.fit_transform(
-    df["failure_type_merged"]
-)
+def make_model(num_classes):
+    return xgb(
+        objective="multi:softprob",
+        num_class=num_classes,
+        n_estimators=300,
+        max_depth=6,
+        learning_rate=0.05,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        eval_metric="mlogloss",
+        random_state=42
+    )
 
-y_failure = df["failure_type_encoded"]
 
+def encode_target(df):
+    # --- Encode merged labels ---
+    le_failure = le()
+    return le_failure, le_failure.fit_transform(df["failure_type_predicted"].replace(merge_map))
 
-# --- Train / test split ---
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y_failure, test_size=0.2, random_state=42
-)
 
-# --- Class weights ---
-from sklearn.utils.class_weight import compute_class_weight
+def fit(features, model_dir=model_dir) -> dict:
+    """Fit on the train split with balanced class weights, save the artifacts and return test metrics."""
+    X, df, feature_cols = features
+    le_failure, y_failure = encode_target(df)
 
-classes = np.unique(y_train)
-weights = compute_class_weight(
-    class_weight="balanced",
-    classes=classes,
-    y=y_train
-)
-class_weight = dict(zip(classes, weights))
-
-num_classes = len(classes)
-
-# --- Model ---
-model = xgb(
-    objective="multi:softprob",
-    num_class=num_classes,
-    n_estimators=300,
-    max_depth=6,
-    learning_rate=0.05,
-    subsample=0.8,
-    colsample_bytree=0.8,
-    eval_metric="mlogloss",
-    random_state=42
-)
-
-model.fit(
-    X_train,
-    y_train,
-    sample_weight=np.array([class_weight[y] for y in y_train])
-)
-
-# --- Predictions ---
-probs = model.predict_proba(X_test)
-final_thresholds = np.array([0.15, 0.13, 0.57, 0.13, 0.25])
-
-adjusted = probs / final_thresholds
-y_pred = np.argmax(adjusted, axis=1)
-
-print("\n\n\n--- Test Metrics ---")
-print(classification_report(y_test, y_pred))
-cv_acc = cross_val_score(model, X, y_failure, cv=5, scoring="accuracy")
-print("CV Accuracy:", cv_acc.mean())
-cv_f1 = cross_val_score(model, X, y_failure, cv=5, scoring="f1_macro")
-print("CV Macro F1:", cv_f1.mean())
-print("\n\n\n")
+    # --- Train / test split ---
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y_failure, test_size=0.2, random_state=42
+    )
 
-model_dir = os.path.join(script_dir, "../models")
-os.makedirs(model_dir, exist_ok=True)
+    # --- Class weights ---
+    classes = np.unique(y_train)
+    weights = compute_class_weight(
+        class_weight="balanced",
+        classes=classes,
+        y=y_train
+    )
+    class_weight = dict(zip(classes, weights))
 
-joblib.dump(model, os.path.join(model_dir, "failure_type_predicted_xgb.pkl"))
+    # --- Model ---
+    model = make_model(len(classes))
 
-joblib.dump(
-    le_failure,
-    os.path.join(model_dir, "failure_type_label_encoder.pkl")
-)
+    model.fit(
+        X_train,
+        y_train,
+        sample_weight=np.array([class_weight[y] for y in y_train])
+    )
 
-joblib.dump(
-    feature_cols,
-    os.path.join(model_dir, "failure_type_features.pkl")
-)
+    # --- Predictions ---
+    probs = model.predict_proba(X_test)
+    final_thresholds = np.array([0.15, 0.13, 0.57, 0.13, 0.25])
 
+    adjusted = probs / final_thresholds
+    y_pred = np.argmax(adjusted, axis=1)
 
-from pathlib import Path
+    os.makedirs(model_dir, exist_ok=True)
 
-# --- Paths ---
-BASE_DIR = Path(__file__).parent
+    joblib.dump(model, os.path.join(model_dir, "failure_type_predicted_xgb.pkl"))
+
+    joblib.dump(
+        le_failure,
+        os.path.join(model_dir, "failure_type_label_encoder.pkl")
+    )
+
+    joblib.dump(
+        feature_cols,
+        os.path.join(model_dir, "failure_type_features.pkl")
+    )
+
+    return {
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "f1_macro": float(f1_score(y_test, y_pred, average="macro")),
+        "classification_report": classification_report(y_test, y_pred),
+    }
+
+
+def cv_setup(features):
+    """(estimator, X, y, scorings) for cross-validation (unweighted, as before)."""
+    X, df, _ = features
+    _, y_failure = encode_target(df)
+    return make_model(len(np.unique(y_failure))), X, y_failure, CV_SCORINGS
+
+
+def train(csv_path=csv_path, model_dir=model_dir, features=None, n_jobs=None):
+    # --- Build features ---
+    if features is None:
+        print("Loading CSV from:", csv_path)
+        features = load_features(csv_path)
 
-# --- Load trained model + label encoder ---
-failure_type_model = joblib.load(BASE_DIR / "failure_type_predicted_xgb.pkl")
-failure_type_le = joblib.load(BASE_DIR / "failure_type_label_encoder.pkl")
+    metrics = fit(features, model_dir)
+    cv = cross_validate_scores(*cv_setup(features), n_jobs=n_jobs)
+    print_metrics(metrics, cv)
+    return {"test": metrics, "cv": cv}
 
-def predict_failure_type(X: pd.DataFrame) -> str:
-    expected_features = joblib.load(BASE_DIR / "failure_type_features.pkl")
-    X_aligned = X.reindex(columns=expected_features, fill_value=0)
-    prediction_idx = failure_type_model.predict(X_aligned)[0]
-    return failure_type_le.inverse_transform([prediction_idx])[0]  # ← USE THE LABEL ENCODER
 
+if __name__ == "__main__":
+    train()
@@ -0,0 +1,185 @@
+"""
+Training feature cache
+-----------------------------------
+build_features re-reads and re-featurizes the CSV on every run. The
+result (X, feature_cols, asset_id and the TARGET_COLS) is persisted as
+a flat file (inference/flatfile.py) under back_end/data/feature_cache/,
+named after the CSV and keyed on:
+
+- a hash of the CSV's resolved path, so same-named CSVs in different
+  directories get separate entries
+- the sha256 of the CSV's contents
+- how it was built: "frame" (build_features) or "stream" (see below)
+- FEATURE_VERSION (features_schema.py)
+
+The same keys are kept in the entry's metadata and checked on load.
+
+A later run with the same CSV and feature definitions memory-maps the
+cached X instead of rebuilding it; anything else rebuilds and replaces
+the entry for that CSV path and build mode. Only the columns the
+trainers read are kept, so the cached `df` holds asset_id and the
+targets, not the raw CSV columns.
+
+stream=True builds the entry with feature_stream.stream_features instead,
+for CSVs that do not fit in memory: the same columns, with X as float32
+and string columns stored as codes plus their categories.
+
+    TUNNELVISION_FEATURE_CACHE_DIR   cache directory (default back_end/data/feature_cache)
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ..feature_stream import stream_features
+from ..features_schema import FEATURE_VERSION, TARGET_COLS
+from ..inference.flatfile import load_arrays, save_arrays
+from .train import build_features
+
+FEATURE_CACHE_DIR = Path(
+    os.environ.get("TUNNELVISION_FEATURE_CACHE_DIR", Path(__file__).resolve().parent.parent / "data" / "feature_cache")
+)
+
+# Columns of the cached df besides X
+CACHED_COLS = ["asset_id"] + TARGET_COLS
+
+_HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_id(csv_path: Path) -> str:
+    return hashlib.sha256(str(Path(csv_path).resolve()).encode()).hexdigest()[:12]
+
+
+def build_mode(stream: bool) -> str:
+    return "stream" if stream else "frame"
+
+
+def _entry_prefix(csv_path: Path, stream: bool) -> str:
+    """Shared by every entry for this CSV path and build mode, whatever its contents."""
+    return f"{Path(csv_path).stem}-{source_id(csv_path)}-{build_mode(stream)}"
+
+
+def cache_path(csv_path: Path, csv_sha256: str, cache_dir: Path = FEATURE_CACHE_DIR, stream: bool = False) -> Path:
+    return Path(cache_dir) / f"{_entry_prefix(csv_path, stream)}-{csv_sha256[:16]}-v{FEATURE_VERSION}.tvflat"
+
+
+def cache_meta(csv_sha256: str, stream: bool = False, csv_path: Optional[Path] = None) -> dict:
+    meta = {"feature_version": FEATURE_VERSION, "csv_sha256": csv_sha256, "build_mode": build_mode(stream)}
+    if csv_path is not None:
+        meta["source_id"] = source_id(csv_path)
+    return meta
+
+
+def _matches(path: Path, expected: dict) -> bool:
+    """Whether the entry at `path` carries the `expected` cache_meta."""
+    try:
+        _, meta = load_arrays(path)
+    except (OSError, ValueError):
+        return False
+    return all(meta.get(key) == value for key, value in expected.items())
+
+
+def save_features(path: Path, features, csv_sha256: str, csv_path: Optional[Path] = None) -> None:
+    X, df, feature_cols = features
+    arrays = {"X": X}
+    for col in CACHED_COLS:
+        values = df[col].to_numpy()
+        # Strings become fixed-width unicode so the column can be memory-mapped too
+        arrays[col] = values.astype(str) if values.dtype == object else values
+    save_arrays(path, arrays, {"feature_cols": list(feature_cols), **cache_meta(csv_sha256, csv_path=csv_path)})
+
+
+def _decode(codes: np.ndarray, categories: list) -> np.ndarray:
+    """Values of a streamed (dictionary-encoded) column; code -1 is missing."""
+    return np.append(np.asarray(categories, dtype=object), np.nan)[codes]
+
+
+def load_cached_features(path: Path):
+    """(X, df, feature_cols) from a cache file; X is a read-only memory map."""
+    arrays, meta = load_arrays(path)
+    categories = meta.get("categories", {})
+    df = pd.DataFrame({
+        col: _decode(arrays[col], categories[col]) if col in categories else arrays[col]
+        for col in CACHED_COLS
+    })
+    return arrays["X"], df, meta["feature_cols"]
+
+
+def load_features(
+    csv_path: Path,
+    cache_dir: Optional[Path] = FEATURE_CACHE_DIR,
+    rebuild: bool = False,
+    stats: Optional[dict] = None,
+    stream: bool = False,
+):
+    """
+    build_features(csv_path) through the cache. `cache_dir=None` bypasses
+    it; `rebuild=True` refreshes the entry; `stream=True` builds it in
+    chunks. If `stats` is given, it is filled with the cache path and
+    whether it was a hit.
+    """
+    if cache_dir is None:
+        return build_features(csv_path)
+
+    csv_sha256 = file_sha256(csv_path)
+    path = cache_path(csv_path, csv_sha256, cache_dir, stream)
+    meta = cache_meta(csv_sha256, stream, csv_path)
+    hit = not rebuild and path.exists() and _matches(path, meta)
+    if not hit:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        if stream:
+            stream_features(csv_path, path, keep=CACHED_COLS, meta=meta)
+        else:
+            save_features(path, build_features(csv_path), csv_sha256, csv_path)
+        # Entries for older contents / feature versions of this CSV path and mode are dead
+        for stale in Path(cache_dir).glob(f"{_entry_prefix(csv_path, stream)}-*.tvflat"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    if stats is not None:
+        stats.update({"path": str(path), "hit": hit})
+    return load_cached_features(path)
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or check the cached training features for a CSV.")
+    parser.add_argument("csv", nargs="?", default=str(Path(__file__).resolve().parent.parent / "data" / "bay_area_infrastructure_balanced.csv"))
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="build the entry in chunks (feature_stream.py)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    X_fresh, df_fresh, cols_fresh = build_features(args.csv)
+    build_seconds = time.perf_counter() - start
+
+    stats = {}
+    start = time.perf_counter()
+    X, df, feature_cols = load_features(args.csv, rebuild=args.rebuild, stats=stats, stream=args.stream)
+    load_seconds = time.perf_counter() - start
+
+    same = (
+        feature_cols == cols_fresh
+        and np.array_equal(X, X_fresh.astype(X.dtype))
+        and all((df[c].to_numpy() == df_fresh[c].to_numpy()).all() for c in CACHED_COLS)
+    )
+    print(f"{stats['path']} ({'hit' if stats['hit'] else 'built'}): {X.shape[0]} x {X.shape[1]}")
+    print(f"build_features {build_seconds:.3f}s, cached load (incl. hashing) {load_seconds:.3f}s, identical: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+"""
+Parallel training pipeline
+-----------------------------------
+Trains any subset of the five models from one featurization of the CSV:
+
+- features are built once in the parent, or reused from the on-disk
+  feature cache (feature_cache.py); every worker memory-maps that file
+  instead of re-parsing the CSV. CSVs too large for memory can be
+  featurized in chunks (--stream-features, see feature_stream.py)
+- each model becomes one "fit" task (train split, artifacts, test metrics)
+  plus CV_FOLDS "fold" tasks, and all of them share one process pool of
+  n_jobs workers; every scoring of a fold is computed from the same fit
+- XGBoost threads are divided between the workers so n_jobs processes do
+  not oversubscribe the cores
+
+Folds are the same ones cross_val_score(cv=5) used, so metrics and saved
+artifacts match training the models one by one. A combined report with
+per-task timings and test / CV metrics is written to
+<model_dir>/training_report.json.
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .. import feature_stream
+from .feature_cache import (
+    CACHED_COLS,
+    FEATURE_CACHE_DIR,
+    cache_meta,
+    file_sha256,
+    load_cached_features,
+    load_features,
+    save_features,
+)
+from .train import CV_FOLDS, build_features, cv_splits, score_fold, summarize_cv
+
+MODEL_NAMES = ["failure_30d", "failure_type", "risk_score", "action", "priority"]
+
+DEFAULT_CSV = Path(__file__).resolve().parent.parent / "data" / "bay_area_infrastructure_balanced.csv"
+DEFAULT_MODEL_DIR = Path(__file__).resolve().parent
+REPORT_NAME = "training_report.json"
+
+
+def _trainer(name: str):
+    # Imported on use so pool workers can cap XGBoost's threads first
+    return importlib.import_module(f".{name}", __package__)
+
+
+# -------------------------
+# Worker side
+# -------------------------
+@lru_cache(maxsize=None)
+def _load_features(features_path: str):
+    return load_cached_features(features_path)
+
+
+@lru_cache(maxsize=None)
+def _cv_inputs(name: str, features_path: str):
+    model, X, y, scorings = _trainer(name).cv_setup(_load_features(features_path))
+    return model, X, y, scorings, cv_splits(model, X, y)
+
+
+def run_task(kind: str, name: str, features_path: str, model_dir: str, fold: Optional[int] = None) -> dict:
+    """One unit of work: fit `name` and save it, or score one CV fold."""
+    start = time.perf_counter()
+    if kind == "fit":
+        result = _trainer(name).fit(_load_features(features_path), model_dir)
+    else:
+        model, X, y, scorings, splits = _cv_inputs(name, features_path)
+        train_idx, test_idx = splits[fold]
+        result = score_fold(model, X, y, train_idx, test_idx, scorings)
+    return {"kind": kind, "name": name, "fold": fold, "result": result, "seconds": time.perf_counter() - start}
+
+
+def _init_worker(threads: int) -> None:
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+
+
+# -------------------------
+# Orchestration
+# -------------------------
+def resolve_n_jobs(n_jobs: Optional[int]) -> int:
+    """sklearn convention: None or -1 means one worker per core."""
+    cpus = os.cpu_count() or 1
+    if n_jobs is None or n_jobs < 0:
+        return cpus
+    return max(1, n_jobs)
+
+
+def train_all(
+    models: Optional[List[str]] = None,
+    csv_path: Path = DEFAULT_CSV,
+    model_dir: Path = DEFAULT_MODEL_DIR,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[Path] = FEATURE_CACHE_DIR,
+    rebuild_features: bool = False,
+    stream_features: bool = False,
+    log=print,
+) -> dict:
+    """
+    Train `models` (default: all five) and return the combined report.
+    `cache_dir=None` skips the feature cache and featurizes into a scratch file;
+    `stream_features=True` featurizes the CSV in chunks (feature_stream.py).
+    """
+    models = models or MODEL_NAMES
+    n_jobs = resolve_n_jobs(n_jobs)
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    wall_start = time.perf_counter()
+
+    tasks = [("fit", name, None) for name in models]
+    tasks += [("fold", name, fold) for name in models for fold in range(CV_FOLDS)]
+    results: List[dict] = []
+
+    with tempfile.TemporaryDirectory(prefix="tunnelvision-train-") as scratch:
+        start = time.perf_counter()
+        cache = {"path": None, "hit": False}
+        if cache_dir is not None:
+            load_features(csv_path, cache_dir, rebuild_features, stats=cache, stream=stream_features)
+            features_path = cache["path"]
+        else:
+            features_path = str(Path(scratch) / "features.tvflat")
+            if stream_features:
+                feature_stream.stream_features(csv_path, features_path, keep=CACHED_COLS, meta=cache_meta(file_sha256(csv_path), stream=True))
+            else:
+                save_features(features_path, build_features(csv_path), file_sha256(csv_path))
+        feature_seconds = time.perf_counter() - start
+        X, _, feature_cols = _load_features(features_path)
+        log(f"{'Loaded cached' if cache['hit'] else 'Built'} features for {X.shape[0]} rows x "
+            f"{len(feature_cols)} columns in {feature_seconds:.1f}s")
+
+        if n_jobs == 1:
+            for kind, name, fold in tasks:
+                results.append(run_task(kind, name, features_path, str(model_dir), fold))
+        else:
+            threads = max(1, (os.cpu_count() or 1) // n_jobs)
+            with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            ) as pool:
+                futures = [pool.submit(run_task, kind, name, features_path, str(model_dir), fold) for kind, name, fold in tasks]
+                for future in as_completed(futures):
+                    results.append(future.result())
+
+    report = {
+        "csv": str(csv_path),
+        "model_dir": str(model_dir),
+        "n_jobs": n_jobs,
+        "feature_seconds": feature_seconds,
+        "feature_cache": cache,
+        "wall_seconds": time.perf_counter() - wall_start,
+        "task_seconds_total": sum(r["seconds"] for r in results),
+        "models": {},
+    }
+    for name in models:
+        fit = next(r for r in results if r["kind"] == "fit" and r["name"] == name)
+        folds = sorted((r for r in results if r["kind"] == "fold" and r["name"] == name), key=lambda r: r["fold"])
+        report["models"][name] = {
+            "fit_seconds": fit["seconds"],
+            "cv_seconds": sum(r["seconds"] for r in folds),
+            "test": fit["result"],
+            "cv": summarize_cv([r["result"] for r in folds]),
+        }
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    for name, entry in report["models"].items():
+        test = {k: v for k, v in entry["test"].items() if isinstance(v, float)}
+        lines.append(
+            f"{name:13s} fit {entry['fit_seconds']:5.1f}s  cv {entry['cv_seconds']:5.1f}s  "
+            f"test {_format_metrics(test)}  cv {_format_metrics(entry['cv'])}"
+        )
+    lines.append(
+        f"wall {report['wall_seconds']:.1f}s on {report['n_jobs']} worker(s) "
+        f"({report['task_seconds_total']:.1f}s of tasks, features {report['feature_seconds']:.1f}s)"
+    )
+    return "\n".join(lines)
+
+
+def _format_metrics(metrics: Dict[str, float]) -> str:
+    return " ".join(f"{k}={v:.4f}" for k, v in metrics.items())
+
+
+def write_report(report: dict, path: Path) -> None:
+    Path(path).write_text(json.dumps(report, indent=2))
@@ -1,113 +1,92 @@
 # model that determines the priority level of asset maintenance based on equipment features
-import pandas as pd
 import os
-import numpy as np
 import math
+import numpy as np
 from sklearn.ensemble import RandomForestRegressor as rfr
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from scipy.sparse import csr_matrix
-from .train import build_features as bf
-from sklearn.model_selection import cross_val_score
+from .feature_cache import load_features
+from .train import asset_split, cross_validate_scores, print_metrics
 import joblib
 
 # --- Paths ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(script_dir, "../data/bay_area_infrastructure_balanced.csv")
+model_dir = os.path.join(script_dir, "../models")
 
+CV_SCORINGS = ("neg_root_mean_squared_error", "r2")
 
-# --- Build features ---
-X, df, feature_cols = bf(csv_path, target="recommended_priority")
 
-y = df["recommended_priority"].astype(int)
+def make_model():
+    return rfr(
+        n_estimators=150,
+        max_depth=2,
+        random_state=42
+    )
 
-# --- Asset-based split ---
-asset_ids = df["asset_id"].unique()
-np.random.seed(42)
-np.random.shuffle(asset_ids)
-split_idx = int(0.8 * len(asset_ids))
-train_assets = asset_ids[:split_idx]
-test_assets = asset_ids[split_idx:]
-train_mask = df["asset_id"].isin(train_assets)
-test_mask = df["asset_id"].isin(test_assets)
 
-# --- Convert to CSR ---
-from scipy.sparse import csr_matrix
-X = csr_matrix(X)
+def split(features):
+    """CSR train / test matrices and targets, split by asset."""
+    X, df, _ = features
 
-X_train = X[train_mask.values]
-X_test = X[test_mask.values]
-y_train = y[train_mask.values]
-y_test = y[test_mask.values]
+    y = df["recommended_priority"].astype(int).values
 
-model = rfr(
-    n_estimators=150,
-    max_depth=2,
-    random_state=42
-)
-model.fit(X_train, y_train)
+    # --- Asset-based split ---
+    train_mask, test_mask = asset_split(df)
 
-import math
-y_pred = model.predict(X_test)
-mae = mean_absolute_error(y_test, y_pred)
-rmse = math.sqrt(mean_squared_error(y_test, y_pred))
-r2 = r2_score(y_test, y_pred)
-cv_rmse = -cross_val_score(
-    model,
-    X_train,
-    y_train,
-    cv=5,
-    scoring="neg_root_mean_squared_error"
-)
-
-cv_r2 = cross_val_score(
-    model,
-    X_train,
-    y_train,
-    cv=5,
-    scoring="r2"
-)
-print("\n\n\n--- Test Metrics ---")
-print("CV RMSE:", cv_rmse.mean())
-print("CV R²:", cv_r2.mean())
-print("MAE:", mae)
-print("RMSE:", rmse)
-print("R²:", r2)
+    # --- Convert to CSR ---
+    X = csr_matrix(X)
+    return X[train_mask], X[test_mask], y[train_mask], y[test_mask]
 
-import numpy as np
-from sklearn.metrics import mean_absolute_error
 
-# y_train, y_test are your training and testing target arrays
-baseline_pred = np.full_like(y_test, y_train.mean())
-baseline_mae = mean_absolute_error(y_test, baseline_pred)
-print("Baseline MAE:", baseline_mae)
-print("\n\n\n")
+def fit(features, model_dir=model_dir) -> dict:
+    """Fit on the asset-based train split, save the artifacts and return test metrics."""
+    X_train, X_test, y_train, y_test = split(features)
 
-model_dir = os.path.join(script_dir, "../models")
-os.makedirs(model_dir, exist_ok=True)
+    model = make_model()
+    model.fit(X_train, y_train)
 
-joblib.dump(
-    model,
-    os.path.join(model_dir, "recommended_priority_rfr.pkl")
-)
+    y_pred = model.predict(X_test)
 
-joblib.dump(
-    feature_cols,
-    os.path.join(model_dir, "recommended_priority_features.pkl")
-)
+    # y_train, y_test are your training and testing target arrays
+    baseline_pred = np.full_like(y_test, y_train.mean())
 
+    os.makedirs(model_dir, exist_ok=True)
 
-from pathlib import Path
+    joblib.dump(
+        model,
+        os.path.join(model_dir, "recommended_priority_rfr.pkl")
+    )
+
+    joblib.dump(
+        features[2],
+        os.path.join(model_dir, "recommended_priority_features.pkl")
+    )
+
+    return {
+        "mae": float(mean_absolute_error(y_test, y_pred)),
+        "rmse": math.sqrt(mean_squared_error(y_test, y_pred)),
+        "r2": float(r2_score(y_test, y_pred)),
+        "baseline_mae": float(mean_absolute_error(y_test, baseline_pred)),
+    }
+
+
+def cv_setup(features):
+    """(estimator, X, y, scorings) for cross-validation on the train split."""
+    X_train, _, y_train, _ = split(features)
+    return make_model(), X_train, y_train, CV_SCORINGS
 
-# --- Paths ---
-BASE_DIR = Path(__file__).parent
 
-# --- Load trained model ---
-priority_model = joblib.load(BASE_DIR / "recommended_priority_rfr.pkl")
+def train(csv_path=csv_path, model_dir=model_dir, features=None, n_jobs=None):
+    # --- Build features ---
+    if features is None:
+        features = load_features(csv_path)
 
-def predict_priority(X: pd.DataFrame) -> int:
-    expected_features = joblib.load(BASE_DIR / "recommended_priority_features.pkl")  # ← CHANGE THIS
-    X_aligned = X.reindex(columns=expected_features, fill_value=0)
-    priority = priority_model.predict(X_aligned)[0]
-    return int(priority)
+    metrics = fit(features, model_dir)
+    cv = cross_validate_scores(*cv_setup(features), n_jobs=n_jobs)
+    print_metrics(metrics, cv)
+    return {"test": metrics, "cv": cv}
 
 
+if __name__ == "__main__":
+    train()
@@ -1,114 +1,93 @@
 # model that predicts risk_score
 import os
-import numpy as np
-import pandas as pd
 import math
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from scipy.sparse import csr_matrix
-from .train import build_features as bf
-from sklearn.model_selection import cross_val_score
+from .feature_cache import load_features
+from .train import asset_split, cross_validate_scores, print_metrics
 import joblib
 
 # --- Paths ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(script_dir, "../data/bay_area_infrastructure_balanced.csv")
-print("Loading CSV from:", csv_path)
+model_dir = os.path.join(script_dir, "../models")
 
-# --- Build features ---
-X, df, feature_cols = bf(csv_path, target="risk_score")
+CV_SCORINGS = ("neg_root_mean_squared_error", "r2")
 
-# --- Target ---
-y = df["risk_score"].clip(5, 95)
 
-# --- Asset-based split ---
-asset_ids = df["asset_id"].unique()
-np.random.seed(42)
-np.random.shuffle(asset_ids)
-split_idx = int(0.8 * len(asset_ids))
-train_assets = asset_ids[:split_idx]
-test_assets = asset_ids[split_idx:]
-train_mask = df["asset_id"].isin(train_assets)
-test_mask = df["asset_id"].isin(test_assets)
+def make_model():
+    return GradientBoostingRegressor(
+        n_estimators=150,
+        learning_rate=0.05,
+        max_depth=2,
+        subsample=0.6,
+        random_state=42
+    )
 
-# --- Convert to CSR ---
-from scipy.sparse import csr_matrix
-X = csr_matrix(X)
 
-X_train = X[train_mask.values]
-X_test = X[test_mask.values]
-y_train = y[train_mask.values]
-y_test = y[test_mask.values]
+def split(features):
+    """CSR train / test matrices and targets, split by asset."""
+    X, df, _ = features
 
-# --- Model ---
-from sklearn.ensemble import GradientBoostingRegressor
-model = GradientBoostingRegressor(
-    n_estimators=150,
-    learning_rate=0.05,
-    max_depth=2,
-    subsample=0.6,
-    random_state=42
-)
-model.fit(X_train, y_train)
-
-# --- Predictions & metrics ---
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import math
-y_pred = model.predict(X_test)
-mae = mean_absolute_error(y_test, y_pred)
-rmse = math.sqrt(mean_squared_error(y_test, y_pred))
-r2 = r2_score(y_test, y_pred)
-cv_rmse = -cross_val_score(
-    model,
-    X_train,
-    y_train,
-    cv=5,
-    scoring="neg_root_mean_squared_error"
-)
-
-cv_r2 = cross_val_score(
-    model,
-    X_train,
-    y_train,
-    cv=5,
-    scoring="r2"
-)
-
-print("\n\n\n--- Test Metrics ---")
-print("CV RMSE:", cv_rmse.mean())
-print("CV R²:", cv_r2.mean())
-print("MAE:", mae)
-print("RMSE:", rmse)
-print("R²:", r2)
-print("\n\n\n")
+    # --- Target ---
+    y = df["risk_score"].clip(5, 95).values
 
-model_dir = os.path.join(script_dir, "../models")
-os.makedirs(model_dir, exist_ok=True)
+    # --- Asset-based split ---
+    train_mask, test_mask = asset_split(df)
 
-joblib.dump(
-    model,
-    os.path.join(model_dir, "risk_score_gbr.pkl")
-)
+    # --- Convert to CSR ---
+    X = csr_matrix(X)
+    return X[train_mask], X[test_mask], y[train_mask], y[test_mask]
 
-joblib.dump(
-    feature_cols,
-    os.path.join(model_dir, "risk_score_features.pkl")
-)
 
+def fit(features, model_dir=model_dir) -> dict:
+    """Fit on the asset-based train split, save the artifacts and return test metrics."""
+    X_train, X_test, y_train, y_test = split(features)
 
+    # --- Model ---
+    model = make_model()
+    model.fit(X_train, y_train)
 
-from pathlib import Path
+    # --- Predictions & metrics ---
+    y_pred = model.predict(X_test)
+
+    os.makedirs(model_dir, exist_ok=True)
+
+    joblib.dump(
+        model,
+        os.path.join(model_dir, "risk_score_gbr.pkl")
+    )
+
+    joblib.dump(
+        features[2],
+        os.path.join(model_dir, "risk_score_features.pkl")
+    )
+
+    return {
+        "mae": float(mean_absolute_error(y_test, y_pred)),
+        "rmse": math.sqrt(mean_squared_error(y_test, y_pred)),
+        "r2": float(r2_score(y_test, y_pred)),
+    }
+
+
+def cv_setup(features):
+    """(estimator, X, y, scorings) for cross-validation on the train split."""
+    X_train, _, y_train, _ = split(features)
+    return make_model(), X_train, y_train, CV_SCORINGS
 
-# --- Paths ---
-BASE_DIR = Path(__file__).parent
 
-# --- Load trained model ---
-risk_score_model = joblib.load(BASE_DIR / "risk_score_gbr.pkl")
+def train(csv_path=csv_path, model_dir=model_dir, features=None, n_jobs=None):
+    # --- Build features ---
+    if features is None:
+        print("Loading CSV from:", csv_path)
+        features = load_features(csv_path)
 
-def predict_risk_score(X: pd.DataFrame) -> int:
-    expected_features = joblib.load(BASE_DIR / "risk_score_features.pkl")
-    X_aligned = X.reindex(columns=expected_features, fill_value=0)
-    score = risk_score_model.predict(X_aligned)[0]
-    return int(score)
+    metrics = fit(features, model_dir)
+    cv = cross_validate_scores(*cv_setup(features), n_jobs=n_jobs)
+    print_metrics(metrics, cv)
+    return {"test": metrics, "cv": cv}
 
 
+if __name__ == "__main__":
+    train()
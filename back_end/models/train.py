@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+from ..features_schema import CLIP_VALUE, TARGET_COLS
+from ..preprocessing import transform_frame
 
 def build_features(csv_path, target=None):
     df = pd.read_csv(csv_path)
@@ -9,81 +11,85 @@ def build_features(csv_path, target=None):
     df = df.drop(columns=["issue_description"])
 
     # -------------------------
-    # Base cleaning
+    # Shared feature definitions (features_schema.py), with
+    # failures_prev taken from each asset's previous snapshot
     # -------------------------
-    df["snapshot_date"] = pd.to_datetime(df["snapshot_date"])
-    df["last_repair_date"] = pd.to_datetime(df["last_repair_date"], errors="coerce")
-
-    df["days_since_repair"] = (
-        df["snapshot_date"] - df["last_repair_date"]
-    ).dt.days.fillna(999)
-
-    df["asset_age_years"] = (
-        df["snapshot_date"].dt.year - df["install_year"]
-    ).clip(lower=0)
+    df = transform_frame(df, history=True)
 
     # -------------------------
-    # SAFE engineered features
+    # Numeric features only, drop targets and asset_id
     # -------------------------
-    df["failures_prev"] = df.groupby("asset_id")["num_prev_failures"].shift(1).fillna(0)
-    df["recent_repair"] = (df["days_since_repair"] < 180).astype(int)
-    df["old_asset"] = (df["asset_age_years"] > 40).astype(int)
+    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
+    feature_cols = [c for c in numeric_cols if c not in TARGET_COLS + ["asset_id"]]
 
-    # -------------------------
-    # Environmental stress
-    # -------------------------
-    df["rain_stress"] = df["rainfall_mm"] * df["slope_grade"]
-    df["moisture_stress"] = df["soil_moisture_pc"] * df["slope_grade"]
-    df["env_stress"] = df["rainfall_mm"] * 0.4 + df["soil_moisture_pc"] * 0.6
-    df["temp_stress"] = df["avg_temp_c"] * df["slope_grade"]
+    df[feature_cols] = df[feature_cols].replace([np.inf, -np.inf], np.nan).fillna(0).clip(-CLIP_VALUE, CLIP_VALUE)
 
-    # -------------------------
-    # Structural features
-    # -------------------------
-    df["structural_risk"] = df["asset_age_years"] * df["length_m"]
-    df["length_age"] = df["length_m"] * df["asset_age_years"]
-    df["length_slope"] = df["length_m"] * df["slope_grade"]
-    df["failure_pressure"] = df["num_prev_failures"] * np.log1p(df["days_since_repair"])
+    X = df[feature_cols].values
 
-    # -------------------------
-    # Extra interaction features for risk_score
-    # -------------------------
-    # Combine age, slope, and length — older long steep assets are riskier
-    df["age_length_slope"] = df["asset_age_years"] * df["length_m"] * df["slope_grade"]
+    return X, df, feature_cols
 
-    # Combine previous failures with environmental stress — assets with many failures in harsh conditions are higher risk
-    df["failures_env_stress"] = df["failures_prev"] * df["env_stress"]
 
-    # Length * rainfall stress — longer assets in heavy rain are riskier
-    df["length_rain_stress"] = df["length_m"] * df["rainfall_mm"]
+# -------------------------
+# Cross-validation
+# -------------------------
+# Every model is scored with 5-fold CV. Each trainer's cv_setup() returns
+# (estimator, X, y, scorings); all scorings are computed on the same fitted
+# folds instead of refitting per metric.
+CV_FOLDS = 5
 
-    # Soil moisture * asset age — old assets in wet soil are at risk
-    df["moisture_age"] = df["soil_moisture_pc"] * df["asset_age_years"]
 
-    # Combined structural + environmental pressure
-    df["struct_env_pressure"] = df["structural_risk"] * df["env_stress"]
+def asset_split(df, train_fraction: float = 0.8):
+    """Boolean train / test masks that keep every snapshot of an asset on one side."""
+    asset_ids = df["asset_id"].unique()
+    np.random.RandomState(42).shuffle(asset_ids)
+    split_idx = int(train_fraction * len(asset_ids))
+    train_mask = df["asset_id"].isin(asset_ids[:split_idx]).values
+    test_mask = df["asset_id"].isin(asset_ids[split_idx:]).values
+    return train_mask, test_mask
 
-    # -------------------------
-    # Categorical encoding
-    # -------------------------
-    cat_cols = ["type", "material", "soil_type", "region", "traffic"]
-    df = pd.get_dummies(df, columns=cat_cols, drop_first=True)
 
-    # -------------------------
-    # Numeric features only, drop targets and asset_id
-    # -------------------------
-    targets = [
-        "failure_next_30d",
-        "failure_type_predicted",
-        "risk_score",
-        "recommended_action",
-        "recommended_priority"
-    ]
-    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-    feature_cols = [c for c in numeric_cols if c not in targets + ["asset_id"]]
+def cv_splits(model, X, y):
+    """The (train, test) index pairs cross_val_score(cv=CV_FOLDS) uses."""
+    from sklearn.base import is_classifier
+    from sklearn.model_selection import check_cv
 
-    df[feature_cols] = df[feature_cols].replace([np.inf, -np.inf], np.nan).fillna(0).clip(-1e6, 1e6)
+    return list(check_cv(CV_FOLDS, y, classifier=is_classifier(model)).split(X, y))
 
-    X = df[feature_cols].values
 
-    return X, df, feature_cols
+def score_fold(model, X, y, train_idx, test_idx, scorings) -> dict:
+    """Fit a clone of `model` on one fold and score it with every scoring."""
+    from sklearn.base import clone
+    from sklearn.metrics import get_scorer
+
+    y = np.asarray(y)
+    fitted = clone(model).fit(X[train_idx], y[train_idx])
+    return {name: float(get_scorer(name)(fitted, X[test_idx], y[test_idx])) for name in scorings}
+
+
+def summarize_cv(fold_scores) -> dict:
+    """Mean per scoring over folds; neg_* scorings are reported positive without the prefix."""
+    summary = {}
+    for name in fold_scores[0]:
+        mean = float(np.mean([scores[name] for scores in fold_scores]))
+        if name.startswith("neg_"):
+            summary[name[len("neg_"):]] = -mean
+        else:
+            summary[name] = mean
+    return summary
+
+
+def cross_validate_scores(model, X, y, scorings, n_jobs=None) -> dict:
+    """summarize_cv over CV_FOLDS folds (folds run on n_jobs processes)."""
+    from sklearn.model_selection import cross_validate
+
+    scores = cross_validate(model, X, y, cv=CV_FOLDS, scoring=list(scorings), n_jobs=n_jobs)
+    return summarize_cv([{name: scores[f"test_{name}"][i] for name in scorings} for i in range(CV_FOLDS)])
+
+
+def print_metrics(metrics: dict, cv: dict) -> None:
+    print("\n\n\n--- Test Metrics ---")
+    for name, value in metrics.items():
+        print(value if name == "classification_report" else f"{name}: {value}")
+    for name, value in cv.items():
+        print(f"CV {name}: {value}")
+    print("\n\n\n")
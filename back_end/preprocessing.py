@@ -1,7 +1,39 @@
+from typing import Optional
+
 import pandas as pd
 import numpy as np
+from .features_schema import CATEGORICAL_COLS, CLIP_VALUE, RAW_NUMERIC_COLS, compute_engineered
 
-def preprocess_df(df: pd.DataFrame) -> pd.DataFrame:
+
+def date_inputs(snapshot: pd.Series, repair: pd.Series) -> dict:
+    """Parsed-date inputs for compute_engineered from datetime Series."""
+    repaired = (repair.notna() & snapshot.notna()).to_numpy()
+    return {
+        "snapshot_ns": np.where(repaired, snapshot.to_numpy(dtype="datetime64[ns]").astype(np.int64), 0),
+        "snapshot_year": snapshot.dt.year.to_numpy(),
+        "repair_ns": np.where(repaired, repair.to_numpy(dtype="datetime64[ns]").astype(np.int64), 0),
+        "repaired": repaired,
+    }
+
+
+def transform_frame(
+    df: pd.DataFrame,
+    history: bool = False,
+    drop_first: bool = True,
+    failures_prev: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """
+    Vectorized form of the shared feature definitions (features_schema.py).
+
+    history=True derives failures_prev from each asset's previous snapshot
+    (groupby asset_id shift), as training does. Otherwise failures_prev is
+    read from the frame, defaulting to 0. An explicit `failures_prev` array
+    overrides both (feature_stream.py carries it across CSV chunks).
+
+    drop_first=False keeps a column for every category, so a caller can
+    reindex to a fixed vocabulary (see feature_stream.py) instead of
+    depending on which categories this frame happens to contain.
+    """
     df = df.copy()
     df.columns = df.columns.str.lower().str.strip().str.replace(" ", "_")
 
@@ -11,47 +43,40 @@ def preprocess_df(df: pd.DataFrame) -> pd.DataFrame:
     df["snapshot_date"] = pd.to_datetime(df["snapshot_date"])
     df["last_repair_date"] = pd.to_datetime(df["last_repair_date"], errors="coerce")
 
-    df["days_since_repair"] = (
-        df["snapshot_date"] - df["last_repair_date"]
-    ).dt.days.fillna(999)
+    columns = {name: df[name].to_numpy() for name in RAW_NUMERIC_COLS if name in df}
+    columns.update(date_inputs(df["snapshot_date"], df["last_repair_date"]))
 
-    df["asset_age_years"] = (
-        df["snapshot_date"].dt.year - df["install_year"]
-    ).clip(lower=0)
+    if failures_prev is not None:
+        columns["failures_prev"] = np.asarray(failures_prev)
+    elif history:
+        columns["failures_prev"] = df.groupby("asset_id")["num_prev_failures"].shift(1).fillna(0).to_numpy()
+    else:
+        columns["failures_prev"] = df["failures_prev"].to_numpy() if "failures_prev" in df else np.zeros(len(df))
 
     # -------------------------
     # Engineered features
     # -------------------------
-    df["failures_prev"] = df.get("failures_prev", 0)
-    df["recent_repair"] = (df["days_since_repair"] < 180).astype(int)
-    df["old_asset"] = (df["asset_age_years"] > 40).astype(int)
-
-    df["rain_stress"] = df["rainfall_mm"] * df["slope_grade"]
-    df["moisture_stress"] = df["soil_moisture_pc"] * df["slope_grade"]
-    df["env_stress"] = df["rainfall_mm"] * 0.4 + df["soil_moisture_pc"] * 0.6
-    df["temp_stress"] = df["avg_temp_c"] * df["slope_grade"]
-
-    df["structural_risk"] = df["asset_age_years"] * df["length_m"]
-    df["length_age"] = df["length_m"] * df["asset_age_years"]
-    df["length_slope"] = df["length_m"] * df["slope_grade"]
-    df["failure_pressure"] = df["num_prev_failures"] * np.log1p(df["days_since_repair"])
-
-    df["age_length_slope"] = df["asset_age_years"] * df["length_m"] * df["slope_grade"]
-    df["failures_env_stress"] = df["failures_prev"] * df["env_stress"]
-    df["length_rain_stress"] = df["length_m"] * df["rainfall_mm"]
-    df["moisture_age"] = df["soil_moisture_pc"] * df["asset_age_years"]
-    df["struct_env_pressure"] = df["structural_risk"] * df["env_stress"]
+    for name, values in compute_engineered(columns).items():
+        df[name] = values
 
     # -------------------------
     # One-hot encoding
     # -------------------------
-    cat_cols = ["type", "material", "soil_type", "region", "traffic"]
-    df = pd.get_dummies(df, columns=cat_cols, drop_first=True)
+    # Frames that arrive already one-hot encoded (e.g. bay_area_infrastructure_clean.csv)
+    # lack the raw categorical columns and keep their encoded ones
+    categorical = [col for col in CATEGORICAL_COLS if col in df]
+    return pd.get_dummies(df, columns=categorical, drop_first=drop_first)
+
+
+def preprocess_df(df: pd.DataFrame) -> pd.DataFrame:
+    df = transform_frame(df)
 
     # -------------------------
     # Cleanup
     # -------------------------
     df = df.replace([np.inf, -np.inf], np.nan).fillna(0)
+    numeric_cols = df.select_dtypes(include=["number"]).columns
+    df[numeric_cols] = df[numeric_cols].clip(-CLIP_VALUE, CLIP_VALUE)
     # Drop raw datetime columns before returning
     df = df.drop(columns=["snapshot_date", "last_repair_date"], errors="ignore")
 
@@ -0,0 +1,319 @@
+"""
+Bulk offline scoring
+-----------------------------------
+Scores every row of an inventory file (CSV or Parquet, shaped like
+bay_area_infrastructure_clean.csv or the raw snapshot CSV) with the same
+feature definitions and model version the API serves, without HTTP:
+
+- the file is read in chunks; failures_prev comes from the file when it
+  has that column, otherwise it is carried across chunks per asset
+  (feature_stream.FailureHistory), as in training
+- each chunk is featurized as a frame (transform_frame, then the
+  FEATURE_COLS matrix, matching FeaturePipeline) and scored with
+  model_utils.predict_all_columns on a process pool
+- every finished chunk is written as its own part file and recorded in
+  <output>.parts/checkpoint.json; rerunning the same command skips the
+  chunks already done, and --restart discards them
+- parts are joined into the output in input order once all are done
+
+Parquet input/output needs pyarrow.
+
+    python -m back_end.score INPUT OUTPUT [--n-jobs N] [--chunk-rows N] [--restart]
+"""
+
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .feature_pipeline import ZERO_COLS
+from .feature_stream import FailureHistory, chunk_matrix, read_chunks
+from .inference.registry import registry, version_name
+from .preprocessing import transform_frame
+
+SCORE_CHUNK_ROWS = 100_000
+
+# Input columns copied to the output to identify each row
+ID_COLS = ["asset_id", "snapshot_date"]
+
+CHECKPOINT_NAME = "checkpoint.json"
+
+
+# -------------------------
+# Input / output
+# -------------------------
+def _is_parquet(path: Path) -> bool:
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise RuntimeError("Parquet files need pyarrow (pip install pyarrow).") from exc
+    return pyarrow
+
+
+def read_input_chunks(path: Path, chunk_rows: int = SCORE_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Chunks of a CSV or Parquet file, column names normalized as in training."""
+    if not _is_parquet(path):
+        yield from read_chunks(path, chunk_rows)
+        return
+    parquet = _pyarrow().parquet.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        chunk = batch.to_pandas()
+        chunk.columns = chunk.columns.str.lower().str.strip().str.replace(" ", "_")
+        yield chunk
+
+
+def _write_part(frame: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    if _is_parquet(path):
+        frame.to_parquet(tmp, index=False)
+    else:
+        frame.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def join_parts(parts, output: Path) -> None:
+    """Concatenate part files (same format as `output`) into `output`, in order."""
+    tmp = output.with_name(output.name + ".tmp")
+    if _is_parquet(output):
+        pq = _pyarrow().parquet
+        writer = None
+        for part in parts:
+            table = pq.read_table(part)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        with open(tmp, "wb") as out:
+            for i, part in enumerate(parts):
+                with open(part, "rb") as f:
+                    if i:
+                        f.readline()  # header
+                    shutil.copyfileobj(f, out)
+    os.replace(tmp, output)
+
+
+# -------------------------
+# Worker side
+# -------------------------
+def _init_worker(threads: int) -> None:
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    # Load the models once per worker, before the first chunk arrives
+    # (importing model_utils no longer loads them)
+    from . import model_utils
+
+    model_utils.current_models()
+
+
+def score_frame(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Predictions for every row of a raw chunk, plus its ID_COLS."""
+    from . import model_utils
+
+    frame = transform_frame(chunk, drop_first=False)
+    X = chunk_matrix(frame.drop(columns=ZERO_COLS, errors="ignore"), model_utils.FEATURE_COLS)
+    predictions = model_utils.predict_all_columns(X)
+    out = chunk[[col for col in ID_COLS if col in chunk]].reset_index(drop=True)
+    for name, values in predictions.items():
+        out[name] = values
+    return out
+
+
+def score_chunk(index: int, first_row: int, chunk: pd.DataFrame, part_path: str) -> dict:
+    """Score one chunk into its part file; returns its size, timing and model version."""
+    start = time.perf_counter()
+    out = score_frame(chunk)
+    out.insert(0, "row", np.arange(first_row, first_row + len(out)))
+    _write_part(out, Path(part_path))
+    return {
+        "index": index,
+        "rows": len(out),
+        "seconds": time.perf_counter() - start,
+        "model_version": out["model_version"].iloc[0] if len(out) else None,
+    }
+
+
+# -------------------------
+# Checkpoints
+# -------------------------
+def _input_fingerprint(path: Path) -> dict:
+    stat = Path(path).stat()
+    return {"input": str(Path(path).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_checkpoint(parts_dir: Path, expected: dict) -> dict:
+    """Chunks already scored ({index: rows}) if the checkpoint matches `expected`."""
+    path = parts_dir / CHECKPOINT_NAME
+    if not path.exists():
+        return {}
+    checkpoint = json.loads(path.read_text())
+    mismatched = [key for key, value in expected.items() if checkpoint.get(key) != value]
+    if mismatched:
+        raise RuntimeError(
+            f"{path} was written for a different {', '.join(mismatched)}; rerun with --restart to discard it."
+        )
+    return {int(index): rows for index, rows in checkpoint["done"].items()}
+
+
+def save_checkpoint(parts_dir: Path, expected: dict, done: dict) -> None:
+    path = parts_dir / CHECKPOINT_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({**expected, "done": {str(i): rows for i, rows in sorted(done.items())}}))
+    os.replace(tmp, path)
+
+
+# -------------------------
+# Orchestration
+# -------------------------
+def _chunks_with_history(input_path: Path, chunk_rows: int) -> Iterator[Tuple[int, int, pd.DataFrame]]:
+    """(index, first row, chunk) with failures_prev filled in for files that lack it."""
+    history = FailureHistory()
+    first_row = 0
+    for index, chunk in enumerate(read_input_chunks(input_path, chunk_rows)):
+        if "failures_prev" not in chunk and {"asset_id", "num_prev_failures"} <= set(chunk.columns):
+            chunk["failures_prev"] = history.failures_prev(chunk)
+        yield index, first_row, chunk
+        first_row += len(chunk)
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    n_jobs: Optional[int] = None,
+    chunk_rows: int = SCORE_CHUNK_ROWS,
+    restart: bool = False,
+    log=print,
+) -> dict:
+    """Score `input_path` into `output_path`, resuming from its checkpoint; returns the run report."""
+    input_path, output_path = Path(input_path), Path(output_path)
+    n_jobs = max(1, n_jobs or os.cpu_count() or 1)
+    parts_dir = output_path.with_name(output_path.name + ".parts")
+    part_suffix = ".parquet" if _is_parquet(output_path) else ".csv"
+    wall_start = time.perf_counter()
+
+    if restart and parts_dir.exists():
+        shutil.rmtree(parts_dir)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    expected = {
+        **_input_fingerprint(input_path),
+        "chunk_rows": chunk_rows,
+        "model_version": version_name(registry.model_dir),
+    }
+    done = load_checkpoint(parts_dir, expected)
+    resumed_rows = sum(done.values())
+    if done:
+        log(f"Resuming: {len(done)} chunks ({resumed_rows} rows) already scored")
+
+    def part(index: int) -> Path:
+        return parts_dir / f"part-{index:06d}{part_suffix}"
+
+    def finished(result: dict) -> None:
+        if result["model_version"] not in (None, expected["model_version"]):
+            raise RuntimeError(
+                f"chunk {result['index']} was scored by model version {result['model_version']}, "
+                f"expected {expected['model_version']}"
+            )
+        done[result["index"]] = result["rows"]
+        save_checkpoint(parts_dir, expected, done)
+        chunk_seconds.append(result["seconds"])
+
+    chunk_seconds = []
+    chunks = 0
+    if n_jobs == 1:
+        _init_worker(os.cpu_count() or 1)
+        for index, first_row, chunk in _chunks_with_history(input_path, chunk_rows):
+            chunks += 1
+            if index not in done:
+                finished(score_chunk(index, first_row, chunk, str(part(index))))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // n_jobs)
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        ) as pool:
+            pending = set()
+            for index, first_row, chunk in _chunks_with_history(input_path, chunk_rows):
+                chunks += 1
+                if index in done:
+                    continue
+                # At most two chunks queued per worker bounds the parent's memory
+                while len(pending) >= 2 * n_jobs:
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        finished(future.result())
+                pending.add(pool.submit(score_chunk, index, first_row, chunk, str(part(index))))
+            for future in wait(pending).done:
+                finished(future.result())
+
+    join_parts([part(index) for index in range(chunks)], output_path)
+    shutil.rmtree(parts_dir)
+
+    wall_seconds = time.perf_counter() - wall_start
+    rows = sum(done.values())
+    scored_rows = rows - resumed_rows
+    return {
+        "input": str(input_path),
+        "output": str(output_path),
+        "model_version": expected["model_version"],
+        "n_jobs": n_jobs,
+        "chunks": chunks,
+        "rows": rows,
+        "resumed_rows": resumed_rows,
+        "wall_seconds": wall_seconds,
+        "rows_per_minute": scored_rows / wall_seconds * 60 if wall_seconds else 0.0,
+        "chunk_seconds_total": sum(chunk_seconds),
+        # ru_maxrss is in KB on Linux; RUSAGE_CHILDREN reports the largest worker
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_worker_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024 if n_jobs > 1 else None,
+    }
+
+
+def format_report(report: dict) -> str:
+    memory = f"peak RSS {report['peak_rss_mb']:.0f} MB"
+    if report["peak_worker_rss_mb"] is not None:
+        memory += f" (parent), {report['peak_worker_rss_mb']:.0f} MB (largest worker)"
+    return (
+        f"{report['rows']} rows in {report['chunks']} chunks ({report['resumed_rows']} resumed) "
+        f"with model {report['model_version']} on {report['n_jobs']} worker(s)\n"
+        f"wall {report['wall_seconds']:.1f}s, {report['rows_per_minute']:,.0f} rows/min "
+        f"({report['chunk_seconds_total']:.1f}s of chunk work)\n"
+        f"{memory}"
+    )
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score every row of an inventory CSV / Parquet file.")
+    parser.add_argument("input", help="CSV or Parquet (.parquet) file")
+    parser.add_argument("output", help="predictions file; .parquet writes Parquet, anything else CSV")
+    parser.add_argument("-j", "--n-jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=SCORE_CHUNK_ROWS)
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint of an interrupted run")
+    parser.add_argument("--report", default=None, help="also write the run report as JSON here")
+    args = parser.parse_args(argv)
+
+    report = score_file(Path(args.input), Path(args.output), args.n_jobs, args.chunk_rows, args.restart)
+    print(format_report(report))
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+"""
+Request scheduling for the API
+-----------------------------------
+- ConcurrencyLimiter: caps in-flight requests on the event loop and sheds
+  the rest immediately (the caller answers 503) instead of queueing them
+- inference_executor: dedicated, sized thread pool for CPU-bound feature
+  building and model calls, separate from Starlette's default pool
+- MicroBatcher: coalesces concurrent single-row requests into one batched
+  model call, flushing after max_wait or max_batch rows
+
+All are configured from the environment:
+    TUNNELVISION_MAX_CONCURRENCY     in-flight /predict requests (default 64)
+    TUNNELVISION_INFERENCE_WORKERS   inference threads (default: CPU count)
+    TUNNELVISION_BATCH_MAX_WAIT_MS   how long a batch stays open (default 2; 0 disables batching)
+    TUNNELVISION_BATCH_MAX_SIZE      rows per batch (default 64)
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List
+
+MAX_CONCURRENCY = int(os.environ.get("TUNNELVISION_MAX_CONCURRENCY", 64))
+INFERENCE_WORKERS = int(os.environ.get("TUNNELVISION_INFERENCE_WORKERS", os.cpu_count() or 1))
+BATCH_MAX_WAIT_MS = float(os.environ.get("TUNNELVISION_BATCH_MAX_WAIT_MS", 2.0))
+BATCH_MAX_SIZE = int(os.environ.get("TUNNELVISION_BATCH_MAX_SIZE", 64))
+
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a CPU-bound call on the inference executor without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, partial(fn, *args, **kwargs))
+
+
+class ConcurrencyLimiter:
+    """
+    Non-blocking counter of in-flight requests. Only used from the event
+    loop thread, so no lock is needed.
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENCY):
+        self.limit = limit
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "admitted": self.admitted, "shed": self.shed}
+
+
+class MicroBatcher:
+    """
+    Collects items submitted concurrently from the event loop and scores
+    them together with `score_batch(items) -> results` on the inference
+    executor.
+
+    A batch is flushed when it reaches max_batch items, or max_wait_ms
+    after its first item arrived if an inference worker is free. While
+    every worker is busy, new items keep accumulating and go out as one
+    batch as soon as a worker frees up, so batches grow with load and
+    an idle server only adds max_wait_ms.
+
+    If a batch call raises, its items are retried one by one so a single
+    bad row only fails its own request.
+    """
+
+    def __init__(
+        self,
+        score_batch: Callable[[List], List],
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_batch: int = BATCH_MAX_SIZE,
+        max_in_flight: int = INFERENCE_WORKERS,
+    ):
+        self.score_batch = score_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._items: List = []
+        self._futures: List[asyncio.Future] = []
+        self._timer = None
+
+        # Histogram buckets: batch size <= 1, 2, 4, ... max_batch
+        self.buckets = [1]
+        while self.buckets[-1] < max_batch:
+            self.buckets.append(min(self.buckets[-1] * 2, max_batch))
+        self.size_counts = [0] * len(self.buckets)
+        self.flushes = {"size": 0, "timeout": 0, "drain": 0}
+        self.items_scored = 0
+        self._batch_seconds = deque(maxlen=1000)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_wait > 0 and self.max_batch > 1
+
+    async def submit(self, item):
+        if not self.enabled:
+            return (await self._run([item]))[0]
+        future = asyncio.get_running_loop().create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_batch:
+            self._flush("size")
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._on_timeout)
+        return await future
+
+    def _on_timeout(self) -> None:
+        self._timer = None
+        # With every worker busy, wait for one to finish (see _dispatch)
+        if self.in_flight < self.max_in_flight:
+            self._flush("timeout")
+
+    def _flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, futures = self._items[:self.max_batch], self._futures[:self.max_batch]
+        del self._items[:self.max_batch], self._futures[:self.max_batch]
+        if items:
+            self.flushes[reason] += 1
+            self.in_flight += 1
+            asyncio.ensure_future(self._dispatch(items, futures))
+
+    async def _dispatch(self, items: List, futures: List[asyncio.Future]) -> None:
+        try:
+            await self._score_into(items, futures)
+        finally:
+            self.in_flight -= 1
+            if self._items:
+                self._flush("drain")
+
+    async def _score_into(self, items: List, futures: List[asyncio.Future]) -> None:
+        try:
+            results = await self._run(items)
+        except Exception:
+            # Isolate the failing item(s)
+            for item, future in zip(items, futures):
+                if future.cancelled():
+                    continue
+                try:
+                    result = (await self._run([item]))[0]
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+            return
+        for future, result in zip(futures, results):
+            if not future.cancelled():
+                future.set_result(result)
+
+    async def _run(self, items: List) -> List:
+        start = time.perf_counter()
+        results = await run_inference(self.score_batch, items)
+        self._batch_seconds.append(time.perf_counter() - start)
+        self.items_scored += len(items)
+        for i, bound in enumerate(self.buckets):
+            if len(items) <= bound:
+                self.size_counts[i] += 1
+                break
+        return results
+
+    def stats(self) -> dict:
+        batches = sum(self.size_counts)
+        seconds = sorted(self._batch_seconds)
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch": self.max_batch,
+            "in_flight": self.in_flight,
+            "batches": batches,
+            "items": self.items_scored,
+            "mean_batch_size": self.items_scored / batches if batches else 0.0,
+            "batch_size_histogram": {f"le_{bound}": count for bound, count in zip(self.buckets, self.size_counts)},
+            "flushes": dict(self.flushes),
+            "batch_seconds": {
+                "p50": seconds[len(seconds) // 2] if seconds else 0.0,
+                "p99": seconds[int(len(seconds) * 0.99)] if seconds else 0.0,
+            },
+        }
@@ -0,0 +1,127 @@
+"""
+API startup
+-----------------------------------
+`import back_end.api` only defines the app: it loads no models, no
+weather history and no pandas, so uvicorn binds its port and serves the
+static pages right away. The slow work is a set of startup tasks that the
+app's lifespan hook starts in the background, each on its own thread:
+
+- models:  the active version for SERVING_MODE (model_utils.current_models)
+- weather: the temperature provider and its offline history CSV
+- pandas:  the import the feature pipeline otherwise pays on first request
+
+An optional warmup then runs synthetic requests through the loaded models
+(see warmup.py). Endpoints that need the models wait for the tasks instead
+of loading on the event loop, but not for the warmup; callers outside the
+API (score.py, bench.py) load on first use as before.
+
+GET /ready answers 503 until the tasks and the warmup have finished, then
+200 with the per-task timings and the warmup's stats. A failed task keeps
+/ready at 503 and is raised to every request that waits on it; a failed
+warmup only keeps /ready at 503.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class StartupLoader:
+    def __init__(self, tasks: Dict[str, Callable[[], object]], warmup: Optional[Callable[[], dict]] = None):
+        self.tasks = dict(tasks)
+        self.warmup = warmup
+        self.warmup_stats: Optional[dict] = None
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.seconds: Optional[float] = None
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # Resolved once every task is done, then once the warmup is too;
+        # RUNNING from the start, so a cancelled waiter can never cancel them
+        self._loaded: Future = Future()
+        self._finished: Future = Future()
+        for future in (self._loaded, self._finished):
+            future.set_running_or_notify_cancel()
+
+    def start(self) -> None:
+        """Run the tasks in the background (once); returns immediately."""
+        with self._lock:
+            if self._started_at is not None:
+                return
+            self._started_at = time.perf_counter()
+        threading.Thread(target=self._run, name="startup", daemon=True).start()
+
+    def _timed(self, name: str, fn: Callable[[], object]) -> None:
+        start = time.perf_counter()
+        try:
+            fn()
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def _run(self) -> None:
+        with ThreadPoolExecutor(max_workers=max(len(self.tasks), 1), thread_name_prefix="startup") as pool:
+            futures = {name: pool.submit(self._timed, name, fn) for name, fn in self.tasks.items()}
+        first_error = None
+        for name, future in futures.items():
+            exc = future.exception()
+            if exc is not None:
+                self.errors[name] = f"{type(exc).__name__}: {exc}"
+                first_error = first_error or exc
+        if first_error is not None:
+            self.seconds = time.perf_counter() - self._started_at
+            error = RuntimeError(f"Startup failed: {self.errors}")
+            error.__cause__ = first_error
+            self._loaded.set_exception(error)
+            self._finished.set_exception(error)
+            return
+        self._loaded.set_result(None)
+
+        warmup_error = None
+        if self.warmup is not None:
+            start = time.perf_counter()
+            try:
+                self.warmup_stats = self.warmup()
+            except Exception as exc:
+                self.errors["warmup"] = f"{type(exc).__name__}: {exc}"
+                warmup_error = exc
+            finally:
+                self.timings["warmup"] = time.perf_counter() - start
+        self.seconds = time.perf_counter() - self._started_at
+        if warmup_error is not None:
+            self._finished.set_exception(warmup_error)
+        else:
+            self._finished.set_result(None)
+
+    @property
+    def ready(self) -> bool:
+        return self._finished.done() and not self.errors
+
+    def wait(self, timeout: Optional[float] = None, warm: bool = False) -> None:
+        """
+        Block until the tasks are done (starting them if needed), and with
+        warm=True the warmup too; raises if one of them failed.
+        """
+        self.start()
+        (self._finished if warm else self._loaded).result(timeout)
+
+    async def wait_async(self) -> None:
+        """wait() for async handlers, without holding a thread."""
+        if not (self._loaded.done() and not self._loaded.exception()):
+            self.start()
+            await asyncio.wrap_future(self._loaded)
+
+    def status(self) -> dict:
+        elapsed = None
+        if self._started_at is not None:
+            elapsed = self.seconds if self.seconds is not None else time.perf_counter() - self._started_at
+        return {
+            "ready": self.ready,
+            "seconds": elapsed,
+            "tasks": {
+                name: {"seconds": self.timings.get(name), "error": self.errors.get(name)}
+                for name in (*self.tasks, *(["warmup"] if self.warmup is not None else []))
+            },
+            "warmup": self.warmup_stats,
+        }
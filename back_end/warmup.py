@@ -0,0 +1,119 @@
+"""
+Startup warmup
+-----------------------------------
+The first requests after boot pay one-off costs: XGBoost booster setup,
+pandas' first date parse, the weather cache, NumPy's first calls into each
+code path. After the models load, the API runs synthetic requests through
+the same functions a real request goes through, and /ready stays 503 until
+their latency has settled:
+
+- one batch with every (region, material, soil) combination: every entry
+  in REGION_COORDINATES, heuristics.MATERIAL_RISK / SOIL_RISK and the
+  model's material / soil vocabulary, with asset types, ages and repair
+  dates cycling so every heuristic band is hit
+- then rounds of single requests (the /predict path), until a round's
+  p50 is within the tolerance of the round before
+
+Configuration:
+
+    TUNNELVISION_WARMUP            "0" turns it off (ready once models load)
+    TUNNELVISION_WARMUP_ROUND      single requests per round (default 20)
+    TUNNELVISION_WARMUP_ROUNDS     min and max rounds (default "3,20")
+    TUNNELVISION_WARMUP_TOLERANCE  allowed p50 change between rounds (default 0.1)
+
+A warmup that never settles still ends after the max rounds, with
+"stable": false in its stats. Warmup requests stay out of /metrics and
+the prediction cache.
+"""
+
+import itertools
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+WARMUP = os.environ.get("TUNNELVISION_WARMUP", "1") == "1"
+WARMUP_ROUND = int(os.environ.get("TUNNELVISION_WARMUP_ROUND", 20))
+WARMUP_MIN_ROUNDS, WARMUP_MAX_ROUNDS = (int(n) for n in os.environ.get("TUNNELVISION_WARMUP_ROUNDS", "3,20").split(","))
+WARMUP_TOLERANCE = float(os.environ.get("TUNNELVISION_WARMUP_TOLERANCE", 0.1))
+
+# Asset ages straddling the heuristic age bands, and days since repair straddling the repair bonuses
+WARMUP_AGES = [5, 15, 25, 35, 45, 60]
+WARMUP_REPAIR_DAYS = [30, 365 * 4, 365 * 6, 365 * 8]
+
+
+def synthetic_requests(
+    region_coordinates: Dict[str, Tuple[float, float]],
+    materials: Sequence[str],
+    soil_types: Sequence[str],
+    asset_types: Sequence[str],
+    today: Optional[date] = None,
+) -> List[dict]:
+    """
+    One /predict body per (region, material, soil) combination. Every other
+    row gives the region's coordinates instead of its name, so the polygon
+    lookup is exercised too.
+    """
+    today = today or date.today()
+    requests = []
+    combinations = itertools.product(region_coordinates.items(), materials, soil_types)
+    for i, ((region, location), material, soil_type) in enumerate(combinations):
+        request = {
+            "type": asset_types[i % len(asset_types)],
+            "material": material,
+            "soil_type": soil_type,
+            "install_year": today.year - WARMUP_AGES[i % len(WARMUP_AGES)],
+            "last_repair_date": (today - timedelta(days=WARMUP_REPAIR_DAYS[i % len(WARMUP_REPAIR_DAYS)])).isoformat(),
+        }
+        if i % 2:
+            request["exact_location"] = list(location)
+        else:
+            request["region"] = region
+        requests.append(request)
+    return requests
+
+
+def run_warmup(
+    score_one: Callable[[dict], object],
+    score_many: Callable[[List[dict]], object],
+    requests: List[dict],
+    round_size: int = WARMUP_ROUND,
+    min_rounds: int = WARMUP_MIN_ROUNDS,
+    max_rounds: int = WARMUP_MAX_ROUNDS,
+    tolerance: float = WARMUP_TOLERANCE,
+) -> dict:
+    """
+    Score `requests` as one batch, then in rounds of `round_size` single
+    requests (cycling through them) until the p50 settles. Returns the
+    timings reported under "warmup" by /ready.
+    """
+    start = time.perf_counter()
+    score_many(requests)
+    batch_seconds = time.perf_counter() - start
+
+    single = itertools.cycle(requests)
+    first_ms = None
+    p50s = []
+    stable = False
+    while len(p50s) < max_rounds:
+        latencies = []
+        for request in itertools.islice(single, round_size):
+            request_start = time.perf_counter()
+            score_one(request)
+            latencies.append((time.perf_counter() - request_start) * 1000)
+        first_ms = latencies[0] if first_ms is None else first_ms
+        p50s.append(statistics.median(latencies))
+        if len(p50s) >= max(min_rounds, 2) and abs(p50s[-1] - p50s[-2]) <= tolerance * p50s[-2]:
+            stable = True
+            break
+
+    return {
+        "requests": len(requests),
+        "batch_seconds": batch_seconds,
+        "first_request_ms": first_ms,
+        "round_p50_ms": p50s,
+        "p50_ms": p50s[-1] if p50s else None,
+        "stable": stable,
+        "seconds": time.perf_counter() - start,
+    }
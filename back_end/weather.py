@@ -0,0 +1,383 @@
+"""
+Temperature providers for TunnelVision
+-----------------------------------
+get_temperature used to call open-meteo on every request. Providers here
+make that pluggable:
+
+- OpenMeteoProvider: live current-weather lookup
+- OfflineTemperatureProvider: per-region / per-month avg_temp_c history
+  from bay_area_infrastructure_clean.csv, no network needed
+- CachedTemperatureProvider: TTL cache keyed on rounded lat/lon, shared
+  across requests, refreshing stale entries in the background and
+  answering from the fallback while the upstream is failing
+
+Every provider has a blocking get_temperature and an async
+aget_temperature; the async path shares one pooled httpx.AsyncClient so
+the API's event loop never waits on the network in a thread.
+
+Cache hit rate and fetch latency are available from stats().
+
+requests, httpx and pandas are imported when a provider first needs them,
+so importing this module (and back_end.api) stays cheap.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+HISTORY_CSV = Path(__file__).resolve().parent.parent / "bay_area_infrastructure_clean.csv"
+
+DEFAULT_TEMPERATURE_C = 15.0
+
+# get_dummies(drop_first=True) dropped Alameda, so rows with no region_* flag are Alameda
+BASELINE_REGION = "Alameda"
+
+
+class TemperatureProvider:
+    def get_temperature(self, lat: float, lon: float) -> float:
+        raise NotImplementedError
+
+    async def aget_temperature(self, lat: float, lon: float) -> float:
+        # Blocking providers run on a worker thread by default
+        return await asyncio.to_thread(self.get_temperature, lat, lon)
+
+    async def aclose(self) -> None:
+        """Release pooled connections and threads; the provider stays usable."""
+
+    def stats(self) -> dict:
+        return {"provider": type(self).__name__}
+
+
+class OpenMeteoProvider(TemperatureProvider):
+    URL = "https://api.open-meteo.com/v1/forecast"
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        session: Optional["requests.Session"] = None,
+        url: str = URL,
+        max_connections: int = 100,
+    ):
+        self.timeout = timeout
+        self._session = session
+        self.url = url
+        self.max_connections = max_connections
+        self._async_client: Optional["httpx.AsyncClient"] = None
+
+    @property
+    def session(self) -> "requests.Session":
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+    @staticmethod
+    def _params(lat: float, lon: float) -> dict:
+        return {"latitude": lat, "longitude": lon, "current_weather": "true"}
+
+    @staticmethod
+    def _temperature(payload: dict) -> float:
+        return payload.get("current_weather", {}).get("temperature", DEFAULT_TEMPERATURE_C)
+
+    def get_temperature(self, lat: float, lon: float) -> float:
+        """Raises on network or HTTP errors; callers decide on the fallback."""
+        response = self.session.get(self.url, params=self._params(lat, lon), timeout=self.timeout)
+        response.raise_for_status()
+        return self._temperature(response.json())
+
+    @property
+    def async_client(self) -> "httpx.AsyncClient":
+        # Created on first use so it binds to the running event loop
+        if self._async_client is None:
+            import httpx
+
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=20),
+            )
+        return self._async_client
+
+    async def aget_temperature(self, lat: float, lon: float) -> float:
+        response = await self.async_client.get(self.url, params=self._params(lat, lon))
+        response.raise_for_status()
+        return self._temperature(response.json())
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class OfflineTemperatureProvider(TemperatureProvider):
+    """
+    Looks up the historical mean avg_temp_c for the nearest region and the
+    current month, falling back to the region mean and then the default.
+    """
+
+    def __init__(self, region_coordinates: Dict[str, Tuple[float, float]], csv_path: Path = HISTORY_CSV):
+        self.region_coordinates = region_coordinates
+        self.monthly, self.overall = self._load_history(csv_path)
+
+    @staticmethod
+    def _load_history(csv_path: Path):
+        import pandas as pd
+
+        region_cols = [c for c in pd.read_csv(csv_path, nrows=0).columns if c.startswith("region_")]
+        df = pd.read_csv(csv_path, usecols=["snapshot_date", "avg_temp_c"] + region_cols)
+
+        region = pd.Series(BASELINE_REGION, index=df.index)
+        for col in region_cols:
+            region[df[col].astype(bool)] = col[len("region_"):]
+        month = pd.to_datetime(df["snapshot_date"]).dt.month
+
+        monthly = df.groupby([region, month])["avg_temp_c"].mean().to_dict()
+        overall = df.groupby(region)["avg_temp_c"].mean().to_dict()
+        return monthly, overall
+
+    def nearest_region(self, lat: float, lon: float) -> str:
+        return min(
+            self.region_coordinates,
+            key=lambda r: (self.region_coordinates[r][0] - lat) ** 2 + (self.region_coordinates[r][1] - lon) ** 2,
+        )
+
+    def get_temperature(self, lat: float, lon: float, month: Optional[int] = None) -> float:
+        region = self.nearest_region(lat, lon)
+        month = month or date.today().month
+        if (region, month) in self.monthly:
+            return float(self.monthly[(region, month)])
+        return float(self.overall.get(region, DEFAULT_TEMPERATURE_C))
+
+    async def aget_temperature(self, lat: float, lon: float) -> float:
+        # In-memory lookup; no need for a thread
+        return self.get_temperature(lat, lon)
+
+
+class CachedTemperatureProvider(TemperatureProvider):
+    """
+    TTL cache in front of an upstream provider.
+
+    - fresh entry: returned directly
+    - stale entry: returned immediately, refreshed on a background thread
+    - miss: fetched synchronously from upstream; concurrent misses on the
+      same key wait for that one fetch instead of starting their own
+    After an upstream failure, misses are answered by the fallback provider
+    for `failure_backoff` seconds instead of waiting on the network again.
+    """
+
+    def __init__(
+        self,
+        upstream: TemperatureProvider,
+        fallback: TemperatureProvider,
+        ttl: float = 900.0,
+        precision: int = 2,
+        max_entries: int = 10_000,
+        failure_backoff: float = 60.0,
+    ):
+        self.upstream = upstream
+        self.fallback = fallback
+        self.ttl = ttl
+        self.precision = precision
+        self.max_entries = max_entries
+        self.failure_backoff = failure_backoff
+
+        self._cache: "OrderedDict[Tuple[float, float], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight: Dict[Tuple[float, float], Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None  # created on the first refresh
+        self._upstream_down_until = 0.0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.fallbacks = 0
+        self._fetch_latencies = deque(maxlen=1000)
+
+    def _key(self, lat: float, lon: float) -> Tuple[float, float]:
+        return (round(lat, self.precision), round(lon, self.precision))
+
+    def _store(self, key, value: float) -> None:
+        with self._lock:
+            self._cache[key] = (value, time.monotonic() + self.ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, key) -> Optional[float]:
+        if time.monotonic() < self._upstream_down_until:
+            return None
+        start = time.perf_counter()
+        try:
+            value = float(self.upstream.get_temperature(*key))
+        except Exception:
+            value = None
+        return self._record_fetch(key, value, start)
+
+    async def _afetch(self, key) -> Optional[float]:
+        if time.monotonic() < self._upstream_down_until:
+            return None
+        start = time.perf_counter()
+        try:
+            value = float(await self.upstream.aget_temperature(*key))
+        except Exception:
+            value = None
+        return self._record_fetch(key, value, start)
+
+    def _record_fetch(self, key, value: Optional[float], start: float) -> Optional[float]:
+        """Update counters for one upstream fetch (value None = failed) and cache the result."""
+        with self._lock:
+            self.fetches += 1
+            self._fetch_latencies.append(time.perf_counter() - start)
+            if value is None:
+                self.fetch_errors += 1
+        if value is None:
+            self._upstream_down_until = time.monotonic() + self.failure_backoff
+            return None
+        self._store(key, value)
+        return value
+
+    def _refresh(self, key) -> None:
+        try:
+            self._fetch(key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _cached(self, key) -> Optional[float]:
+        """Cached value (fresh or stale, scheduling a refresh) or None on a miss."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() < expires_at:
+                self.hits += 1
+                return value
+            self.stale_hits += 1
+            if key not in self._refreshing:
+                self._refreshing.add(key)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+                self._executor.submit(self._refresh, key)
+            return value
+
+    def _claim(self, key) -> Tuple[Future, bool]:
+        """The pending fetch for `key` and whether this caller owns (must run) it."""
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                return pending, False
+            pending = self._inflight[key] = Future()
+            return pending, True
+
+    def _release(self, key, pending: Future, value: Optional[float]) -> None:
+        with self._lock:
+            del self._inflight[key]
+        pending.set_result(value)
+
+    def _fallback(self, lat: float, lon: float) -> float:
+        with self._lock:
+            self.fallbacks += 1
+        return self.fallback.get_temperature(lat, lon)
+
+    def get_temperature(self, lat: float, lon: float) -> float:
+        key = self._key(lat, lon)
+        value = self._cached(key)
+        if value is None:
+            pending, owner = self._claim(key)
+            if not owner:
+                value = pending.result()
+            else:
+                try:
+                    value = self._fetch(key)
+                finally:
+                    self._release(key, pending, value)
+        return self._fallback(lat, lon) if value is None else value
+
+    async def aget_temperature(self, lat: float, lon: float) -> float:
+        key = self._key(lat, lon)
+        value = self._cached(key)
+        if value is None:
+            pending, owner = self._claim(key)
+            if not owner:
+                value = await asyncio.wrap_future(pending)
+            else:
+                try:
+                    value = await self._afetch(key)
+                finally:
+                    self._release(key, pending, value)
+        return self._fallback(lat, lon) if value is None else value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    async def aclose(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._refreshing.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        await self.upstream.aclose()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            latencies = sorted(self._fetch_latencies)
+            return {
+                "provider": type(self).__name__,
+                "upstream": type(self.upstream).__name__,
+                "fallback": type(self.fallback).__name__,
+                "entries": len(self._cache),
+                "lookups": lookups,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "fetches": self.fetches,
+                "fetch_errors": self.fetch_errors,
+                "fallbacks": self.fallbacks,
+                "upstream_down": time.monotonic() < self._upstream_down_until,
+                "fetch_latency_seconds": {
+                    "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                    "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                    "p99": latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+                    "max": latencies[-1] if latencies else 0.0,
+                },
+            }
+
+
+def build_temperature_provider(region_coordinates: Dict[str, Tuple[float, float]]) -> TemperatureProvider:
+    """
+    Provider selected by TUNNELVISION_WEATHER_PROVIDER:
+    "open-meteo" (default, cached, offline fallback) or "offline".
+    TUNNELVISION_OPEN_METEO_URL points the upstream at another endpoint.
+    """
+    offline = OfflineTemperatureProvider(region_coordinates)
+    if os.environ.get("TUNNELVISION_WEATHER_PROVIDER", "open-meteo") == "offline":
+        return offline
+    return CachedTemperatureProvider(
+        upstream=OpenMeteoProvider(
+            timeout=float(os.environ.get("TUNNELVISION_WEATHER_TIMEOUT", 5.0)),
+            url=os.environ.get("TUNNELVISION_OPEN_METEO_URL", OpenMeteoProvider.URL),
+        ),
+        fallback=offline,
+        ttl=float(os.environ.get("TUNNELVISION_WEATHER_TTL", 900.0)),
+    )
@@ -0,0 +1,13 @@
+"""
+pytest setup: run from the repository root (`python -m pytest`), so
+`back_end` is importable. The API is tested offline and in fused mode,
+which needs neither network access nor sklearn / xgboost, with an
+in-memory asset store.
+"""
+
+import os
+
+os.environ.setdefault("TUNNELVISION_WEATHER_PROVIDER", "offline")
+os.environ.setdefault("TUNNELVISION_SERVING_MODE", "fused")
+os.environ.setdefault("TUNNELVISION_WARMUP", "0")
+os.environ.setdefault("TUNNELVISION_ASSET_DB", ":memory:")
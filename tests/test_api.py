@@ -0,0 +1,125 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from back_end import api, model_utils
+from back_end.weather import CachedTemperatureProvider, OpenMeteoProvider, TemperatureProvider
+
+REQUEST = {
+    "type": "water_pipe",
+    "material": "steel",
+    "soil_type": "clay",
+    "region": "Marin",
+    "install_year": 1980,
+    "last_repair_date": "2018-05-01",
+}
+
+
+def test_batch_rejects_only_unparseable_dates_next_to_aware_ones():
+    items = [
+        {**REQUEST, "snapshot_date": "2024-01-01"},
+        {**REQUEST, "snapshot_date": "nope"},
+        {**REQUEST, "snapshot_date": "2024-01-01T00:00:00+05:00"},
+    ]
+    with TestClient(api.app) as client:
+        response = client.post("/predict/batch", json=items)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["error"] is not None for result in results] == [False, True, False]
+    assert "snapshot_date" in results[1]["error"]
+
+
+def test_bad_asset_does_not_fail_later_ingests():
+    base = {
+        "type": "water_pipe", "material": "steel", "soil_type": "clay", "region": "Marin", "traffic": "low",
+        "install_year": 1980, "length_m": 10, "lat": 37.87, "long": -122.51, "slope_grade": 2, "rainfall_mm": 20,
+        "avg_temp_c": 15, "soil_moisture_pc": 30, "num_prev_failures": 2, "last_repair_date": "2018-05-01",
+        "tree_density": "low", "snapshot_date": "2024-01-10",
+    }
+    with TestClient(api.app) as client:
+        first = client.post("/assets", json=[{**base, "asset_id": "bad-date", "snapshot_date": "garbage"}])
+        second = client.post("/assets", json=[{**base, "asset_id": "good"}])
+    assert first.status_code == 200 and first.json()["errors"][0]["index"] == 0
+    assert second.status_code == 200 and second.json()["rescored"] == 1
+
+
+class SlowProvider(TemperatureProvider):
+    """Every lookup takes DELAY seconds, as a weather API round-trip would."""
+
+    DELAY = 0.2
+
+    def get_temperature(self, lat, lon):
+        time.sleep(self.DELAY)
+        return 15.0
+
+    async def aget_temperature(self, lat, lon):
+        await asyncio.sleep(self.DELAY)
+        return 15.0
+
+
+def test_concurrent_weather_misses_share_one_fetch():
+    provider = CachedTemperatureProvider(upstream=SlowProvider(), fallback=SlowProvider())
+
+    async def lookups():
+        return await asyncio.gather(*(provider.aget_temperature(37.87, -122.51) for _ in range(30)))
+
+    assert asyncio.run(lookups()) == [15.0] * 30
+    assert provider.stats()["fetches"] == 1 and provider.stats()["coalesced"] == 29
+
+
+def test_shutdown_closes_the_weather_provider(monkeypatch):
+    upstream = OpenMeteoProvider(url="http://127.0.0.1:9")  # refused at once; never reaches the network
+    provider = CachedTemperatureProvider(upstream=upstream, fallback=SlowProvider(), ttl=0)
+    assert upstream.async_client is not None
+    provider._store((37.87, -122.51), 15.0)
+    provider.get_temperature(37.87, -122.51)  # stale: starts the refresh executor
+    executor = provider._executor
+    monkeypatch.setattr(model_utils, "temperature_provider", provider)
+    with TestClient(api.app):
+        pass
+    assert upstream._async_client is None and provider._executor is None
+    assert executor._shutdown
+
+
+def test_batch_looks_up_locations_concurrently(monkeypatch):
+    regions = ["Marin", "Napa", "Sonoma", "Solano", "Alameda"]
+    with TestClient(api.app) as client:
+        api.startup.wait()
+        monkeypatch.setattr(model_utils, "temperature_provider", SlowProvider())
+        start = time.perf_counter()
+        response = client.post("/predict/batch", json=[{**REQUEST, "region": region} for region in regions])
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    assert all(result["prediction"] for result in response.json()["results"])
+    assert elapsed < SlowProvider.DELAY * len(regions) / 2
+
+
+def test_identical_predicts_in_flight_share_one_computation(monkeypatch):
+    calls = []
+
+    class CountingProvider(SlowProvider):
+        async def aget_temperature(self, lat, lon):
+            calls.append((lat, lon))
+            return await super().aget_temperature(lat, lon)
+
+    with TestClient(api.app) as client:
+        api.startup.wait()
+        api.prediction_cache.clear()
+        monkeypatch.setattr(model_utils, "temperature_provider", CountingProvider())
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(lambda _: client.post("/predict", json=REQUEST), range(8)))
+    assert [response.status_code for response in responses] == [200] * 8
+    assert len({json.dumps(response.json(), sort_keys=True) for response in responses}) == 1
+    assert len(calls) == 1 and not api.pending_predictions
+
+
+def test_batch_endpoints_shed_load_with_predict(monkeypatch):
+    monkeypatch.setattr(api.predict_limiter, "limit", 0)
+    with TestClient(api.app) as client:
+        batch = client.post("/predict/batch", json=[REQUEST])
+        assets = client.post("/assets", json=[{"asset_id": "a"}])
+    assert batch.status_code == 503 and assets.status_code == 503
+    assert batch.headers["retry-after"] == "1"
@@ -0,0 +1,59 @@
+import pytest
+
+from back_end.assets import AssetStore
+from back_end.feature_pipeline import REQUIRED_NUMERIC
+
+PREDICTION = {
+    "failure_in_30_days": False,
+    "failure_type": "none",
+    "risk_score": 20,
+    "recommended_action": "monitor",
+    "priority": 1,
+}
+
+
+def asset(asset_id: str, **attributes) -> dict:
+    return {"asset_id": asset_id, **{col: 1.0 for col in REQUIRED_NUMERIC}, "snapshot_date": "2024-01-10", **attributes}
+
+
+def scorer(rows):
+    if any(row["material"] == "unscorable" for row in rows):
+        raise ValueError("cannot score")
+    return [dict(PREDICTION) for _ in rows]
+
+
+@pytest.fixture
+def store():
+    store = AssetStore(":memory:", scorer=scorer)
+    yield store
+    store.close()
+
+
+def test_unparseable_dates_are_rejected_per_row(store):
+    counts = store.upsert([asset("a"), asset("b", snapshot_date="garbage"), asset("c", last_repair_date="nope")])
+    assert counts["inserted"] == 1
+    assert [error["index"] for error in counts["errors"]] == [1, 2]
+    assert "snapshot_date" in counts["errors"][0]["error"]
+    assert store.rescore() == 1
+
+
+def test_snapshots_are_ordered_as_dates(store):
+    store.upsert([asset("a", snapshot_date="2024-01-10", num_prev_failures=3.0)])
+    # "2024-1-5" sorts after "2024-01-10" as a string but is older
+    assert store.upsert([asset("a", snapshot_date="2024-1-5")])["stale"] == 1
+    counts = store.upsert([asset("a", snapshot_date="2024-01-10T23:00:00-05:00", num_prev_failures=4.0)])
+    assert counts["updated"] == 1
+    attributes = store.get("a")["attributes"]
+    assert attributes["snapshot_date"] == "2024-01-11T04:00:00"
+    assert attributes["failures_prev"] == 3.0
+
+
+def test_failing_asset_does_not_block_the_rest(store):
+    store.upsert([asset(f"ok-{i}") for i in range(10)] + [asset("bad", material="unscorable")])
+    assert store.rescore(chunk_size=4) == 10
+    assert list(store.rescore_errors) == ["bad"]
+    assert store.get("bad")["stale"] and not store.get("ok-0")["stale"]
+    # Later ingests still score their own assets
+    store.upsert([asset("new")])
+    assert store.rescore() == 1
+    assert store.get("new")["prediction"] == PREDICTION
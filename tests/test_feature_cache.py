@@ -0,0 +1,37 @@
+import shutil
+from pathlib import Path
+
+from back_end.models.feature_cache import cache_path, file_sha256, load_features
+from back_end.models.pipeline import DEFAULT_CSV
+
+
+def test_entries_are_kept_per_source_path_and_build_mode(tmp_path):
+    cache_dir = tmp_path / "cache"
+    csvs = []
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        csvs.append(Path(shutil.copy(DEFAULT_CSV, tmp_path / name / "assets.csv")))
+    sha = file_sha256(DEFAULT_CSV)
+
+    for csv_path in csvs:
+        for stream in (False, True):
+            stats = {}
+            load_features(csv_path, cache_dir, stats=stats, stream=stream)
+            assert stats == {"path": str(cache_path(csv_path, sha, cache_dir, stream)), "hit": False}
+    assert len(list(cache_dir.glob("*.tvflat"))) == 4
+
+    stats = {}
+    load_features(csvs[0], cache_dir, stats=stats, stream=True)
+    assert stats["hit"]
+
+
+def test_entry_with_other_build_mode_is_rebuilt(tmp_path):
+    frame = cache_path(DEFAULT_CSV, file_sha256(DEFAULT_CSV), tmp_path, stream=False)
+    load_features(DEFAULT_CSV, tmp_path, stream=False)
+    # An entry for the same key written by the streaming build must not be served as a frame build
+    load_features(DEFAULT_CSV, tmp_path / "streamed", stream=True)
+    shutil.copy(next((tmp_path / "streamed").glob("*.tvflat")), frame)
+
+    stats = {}
+    load_features(DEFAULT_CSV, tmp_path, stats=stats, stream=False)
+    assert not stats["hit"]
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from back_end.feature_pipeline import FeaturePipeline, diverging_columns, request_rows, training_diverging_columns
+from back_end.features_schema import clean
+from back_end.preprocessing import transform_frame
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "back_end"
+CSV_PATH = DATA_DIR / "data" / "bay_area_infrastructure_balanced.csv"
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return FeaturePipeline(joblib.load(DATA_DIR / "feature_cols.pkl"))
+
+
+@pytest.fixture(scope="module")
+def sample():
+    """1000 CSV rows (fixed seed), in file order."""
+    df = pd.read_csv(CSV_PATH)
+    rng = np.random.RandomState(0)
+    return df.iloc[np.sort(rng.choice(len(df), 1000, replace=False))].reset_index(drop=True)
+
+
+def test_pipeline_matches_preprocess_df(pipeline, sample):
+    assert diverging_columns(pipeline, request_rows(sample)) == {}
+
+
+def test_pipeline_matches_training_transform(pipeline, sample, tmp_path):
+    csv_path = tmp_path / "sample.csv"
+    sample.to_csv(csv_path, index=False)
+    assert training_diverging_columns(pipeline, csv_path) == {}
+
+
+def test_engineered_columns_match_training_definitions(pipeline, sample):
+    """transform_frame (training) and FeaturePipeline (serving) share compute_engineered bit for bit."""
+    rows = request_rows(sample)
+    rng = np.random.RandomState(1)
+    failures_prev = rng.randint(0, 10, len(rows)).astype(float)
+    for row, prev in zip(rows, failures_prev):
+        row["failures_prev"] = prev
+
+    frame = transform_frame(pd.DataFrame(rows))
+    served = pipeline.transform(rows)
+    assert pipeline.engineered
+    for name, i in pipeline.engineered:
+        expected = clean(frame[name].to_numpy(dtype=np.float64)).astype(np.float32)
+        np.testing.assert_array_equal(expected.view(np.uint32), served[:, i].view(np.uint32), err_msg=name)
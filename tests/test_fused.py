@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from back_end.inference.fused import FUSED_PATH, MODEL_DIR, FusedEnsemble, _base_score, source_hashes, validate, validation_matrix
+
+
+def test_base_score_scalar_and_vector_forms():
+    # XGBoost < 3: one scalar for every class; >= 3: one entry per class
+    np.testing.assert_array_equal(_base_score({"base_score": "5E-1", "num_class": "3"}), np.float32([0.5, 0.5, 0.5]))
+    np.testing.assert_array_equal(_base_score({"base_score": "[2E-1,3E-1]", "num_class": "2"}), np.float32([0.2, 0.3]))
+    np.testing.assert_array_equal(_base_score({"base_score": "5E-1", "num_class": "0"}), np.float32([0.5]))
+
+
+def test_shipped_fused_artifact_matches_estimators():
+    pytest.importorskip("sklearn")
+    pytest.importorskip("xgboost")
+    from back_end.inference.registry import ModelRegistry
+
+    models = ModelRegistry().build(MODEL_DIR)
+    fused = FusedEnsemble.load(MODEL_DIR / FUSED_PATH.name)
+    assert fused.sources == source_hashes(MODEL_DIR), "fused_ensemble.bin is stale; rebuild it"
+    report = validate(fused, models, validation_matrix(models.feature_cols))
+    assert report["ok"], report
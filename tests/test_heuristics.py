@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from back_end.heuristics import diverging_rows, estimate_heuristics, estimate_one, parity_grid, parse_dates, unparseable
+
+NOW = datetime(2026, 6, 15, 12, 0, 0)
+
+
+def test_vectorized_matches_scalar_cascade():
+    grid = parity_grid(NOW)
+    assert diverging_rows(grid, NOW) == []
+
+
+def test_mixed_timezones_parse_to_naive_utc():
+    parsed = parse_dates(["2024-01-01", "2024-01-01T00:00:00+05:00", "2024-01-01"])
+    expected = np.array(["2024-01-01T00:00", "2023-12-31T19:00", "2024-01-01T00:00"], dtype="datetime64[ns]")
+    np.testing.assert_array_equal(parsed, expected)
+
+
+def test_unparseable_flags_only_bad_rows_next_to_aware_dates():
+    values = ["2024-01-01", "nope", "2024-01-01T00:00:00+05:00", "", "NaT"]
+    assert unparseable(values).tolist() == [False, True, False, False, False]
+
+
+def test_unparseable_repair_date_raises_like_scalar_path():
+    row = (1990, "nope", "steel", "clay", "Marin", "high")
+    with pytest.raises(ValueError):
+        estimate_one(*row, now=NOW)
+    with pytest.raises(ValueError):
+        estimate_heuristics(*zip(row), now=NOW)